@@ -0,0 +1,110 @@
+"""
+compare.py
+
+Comparison of two result files written by routes.py, e.g. measured on two commits with the same dataset and
+settings.
+
+For every route present in both files, prints the p50, p95 and p99 latencies and the throughput of each run and
+the relative change. Exits with status 1 when a route's latency at the chosen percentile grew by more than the
+threshold, or when it answered with errors, so the comparison can gate a change in a script.
+
+Usage (from the repository root):
+    python -m benchmarks.compare before.json after.json [--percentile p95] [--threshold 0.10]
+"""
+
+import argparse
+import json
+import sys
+
+PERCENTILES = ("p50", "p95", "p99")
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
+
+def relative_change(before, after):
+    """
+    Return the change from `before` to `after` as a fraction of `before`, or None when `before` is zero.
+    """
+    return (after - before) / before if before else None
+
+def compare(before, after, percentile="p95", threshold=0.10):
+    """
+    Compare the routes of two result files.
+
+    Parameters:
+    - before (dict): Results of the baseline run.
+    - after (dict): Results of the run being checked.
+    - percentile (str): Latency percentile checked against the threshold: 'p50', 'p95' or 'p99'.
+    - threshold (float): Largest accepted slowdown, as a fraction (0.10 for 10%).
+
+    Returns:
+    - (rows, regressions): One dict per route with both runs' values and changes, and the names
+      of the routes that regressed.
+    """
+    rows = []
+    regressions = []
+
+    for name, old in before["routes"].items():
+        new = after["routes"].get(name)
+        if new is None:
+            continue
+
+        row = {"route": name}
+        for key in PERCENTILES:
+            row[key] = (old[f"{key}_ms"], new[f"{key}_ms"], relative_change(old[f"{key}_ms"], new[f"{key}_ms"]))
+        row["throughput"] = (
+            old["throughput_rps"], new["throughput_rps"], relative_change(old["throughput_rps"], new["throughput_rps"])
+        )
+        row["errors"] = new["errors"]
+        rows.append(row)
+
+        change = row[percentile][2]
+        if new["errors"] or (change is not None and change > threshold):
+            regressions.append(name)
+
+    return rows, regressions
+
+def _describe(run):
+    meta = run["meta"]
+    revision = meta.get("revision") or {}
+    commit = (revision.get("commit") or "unknown")[:10] + (" (dirty)" if revision.get("dirty") else "")
+    return f"{commit}, {meta['client']} client, {meta['dataset']['tasks']} tasks, concurrency {meta['concurrency']}"
+
+def _format_change(change):
+    return "n/a" if change is None else f"{change * 100:+.1f}%"
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two route benchmark results")
+    parser.add_argument("before", help="Results of the baseline run")
+    parser.add_argument("after", help="Results of the run being checked")
+    parser.add_argument("--percentile", choices=PERCENTILES, default="p95", help="Percentile checked for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Largest accepted slowdown, e.g. 0.10")
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    rows, regressions = compare(before, after, args.percentile, args.threshold)
+
+    print(f"before: {_describe(before)}")
+    print(f"after:  {_describe(after)}")
+    for key in ("client", "concurrency", "requests"):
+        if before["meta"].get(key) != after["meta"].get(key):
+            print(f"warning: the runs differ in {key}", file=sys.stderr)
+    if before["meta"]["dataset"]["tasks"] != after["meta"]["dataset"]["tasks"]:
+        print("warning: the runs used datasets of different sizes", file=sys.stderr)
+
+    print(f"{'route':<20}" + "".join(f"{key + ' ms':>24}" for key in PERCENTILES) + f"{'req/s':>24}")
+    for row in rows:
+        cells = []
+        for key in PERCENTILES + ("throughput",):
+            old, new, change = row[key]
+            cells.append(f"{old:>8.2f} {new:>8.2f} {_format_change(change):>6}")
+        flag = "  REGRESSION" if row["route"] in regressions else ""
+        print(f"{row['route']:<20}" + "".join(f"{cell:>24}" for cell in cells) + flag)
+
+    if regressions:
+        print(f"{len(regressions)} route(s) regressed: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+datagen.py
+
+Generator of synthetic TaskFlow databases for the benchmarks. The shipped taskflow.db holds a few dozen tasks, far
+too few for a slow query or page to show up, so the route benchmarks (routes.py) run against databases built here
+at realistic sizes: 10k, 100k or 1M tasks.
+
+Key Components:
+- Shape: The number of POS, the tasks per POS, the share of tasks with a blocker or a reconciliation and the spread
+  of tasks across statuses (e.g. most of them Done, as in a board that has been in use for a while) are all
+  configurable. Descriptions and notes are drawn from a small vocabulary, so full-text searches match a realistic
+  share of the tasks rather than all or none of them.
+- Reproducibility: Generation is seeded, so two databases built with the same settings are identical and results
+  measured on different commits can be compared.
+- Speed: Rows are written with executemany in chunks inside a single transaction with synchronous writes off. The
+  schema comes from the table definitions (helpers.py) and the migrations (migrations.py) run afterwards, so
+  indexes, the search index and the change-tracking triggers are built once over the finished tables instead of
+  being maintained row by row.
+- Benchmark User: A user (BENCH_USERNAME / BENCH_PASSWORD) the route benchmarks log in with.
+
+Correlations:
+- Uses the table definitions of helpers.py and the migrations of migrations.py, so the generated database has the
+  same schema as a production database upgraded to the current version.
+- routes.py runs the route benchmarks against a copy of the generated file.
+
+Usage (from the repository root):
+    python -m benchmarks.datagen --tasks 100000 --pos 500 --output /tmp/taskflow-100k.db
+"""
+
+from core.helpers import metadata, TASK_PRIORITIES
+from core.migrations import upgrade
+from datetime import date, timedelta
+from sqlalchemy import create_engine
+from werkzeug.security import generate_password_hash
+import argparse
+import os
+import random
+import time
+
+# Credentials of the user created in every generated database
+BENCH_USERNAME = "bench"
+BENCH_PASSWORD = "bench"
+
+# Share of tasks in each status, as comma-separated Status=weight pairs
+DEFAULT_STATUS_WEIGHTS = "Backlog=2,To Do=2,In Progress=1,Done=5"
+
+# Rows written per executemany call
+INSERT_CHUNK_SIZE = 20000
+
+# Tasks start within this many days before END_DATE
+DATE_SPAN_DAYS = 730
+END_DATE = date(2025, 12, 31)
+
+DESCRIPTION_VERBS = ("Reconcile", "Review", "Certify", "Check", "Match", "Investigate", "Close", "Update")
+DESCRIPTION_OBJECTS = (
+    "invoices", "cash count", "card settlements", "supplier statement", "stock transfer", "refunds",
+    "petty cash", "bank deposit", "gift cards", "vouchers", "credit notes", "daily takings"
+)
+NOTES = (
+    "Waiting for the store manager", "Difference under threshold", "Escalated to finance",
+    "Documents received", "Second review requested", "Supplier contacted"
+)
+BLOCKER_DESCRIPTIONS = ("Missing credit note", "Bank statement not received", "Awaiting store reply", "System outage")
+BLOCKER_RESPONSIBLES = ("Supplier", "Store", "Finance", "IT")
+
+def parse_status_weights(spec):
+    """
+    Parse the status distribution of the generated tasks.
+
+    Parameters:
+    - spec (str): Comma-separated Status=weight pairs, e.g. "Backlog=2,To Do=2,In Progress=1,Done=5".
+
+    Returns:
+    - weights (dict): Status to weight.
+    """
+    weights = {}
+    for pair in spec.split(","):
+        status, _, weight = pair.partition("=")
+        if status.strip():
+            weights[status.strip()] = float(weight)
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError(f"Invalid status weights: {spec!r}")
+    return weights
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _generate_rows(tasks, pos_count, blocker_ratio, rec_ratio, status_weights, rng, rec_rows, blocker_rows):
+    """
+    Yield the task rows, collecting the reconciliation and blocker rows of each task on the way.
+    """
+    statuses = list(status_weights)
+    weights = list(status_weights.values())
+
+    for task_id in range(1, tasks + 1):
+        pos_id = rng.randint(1, pos_count)
+        status = rng.choices(statuses, weights)[0]
+        start = END_DATE - timedelta(days=rng.randrange(DATE_SPAN_DAYS)) if rng.random() < 0.9 else None
+        due = (start or END_DATE) + timedelta(days=rng.randrange(60)) if rng.random() < 0.85 else None
+
+        rec_id = None
+        if rng.random() < rec_ratio:
+            rec_id = len(rec_rows) + 1
+            rec_rows.append((
+                rec_id,
+                (start or END_DATE).isoformat(),
+                rng.random() < 0.6 if rng.random() < 0.9 else None,
+                task_id,
+                pos_id
+            ))
+
+        blocker_id = None
+        if rng.random() < blocker_ratio:
+            blocker_id = len(blocker_rows) + 1
+            resolved = status == "Done"
+            blocker_rows.append((
+                blocker_id,
+                rng.choice(BLOCKER_DESCRIPTIONS),
+                rng.choice(BLOCKER_RESPONSIBLES),
+                resolved,
+                (due or END_DATE).isoformat() if resolved else None,
+                pos_id,
+                task_id
+            ))
+
+        yield (
+            task_id,
+            f"{rng.choice(DESCRIPTION_VERBS)} {rng.choice(DESCRIPTION_OBJECTS)} {task_id}",
+            status,
+            rng.choice(TASK_PRIORITIES),
+            start.isoformat() if start else None,
+            due.isoformat() if due else None,
+            rng.choice(NOTES) if rng.random() < 0.4 else None,
+            pos_id,
+            blocker_id,
+            rec_id
+        )
+
+def generate_database(path, tasks, pos_count, blocker_ratio=0.1, rec_ratio=0.3,
+                      status_weights=DEFAULT_STATUS_WEIGHTS, seed=42):
+    """
+    Create a database filled with synthetic tasks.
+
+    Parameters:
+    - path (str): Where to write the database; an existing file is replaced.
+    - tasks (int): Number of tasks.
+    - pos_count (int): Number of POS the tasks are spread across.
+    - blocker_ratio (float): Share of tasks with a blocker.
+    - rec_ratio (float): Share of tasks with a reconciliation.
+    - status_weights (str): Status distribution, see `parse_status_weights`.
+    - seed (int): Seed of the random generator.
+
+    Returns:
+    - counts (dict): Number of rows written per table.
+    """
+    weights = parse_status_weights(status_weights)
+    rng = random.Random(seed)
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    engine = create_engine(f"sqlite:///{os.path.abspath(path)}")
+    metadata.create_all(engine)
+
+    rec_rows = []
+    blocker_rows = []
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA synchronous = OFF")
+
+        conn.exec_driver_sql(
+            "INSERT INTO users (username, password_hash) VALUES (?, ?)",
+            (BENCH_USERNAME, generate_password_hash(BENCH_PASSWORD))
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO pos (pos_id, pos_name) VALUES (?, ?)",
+            [(pos_id, f"Store {pos_id:05d}") for pos_id in range(1, pos_count + 1)]
+        )
+
+        rows = _generate_rows(tasks, pos_count, blocker_ratio, rec_ratio, weights, rng, rec_rows, blocker_rows)
+        for chunk in _chunks(rows, INSERT_CHUNK_SIZE):
+            conn.exec_driver_sql(
+                "INSERT INTO tasks (task_id, task_desc, task_status, task_priority, task_start_date, "
+                "task_due_date, task_notes, pos_id, blocker_id, rec_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                chunk
+            )
+        for chunk in _chunks(rec_rows, INSERT_CHUNK_SIZE):
+            conn.exec_driver_sql(
+                "INSERT INTO rec (rec_id, rec_date, rec_certified, task_id, pos_id) VALUES (?, ?, ?, ?, ?)",
+                chunk
+            )
+        for chunk in _chunks(blocker_rows, INSERT_CHUNK_SIZE):
+            conn.exec_driver_sql(
+                "INSERT INTO blockers (blocker_id, blocker_desc, blocker_responsible, blocker_resolved, "
+                "blocker_res_date, pos_id, task_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                chunk
+            )
+        conn.commit()
+
+        # Indexes, search index and triggers, built over the finished tables
+        upgrade(conn)
+        conn.exec_driver_sql("ANALYZE")
+        conn.commit()
+
+    engine.dispose()
+    return {"users": 1, "pos": pos_count, "tasks": tasks, "rec": len(rec_rows), "blockers": len(blocker_rows)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic TaskFlow database")
+    parser.add_argument("--tasks", type=int, default=10000, help="Number of tasks (e.g. 10000, 100000, 1000000)")
+    parser.add_argument("--pos", type=int, default=200, help="Number of POS")
+    parser.add_argument("--tasks-per-pos", type=int, help="Tasks per POS; overrides --tasks")
+    parser.add_argument("--blocker-ratio", type=float, default=0.1, help="Share of tasks with a blocker")
+    parser.add_argument("--rec-ratio", type=float, default=0.3, help="Share of tasks with a reconciliation")
+    parser.add_argument("--status-weights", default=DEFAULT_STATUS_WEIGHTS, help="Status=weight pairs")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the random generator")
+    parser.add_argument("--output", required=True, help="Path of the database to write")
+    args = parser.parse_args()
+
+    tasks = args.pos * args.tasks_per_pos if args.tasks_per_pos else args.tasks
+
+    started = time.perf_counter()
+    counts = generate_database(
+        args.output, tasks, args.pos, args.blocker_ratio, args.rec_ratio, args.status_weights, args.seed
+    )
+    elapsed = time.perf_counter() - started
+
+    summary = ", ".join(f"{count} {table}" for table, count in counts.items())
+    print(f"Wrote {args.output} in {elapsed:.1f} s: {summary}")
+
+if __name__ == "__main__":
+    main()
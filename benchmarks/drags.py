@@ -0,0 +1,282 @@
+"""
+drags.py
+
+Simulation of bursty Kanban drag sequences, measuring what the status coalescing of the writer process
+(TASKFLOW_STATUS_COALESCE_WINDOW, core/writes.py) saves.
+
+Each simulated user drags a card through several columns in quick succession (2 to 5 moves, 30 to 150 ms apart),
+then moves on to another card. Each card saves its status as the board does (kanban.js): a drop is sent at once
+unless a request of the card is in flight, in which case it replaces the status to send when that request is
+answered. The requests go through the same write operation the `/api/update_task_status` route uses, from a pool
+of threads standing for the browser's connections.
+
+For each coalescing window, it reports the requests sent and the status events committed (one per status change
+actually written) against the moves, and the acknowledgement latency, which grows by up to the window. A run is
+only worth comparing if every request was acknowledged with a status the card really got and each card ended in the
+column of its last move; it exits with an error otherwise. The coalescer itself, and the writer committing what it
+holds when it stops, are tested by tests/test_writes.py.
+
+Everything runs on a copy of the dataset in a temporary directory, upgraded to the current schema.
+
+Usage (from the repository root):
+    python -m benchmarks.datagen --tasks 10000 --output /tmp/taskflow-10k.db
+    python -m benchmarks.drags --dataset /tmp/taskflow-10k.db [--windows 0 0.3] [--processes 4] [--users 8] [--drags 400]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.writes import TASK_STATUSES, start_writer
+
+# Most moves in one drag
+MAX_MOVES = 5
+
+def drag_sequence(rng):
+    """
+    Draw the moves of one drag: the columns the card passes through and the pause before each drop.
+
+    Returns:
+    - moves (list): (status, seconds since the previous drop) of each move.
+    """
+    moves = []
+    status = None
+    for _ in range(rng.randint(2, MAX_MOVES)):
+        status = rng.choice([candidate for candidate in TASK_STATUSES if candidate != status])
+        moves.append((status, rng.uniform(0.03, 0.15) if moves else 0))
+    return moves
+
+def send_move(task_id, status):
+    """
+    Send one move and report whether it was acknowledged, with the status saved, and the time it took.
+    """
+    from core.writes import submit_write
+
+    started = time.perf_counter()
+    try:
+        saved = submit_write("update_task_status", task_id=task_id, status=status)
+        return True, saved, time.perf_counter() - started
+    except Exception as e:
+        return False, str(e), time.perf_counter() - started
+
+class Card:
+    """
+    A card of one simulated user's board, saving its status as kanban.js does: one request at a time,
+    with the drops made while a request is in flight replaced by the latest one.
+    """
+
+    def __init__(self, task_id, browser):
+        self.task_id = task_id
+        self.browser = browser
+        self.lock = threading.Lock()
+        self.sending = False
+        # (move, status) of the latest drop not sent yet, and the last status the server confirmed
+        self.next = None
+        self.saved = None
+        self.reports = []
+        self.answered = threading.Event()
+        self.answered.set()
+
+    def drop(self, move, status):
+        """
+        Drop the card in the column of `status`, the `move`-th move of its drag.
+        """
+        with self.lock:
+            if self.sending:
+                self.next = (move, status)
+                return
+            self.sending = True
+            self.answered.clear()
+        self.browser.submit(self._send, move, status)
+
+    def _send(self, move, status):
+        while True:
+            acknowledged, saved, latency = send_move(self.task_id, status)
+            with self.lock:
+                self.reports.append((self.task_id, move, acknowledged, saved, latency))
+                if acknowledged:
+                    self.saved = saved
+                if self.next is not None and self.next[1] != self.saved:
+                    (move, status), self.next = self.next, None
+                    continue
+                self.next = None
+                self.sending = False
+                self.answered.set()
+                return
+
+def run_process(index, users, drags, results):
+    """
+    Play the drags of `users` users of this process and report the acknowledgement of every request.
+
+    Runs in a forked process; core.writes is imported here, after the writer settings are in the environment.
+
+    Parameters:
+    - drags (list): (task ID, moves) of each drag of this process.
+    """
+    reports = []
+    lock = threading.Lock()
+
+    def play(user):
+        rng = random.Random(f"{index}-{user}")
+        cards = []
+        # The browser's connections; the requests of a card never overlap, those of different cards do
+        with ThreadPoolExecutor(max_workers=MAX_MOVES) as browser:
+            for task_id, moves in drags[user::users]:
+                card = Card(task_id, browser)
+                cards.append(card)
+                for move, (status, pause) in enumerate(moves):
+                    time.sleep(pause)
+                    card.drop(move, status)
+                # The user looks at the board before the next drag
+                time.sleep(rng.uniform(0.1, 0.3))
+            for card in cards:
+                card.answered.wait()
+        with lock:
+            reports.extend(report for card in cards for report in card.reports)
+
+    players = [threading.Thread(target=play, args=(user,)) for user in range(users)]
+    for player in players:
+        player.start()
+    for player in players:
+        player.join()
+    results.put(reports)
+
+def check_moves(database, drags, reports):
+    """
+    Check the acknowledgements of the moves and the final column of each card.
+
+    Returns:
+    - failures (list): A description of each failed check.
+    """
+    moves_by_task = {task_id: [status for status, pause in moves] for task_id, moves in drags}
+    failures = []
+    for task_id, move, acknowledged, saved, latency in reports:
+        if not acknowledged:
+            failures.append(f"move {move} of task {task_id} failed: {saved}")
+        elif saved not in moves_by_task[task_id][move:]:
+            failures.append(f"move {move} of task {task_id} was acknowledged with status {saved!r}, which no later move set")
+
+    with sqlite3.connect(database) as conn:
+        placeholders = ", ".join("?" * len(moves_by_task))
+        saved_statuses = dict(conn.execute(
+            f"SELECT task_id, task_status FROM tasks WHERE task_id IN ({placeholders})", list(moves_by_task)
+        ))
+    for task_id, statuses in moves_by_task.items():
+        if saved_statuses.get(task_id) != statuses[-1]:
+            failures.append(f"task {task_id} is in {saved_statuses.get(task_id)!r} instead of {statuses[-1]!r}")
+    return failures
+
+def count_status_events(database, after):
+    with sqlite3.connect(database) as conn:
+        return conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(event_id), ?) FROM task_events WHERE event_type = 'status' AND event_id > ?",
+            (after, after)
+        ).fetchone()
+
+def run_window(window, workdir, database, processes, users, drags):
+    """
+    Play the drags with the writer coalescing status updates for `window` seconds (0: no coalescing).
+
+    Returns:
+    - results (dict): moves, requests sent, status events committed, p50/p95 acknowledgement latency
+      in milliseconds, and the failed checks.
+    """
+    os.environ["TASKFLOW_STATUS_COALESCE_WINDOW"] = str(window)
+    writer = start_writer(workdir)
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    events_before = count_status_events(database, 0)[1]
+
+    try:
+        pool = [
+            context.Process(target=run_process, args=(index, users, drags[index::processes], queue))
+            for index in range(processes)
+        ]
+        for process in pool:
+            process.start()
+        reports = [report for _ in pool for report in queue.get()]
+        for process in pool:
+            process.join()
+    finally:
+        writer.terminate()
+        writer.wait()
+        del os.environ["TASKFLOW_WRITER_SOCKET"], os.environ["TASKFLOW_WRITER_AUTHKEY"]
+
+    latencies = [report[4] for report in reports]
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "moves": sum(len(moves) for task_id, moves in drags),
+        "requests": len(reports),
+        "events": count_status_events(database, events_before)[0],
+        "p50": cuts[49] * 1000,
+        "p95": cuts[94] * 1000,
+        "failures": check_moves(database, drags, reports)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate bursty Kanban drags against the writer's status coalescing")
+    parser.add_argument("--dataset", required=True, help="Database generated by benchmarks.datagen")
+    parser.add_argument("--windows", nargs="+", type=float, default=[0, 0.3], help="Coalescing windows to run, in seconds")
+    parser.add_argument("--processes", type=int, default=4, help="Sending processes, as gunicorn workers")
+    parser.add_argument("--users", type=int, default=8, help="Users dragging cards, per process")
+    parser.add_argument("--drags", type=int, default=400, help="Drag sequences per window, in total")
+    args = parser.parse_args()
+
+    with sqlite3.connect(args.dataset) as conn:
+        tasks = conn.execute("SELECT MAX(task_id) FROM tasks").fetchone()[0]
+    if tasks < args.drags:
+        raise SystemExit(f"The dataset needs at least {args.drags} tasks")
+
+    workdir = tempfile.mkdtemp(prefix="taskflow-drags-")
+    database = os.path.join(workdir, "taskflow.db")
+    shutil.copyfile(args.dataset, database)
+    # Read by core.helpers when it is imported, here and in the writer
+    os.environ["DATABASE_URL"] = f"sqlite:///file:{database}?mode=rw&uri=true"
+    os.environ["TASKFLOW_LOG_FILE"] = os.path.join(workdir, "app.log")
+
+    failures = []
+    try:
+        from core.helpers import get_engine
+        from core.migrations import upgrade
+
+        with get_engine().connect() as conn:
+            upgrade(conn)
+        # The forked processes open their own connections
+        get_engine().dispose()
+
+        # Every drag moves its own card, so its last move decides the card's column
+        rng = random.Random("drags")
+        drags = [(task_id, drag_sequence(rng)) for task_id in range(1, args.drags + 1)]
+
+        print(f"{args.processes} processes x {args.users} users, {args.drags} drags")
+        print(f"{'window s':<10}{'moves':>8}{'requests':>10}{'events':>8}{'saved %':>9}{'p50 ms':>10}{'p95 ms':>10}{'failures':>10}")
+        for window in args.windows:
+            results = run_window(window, workdir, database, args.processes, args.users, drags)
+            failures.extend(f"window {window}: {failure}" for failure in results["failures"])
+            print(
+                f"{window:<10}{results['moves']:>8}{results['requests']:>10}{results['events']:>8}"
+                f"{100 * (1 - results['events'] / results['moves']):>9.0f}"
+                f"{results['p50']:>10.2f}{results['p95']:>10.2f}{len(results['failures']):>10}"
+            )
+
+    finally:
+        from core.logs import stop_logging
+        stop_logging()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+passwords.py
+
+Benchmark of the password hash settings (core/passwords.py): the time one hash takes and the number of logins per
+second a worker sustains with its bounded hashing pool.
+
+For each method, a burst of logins is verified through a PasswordHasher with the given number of threads, as a
+worker does when a shift starts. The throughput is bounded by the cores given to hashing: scrypt and PBKDF2 release
+the GIL, so a pool of N threads uses up to N cores. Logins per second for a whole server are roughly the figure
+below multiplied by the number of workers, up to the number of cores.
+
+Usage (from the repository root):
+    python -m benchmarks.passwords [--methods scrypt:32768:8:1 pbkdf2:sha256:600000] [--threads 1 2] [--logins 40]
+"""
+
+from core.passwords import PasswordHasher
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash
+import argparse
+import os
+import time
+
+DEFAULT_METHODS = ["scrypt:32768:8:1", "scrypt:16384:8:1", "pbkdf2:sha256:600000", "pbkdf2:sha256:100000"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark password hash settings")
+    parser.add_argument("--methods", nargs="+", default=DEFAULT_METHODS, help="Methods in werkzeug's notation")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2], help="Hashing pool sizes")
+    parser.add_argument("--logins", type=int, default=40, help="Logins in each burst")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU(s)")
+    print(f"{'method':<24}{'hash ms':>9}" + "".join(f"{f'logins/s x{threads}':>15}" for threads in args.threads))
+    for method in args.methods:
+        stored = generate_password_hash("correct horse", method=method)
+
+        started = time.perf_counter()
+        generate_password_hash("correct horse", method=method)
+        single = time.perf_counter() - started
+
+        cells = []
+        for threads in args.threads:
+            hasher = PasswordHasher(method=method, threads=threads, queue_size=args.logins, timeout=600)
+            with ThreadPoolExecutor(max_workers=args.logins) as requests:
+                started = time.perf_counter()
+                results = list(requests.map(lambda _: hasher.verify(stored, "correct horse"), range(args.logins)))
+                elapsed = time.perf_counter() - started
+            if not all(valid for valid, _ in results):
+                raise SystemExit(f"Verification failed for {method}")
+            cells.append(f"{args.logins / elapsed:>15.1f}")
+
+        print(f"{method:<24}{single * 1000:>9.1f}" + "".join(cells))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+"""
+routes.py
+
+Benchmark of the application's main routes against a synthetic database (datagen.py), through the Flask test
+client or a real gunicorn server, in the sync or the async serving mode.
+
+Key Components:
+- Scenarios: One per route: the task table (`/tasks`), filtering (`/filter_tasks`), the Kanban board
+  (`/api/kanban_tasks`, narrowed to one POS as a store manager would), single tasks (`/api/get_task`), drag and
+  drop (`/api/update_task_status`) and the create/modify forms. Filters, POS and task ids are drawn from a seeded
+  generator, so every run sends the same requests.
+- Clients: The Flask test client measures the application alone, in this process and one request at a time. The
+  gunicorn client starts a server with the given workers and threads and sends requests over HTTP from
+  concurrent threads, which adds the WSGI server, sockets and contention between requests. The asgi client
+  does the same with the async serving mode (core/asgi.py) on uvicorn workers, with --threads threads for
+  the routes it hands to Flask; comparing its results with the gunicorn client's at the same concurrency
+  compares the two modes. Both server clients start gunicorn with the repository's gunicorn.conf.py, so the
+  task writes go through the writer process (core/writes.py); --writes direct has each worker write itself.
+- Isolation: The dataset is copied to a temporary directory before each run, together with the log, the metrics
+  and the session files, so runs do not change the dataset or the repository and always start from the same data.
+  The copy is upgraded with the migrations of the commit under test, as a deploy would.
+- Results: Per route, the number of requests and errors, p50/p95/p99 and mean latency in milliseconds and the
+  throughput in requests per second, printed as a table and written as JSON with the commit and settings they
+  were measured with. compare.py diffs two result files.
+
+Correlations:
+- Logs in as the benchmark user created by datagen.py.
+- Tasks created or modified by the write scenarios stay in the working copy only.
+
+Usage (from the repository root):
+    python -m benchmarks.datagen --tasks 100000 --output /tmp/taskflow-100k.db
+    python -m benchmarks.routes --dataset /tmp/taskflow-100k.db --client test --output before.json
+    python -m benchmarks.routes --dataset /tmp/taskflow-100k.db --client gunicorn --workers 4 --concurrency 16
+    python -m benchmarks.routes --dataset /tmp/taskflow-100k.db --client gunicorn --concurrency 32 --output sync.json
+    python -m benchmarks.routes --dataset /tmp/taskflow-100k.db --client asgi --concurrency 32 --output async.json
+    python -m benchmarks.compare sync.json async.json
+    python -m benchmarks.routes --dataset /tmp/taskflow-100k.db --client gunicorn --workers 4 --concurrency 32 \
+        --scenarios update_task_status create modify --writes direct --output direct.json
+    python -m benchmarks.routes --dataset /tmp/taskflow-100k.db --client gunicorn --workers 4 --concurrency 32 \
+        --scenarios update_task_status create modify --writes writer --output writer.json
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlencode
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Statuses and priorities of the task forms. The core modules read their settings (database, log and metrics
+# files) from the environment when imported, so they are only imported once the working copy is prepared.
+TASK_STATUSES = ("Backlog", "To Do", "In Progress", "Done")
+TASK_PRIORITIES = ("None", "Low", "Medium", "High")
+
+# Words of the task descriptions written by datagen.py, used as search queries
+SEARCH_TERMS = ("invoices", "cash", "card", "supplier", "refunds", "deposit", "vouchers")
+
+# Seconds to wait for gunicorn to accept connections
+SERVER_START_TIMEOUT = 60
+
+class TestClient:
+    """
+    Send requests to the application in this process through the Flask test client.
+    """
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json_body=None, form=None):
+        response = self.client.open(path, method=method, json=json_body, data=form)
+        response.close()
+        return response.status_code
+
+class HttpClient:
+    """
+    Send requests to a server over one keep-alive HTTP connection.
+    """
+
+    def __init__(self, port, cookie=None):
+        self.port = port
+        self.cookie = cookie
+        self.connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+
+    def request(self, method, path, json_body=None, form=None):
+        headers = {"Cookie": self.cookie} if self.cookie else {}
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body)
+            headers["Content-Type"] = "application/json"
+        elif form is not None:
+            body = urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        except (ConnectionError, http.client.HTTPException):
+            # The server closed the keep-alive connection; retry once on a new one
+            self.connection.close()
+            self.connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=120)
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+
+        response.read()
+        if response.getheader("Set-Cookie") and not self.cookie:
+            self.cookie = response.getheader("Set-Cookie").split(";", 1)[0]
+        return response.status
+
+    def close(self):
+        self.connection.close()
+
+def login(client, username, password):
+    """
+    Log a client in; raises if the dataset has no such user.
+    """
+    client.request("POST", "/login", form={"username": username, "password": password})
+    # Failed logins redirect too, so check that the session is authenticated
+    if client.request("GET", "/api/pos_names_and_ids") != 200:
+        raise SystemExit("Could not log in: was the dataset generated by benchmarks.datagen?")
+
+def clear_flashes(client):
+    # Form posts flash a message that is shown by the page they redirect to. The benchmark does not
+    # follow redirects, so render a page now and then, or the session grows with every post.
+    client.request("GET", "/kanban")
+
+def _random_filter(rng, dataset):
+    filters = {"statuses": rng.sample(TASK_STATUSES, rng.randint(1, 3))}
+    choice = rng.random()
+    if choice < 0.3:
+        filters["pos_id"] = rng.randint(1, dataset["pos"])
+    elif choice < 0.6:
+        filters["search_query"] = rng.choice(SEARCH_TERMS)
+    if rng.random() < 0.3:
+        start = date(2024, 1, 1) + timedelta(days=rng.randrange(600))
+        filters["start_date"] = start.isoformat()
+        filters["end_date"] = (start + timedelta(days=90)).isoformat()
+    return filters
+
+def _task_form(rng, dataset):
+    start = date(2025, 1, 1) + timedelta(days=rng.randrange(300))
+    return {
+        "pos_id": str(rng.randint(1, dataset["pos"])),
+        "description": f"Benchmark task {rng.randrange(10 ** 6)}",
+        "status": rng.choice(TASK_STATUSES),
+        "priority": rng.choice(TASK_PRIORITIES),
+        "start_date": start.isoformat(),
+        "due_date": (start + timedelta(days=14)).isoformat(),
+        "notes": "Created by the route benchmark"
+    }
+
+def scenario_tasks(client, rng, dataset):
+    return client.request("GET", f"/tasks?page={rng.randint(1, 20)}")
+
+def scenario_filter_tasks(client, rng, dataset):
+    return client.request("POST", "/filter_tasks", json_body=dict(_random_filter(rng, dataset), per_page=50))
+
+def scenario_kanban_tasks(client, rng, dataset):
+    return client.request("POST", "/api/kanban_tasks", json_body={"pos_id": rng.randint(1, dataset["pos"])})
+
+def scenario_get_task(client, rng, dataset):
+    return client.request("GET", f"/api/get_task/{rng.randint(1, dataset['tasks'])}")
+
+def scenario_update_task_status(client, rng, dataset):
+    task_id = rng.randint(1, dataset["tasks"])
+    return client.request("POST", f"/api/update_task_status/{task_id}", json_body={"status": rng.choice(TASK_STATUSES)})
+
+def scenario_create(client, rng, dataset):
+    return client.request("POST", "/create", form=_task_form(rng, dataset))
+
+def scenario_modify(client, rng, dataset):
+    form = _task_form(rng, dataset)
+    form["task_id"] = str(rng.randint(1, dataset["tasks"]))
+    return client.request("POST", "/modify", form=form)
+
+# Scenario name to (function, whether it posts a form)
+SCENARIOS = {
+    "tasks": (scenario_tasks, False),
+    "filter_tasks": (scenario_filter_tasks, False),
+    "kanban_tasks": (scenario_kanban_tasks, False),
+    "get_task": (scenario_get_task, False),
+    "update_task_status": (scenario_update_task_status, False),
+    "create": (scenario_create, True),
+    "modify": (scenario_modify, True)
+}
+
+def summarize(latencies, errors, elapsed):
+    """
+    Summarize the latencies of one scenario.
+
+    Parameters:
+    - latencies (list): Latency of each request, in seconds.
+    - errors (int): Number of requests answered with a 4xx or 5xx status.
+    - elapsed (float): Wall-clock time of the scenario, in seconds.
+
+    Returns:
+    - summary (dict): Request and error counts, p50/p95/p99 and mean in milliseconds and requests per second.
+    """
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None
+    }
+
+def run_scenario(clients, name, requests, warmup, seed, dataset):
+    """
+    Run one scenario, split evenly across the clients, each in its own thread.
+
+    Parameters:
+    - clients (list): Logged-in clients; one thread is used per client.
+    - name (str): Scenario name, a key of SCENARIOS.
+    - requests (int): Number of timed requests in total.
+    - warmup (int): Untimed requests sent by each client first.
+    - seed (int): Seed of the scenario's random generators.
+    - dataset (dict): Number of tasks and POS in the database.
+
+    Returns:
+    - summary (dict): See `summarize`.
+    """
+    function, posts_form = SCENARIOS[name]
+    share = [requests // len(clients) + (index < requests % len(clients)) for index in range(len(clients))]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(clients))
+
+    def worker(index):
+        client = clients[index]
+        rng = random.Random(f"{seed}-{name}-{index}")
+        for _ in range(warmup):
+            function(client, rng, dataset)
+        barrier.wait()
+
+        local_latencies = []
+        local_errors = 0
+        for count in range(share[index]):
+            started = time.perf_counter()
+            status = function(client, rng, dataset)
+            local_latencies.append(time.perf_counter() - started)
+            local_errors += status >= 400
+            if posts_form and count % 20 == 19:
+                clear_flashes(client)
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        list(executor.map(worker, range(len(clients))))
+    elapsed = time.perf_counter() - started
+
+    if posts_form:
+        clear_flashes(clients[0])
+    return summarize(latencies, sum(errors), elapsed)
+
+def prepare_workdir(dataset_path):
+    """
+    Copy a dataset to a new temporary directory and point the application's files there.
+
+    Returns:
+    - workdir (str): The temporary directory; the caller removes it.
+    """
+    workdir = tempfile.mkdtemp(prefix="taskflow-bench-")
+    database = os.path.join(workdir, "taskflow.db")
+    shutil.copyfile(dataset_path, database)
+
+    os.environ["DATABASE_URL"] = f"sqlite:///file:{database}?mode=rw&uri=true"
+    os.environ["TASKFLOW_LOG_FILE"] = os.path.join(workdir, "app.log")
+    os.environ["TASKFLOW_METRICS_DIR"] = os.path.join(workdir, "metrics")
+    return workdir
+
+def dataset_size(dataset_path):
+    """
+    Return the number of tasks and POS in a dataset; ids are assumed to be dense from 1.
+    """
+    with sqlite3.connect(f"file:{dataset_path}?mode=ro", uri=True) as conn:
+        tasks = conn.execute("SELECT COALESCE(MAX(task_id), 0) FROM tasks").fetchone()[0]
+        pos = conn.execute("SELECT COALESCE(MAX(pos_id), 0) FROM pos").fetchone()[0]
+    return {"tasks": tasks, "pos": pos}
+
+def git_revision():
+    """
+    Return the current commit and whether the working tree has changes, or None outside a git checkout.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPOSITORY_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=REPOSITORY_ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        return {"commit": commit, "dirty": bool(status.strip())}
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_gunicorn(workdir, workers, threads, asgi=False, writer=True):
+    """
+    Start gunicorn serving the application from a working directory and wait until it accepts requests.
+
+    With asgi, the async serving mode runs on uvicorn workers, and threads sets the
+    threads serving the routes it hands to Flask. Without writer, the workers write
+    to the database themselves instead of through the writer process.
+
+    Returns:
+    - (process, port): The server process and the port it listens on.
+    """
+    port = _free_port()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPOSITORY_ROOT, os.environ.get("PYTHONPATH")])))
+    env["TASKFLOW_WRITER"] = "1" if writer else "0"
+    if asgi:
+        env["TASKFLOW_ASGI_WSGI_THREADS"] = str(threads)
+        server_args = ["--worker-class", "uvicorn.workers.UvicornWorker", "core.asgi:app"]
+    else:
+        server_args = ["--worker-class", "gthread", "--threads", str(threads), "core.app:app"]
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn", "--config", os.path.join(REPOSITORY_ROOT, "gunicorn.conf.py"),
+            "--bind", f"127.0.0.1:{port}", "--workers", str(workers),
+            "--log-level", "warning", *server_args
+        ],
+        cwd=workdir, env=env
+    )
+
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn exited with status {process.returncode}")
+        try:
+            client = HttpClient(port)
+            client.request("GET", "/login")
+            client.close()
+            return process, port
+        except OSError:
+            time.sleep(0.2)
+
+    process.terminate()
+    raise SystemExit("gunicorn did not start in time")
+
+def print_table(results):
+    print(f"{'route':<20}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for name, summary in results.items():
+        print(
+            f"{name:<20}{summary['requests']:>9}{summary['errors']:>8}{summary['p50_ms']:>10.2f}"
+            f"{summary['p95_ms']:>10.2f}{summary['p99_ms']:>10.2f}{summary['throughput_rps']:>10.1f}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TaskFlow routes")
+    parser.add_argument("--dataset", required=True, help="Database generated by benchmarks.datagen")
+    parser.add_argument("--client", choices=("test", "gunicorn", "asgi"), default="test", help="How requests are sent")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="Timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed requests per client before each scenario")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument(
+        "--writes", choices=("writer", "direct"), default="writer",
+        help="With --client gunicorn or asgi, whether task writes go through the writer process"
+    )
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients with --client gunicorn or asgi")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the request generators")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    dataset_path = os.path.abspath(args.dataset)
+    output_path = os.path.abspath(args.output) if args.output else None
+    dataset = dataset_size(dataset_path)
+    workdir = prepare_workdir(dataset_path)
+    server = None
+
+    try:
+        # The session files are written to the working directory
+        os.chdir(workdir)
+        from benchmarks.datagen import BENCH_USERNAME, BENCH_PASSWORD
+        from core.helpers import get_engine
+        from core.migrations import upgrade
+
+        # Bring the copy to this commit's schema, as a deploy would
+        with get_engine().connect() as conn:
+            upgrade(conn)
+        get_engine().dispose()
+
+        if args.client == "test":
+            from core.app import app
+            clients = [TestClient(app)]
+        else:
+            server, port = start_gunicorn(workdir, args.workers, args.threads, asgi=args.client == "asgi", writer=args.writes == "writer")
+            clients = [HttpClient(port) for _ in range(args.concurrency)]
+
+        for client in clients:
+            login(client, BENCH_USERNAME, BENCH_PASSWORD)
+
+        results = {}
+        for name in args.scenarios:
+            results[name] = run_scenario(clients, name, args.requests, args.warmup, args.seed, dataset)
+            print(f"{name}: p50 {results[name]['p50_ms']:.2f} ms", file=sys.stderr)
+
+        for client in clients:
+            if isinstance(client, HttpClient):
+                client.close()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if "core.app" in sys.modules:
+            # The application writes its log and metrics at exit: finish now, before the directory is removed
+            from core.logs import stop_logging
+            from core.metrics import registry
+            stop_logging()
+            registry.reset()
+        os.chdir(REPOSITORY_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "measured_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "dataset": dict(dataset, path=dataset_path),
+            "client": args.client,
+            "workers": args.workers if args.client != "test" else None,
+            "threads": args.threads if args.client != "test" else None,
+            "writes": args.writes if args.client != "test" else None,
+            "concurrency": len(clients),
+            "requests": args.requests,
+            "seed": args.seed,
+            "python": platform.python_version()
+        },
+        "routes": results
+    }
+
+    print_table(results)
+    if output_path:
+        with open(output_path, "w") as file:
+            json.dump(report, file, indent=2)
+            file.write("\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+serialization.py
+
+Micro-benchmark of the task serialization paths: `format_task` with Flask's JSON encoder, as the task APIs used to
+do, against the compiled row serializers with msgspec (serializers.py).
+
+The rows come from the real task query run on an in-memory database filled with synthetic tasks (a share of them
+without dates, reconciliation or blocker), so the benchmark never touches taskflow.db and the rows are the same
+SQLAlchemy Row objects the routes handle. Only serialization and encoding are timed, not the query.
+
+Usage (from the repository root):
+    python -m benchmarks.serialization [--rows 10000 100000] [--repeat 3]
+"""
+
+from core.helpers import metadata, tasks_table, pos_table, rec_table, blockers_table, format_task
+from core.queries import task_list_query
+from core.serializers import serialize_rows, json_response
+from datetime import date, timedelta
+from flask import Flask, jsonify
+from sqlalchemy import create_engine, insert
+import argparse
+import json
+import random
+import time
+
+def build_rows(count):
+    """
+    Create an in-memory database with `count` synthetic tasks and return the rows of the task query.
+    """
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    rng = random.Random(42)
+    start = date(2024, 1, 1)
+
+    with engine.begin() as conn:
+        conn.execute(insert(pos_table), [{"pos_id": i, "pos_name": f"Store {i}"} for i in range(1, 101)])
+        conn.execute(insert(tasks_table), [
+            {
+                "task_id": i,
+                "pos_id": rng.randint(1, 100),
+                "task_desc": f"Reconcile invoices batch {i}",
+                "task_status": rng.choice(["Backlog", "To Do", "In Progress", "Done"]),
+                "task_priority": rng.choice(["Low", "Medium", "High", None]),
+                "task_start_date": start + timedelta(days=rng.randint(0, 365)) if rng.random() < 0.8 else None,
+                "task_due_date": start + timedelta(days=rng.randint(0, 365)) if rng.random() < 0.8 else None,
+                "task_notes": "Check the supplier statement" if rng.random() < 0.5 else None,
+                "rec_id": i if i % 3 == 0 else None,
+                "blocker_id": i if i % 5 == 0 else None
+            } for i in range(1, count + 1)
+        ])
+        conn.execute(insert(rec_table), [
+            {"rec_id": i, "rec_date": start + timedelta(days=i % 365), "rec_certified": i % 2 == 0, "task_id": i}
+            for i in range(3, count + 1, 3)
+        ])
+        conn.execute(insert(blockers_table), [
+            {"blocker_id": i, "blocker_desc": "Missing credit note", "blocker_responsible": "Supplier", "task_id": i}
+            for i in range(5, count + 1, 5)
+        ])
+
+    with engine.connect() as conn:
+        result = conn.execute(task_list_query())
+        columns = tuple(result.keys())
+        return columns, result.fetchall()
+
+def time_best(function, repeat):
+    """
+    Run a function `repeat` times and return the best wall-clock time in seconds and its last result.
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark task serialization")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000], help="Result sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best one is kept")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    with app.app_context():
+        for count in args.rows:
+            columns, rows = build_rows(count)
+
+            legacy_time, legacy_body = time_best(
+                lambda: jsonify(tasks=[format_task(row) for row in rows]).get_data(), args.repeat
+            )
+            fast_time, fast_body = time_best(
+                lambda: json_response({"tasks": serialize_rows(rows, columns)}).get_data(), args.repeat
+            )
+
+            if json.loads(legacy_body) != json.loads(fast_body):
+                raise SystemExit(f"Serializers disagree on {count} rows")
+
+            print(
+                f"{count:>8} rows  format_task + jsonify {legacy_time * 1000:8.1f} ms"
+                f"  compiled + msgspec {fast_time * 1000:8.1f} ms  ({legacy_time / fast_time:.1f}x)"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+sessions.py
+
+Benchmark of the session store (core/sessions.py) against the filesystem backend of Flask-Session it replaced.
+
+Each backend is installed on a minimal Flask app and filled with a number of existing sessions, as a server
+accumulates them over time. Three requests are then timed through the test client, with the cookie of a random
+existing session: a read of the user ID (what `login_required` does on every page), a write (what a flash message
+does) and the creation of a new session (a login). Reads that no longer find their session are counted as lost:
+Flask-Session deletes session files beyond its threshold (500 by default), logging those users out. The storage left
+behind is reported as well: the number and total size of the session files against the rows of the session table.
+
+Everything runs in a temporary directory, so neither the repository's database nor its session directory is
+touched. Flask-Session is only needed for the filesystem side of the comparison.
+
+Usage (from the repository root):
+    python -m benchmarks.sessions [--sessions 500 5000] [--requests 1000]
+"""
+
+from flask import Flask, flash, session
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+def build_app(backend, workdir):
+    """
+    Create a Flask app storing its sessions with the given backend ('filesystem' or 'sqlite') under `workdir`.
+    """
+    app = Flask(__name__)
+
+    if backend == "filesystem":
+        from flask_session import Session
+
+        app.config.update(
+            SESSION_TYPE="filesystem",
+            SESSION_PERMANENT=False,
+            SESSION_FILE_DIR=os.path.join(workdir, "flask_session")
+        )
+        Session(app)
+    else:
+        from core.helpers import init_db
+        from core.sessions import init_sessions
+
+        init_db(app)
+        init_sessions(app)
+
+    @app.route("/login/<int:user_id>")
+    def login(user_id):
+        session.clear()
+        session["user_id"] = user_id
+        return ""
+
+    @app.route("/read")
+    def read():
+        return str(session.get("user_id"))
+
+    @app.route("/write")
+    def write():
+        flash("Task modified successfully!")
+        session.pop("_flashes", None)
+        return ""
+
+    return app
+
+def storage_size(backend, workdir):
+    """
+    Return the number of stored sessions and the bytes they take on disk.
+    """
+    if backend == "filesystem":
+        directory = os.path.join(workdir, "flask_session")
+        files = os.listdir(directory)
+        return len(files), sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+
+    with sqlite3.connect(os.path.join(workdir, "taskflow.db")) as conn:
+        rows = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+    size = sum(
+        os.path.getsize(os.path.join(workdir, name)) for name in os.listdir(workdir) if name.startswith("taskflow.db")
+    )
+    return rows, size
+
+def percentiles(latencies):
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return cuts[49] * 1000, cuts[98] * 1000
+
+def run_backend(backend, workdir, sessions, requests, seed):
+    """
+    Fill a backend with `sessions` sessions, then time reads, writes and logins.
+
+    Returns:
+    - results (dict): Operation name to (p50 ms, p99 ms), plus the share of reads that lost their session,
+      the stored sessions and their size in bytes.
+    """
+    app = build_app(backend, workdir)
+    client = app.test_client(use_cookies=False)
+    cookie_name = app.config["SESSION_COOKIE_NAME"]
+
+    sids = []
+    for user_id in range(sessions):
+        response = client.get(f"/login/{user_id}")
+        sids.append(response.headers["Set-Cookie"].split(";", 1)[0].split("=", 1)[1])
+
+    rng = random.Random(seed)
+    results = {"lost": 0}
+    for operation, path, with_cookie in (("read", "/read", True), ("write", "/write", True), ("login", "/login/0", False)):
+        latencies = []
+        for _ in range(requests):
+            headers = {"Cookie": f"{cookie_name}={rng.choice(sids)}"} if with_cookie else {}
+            started = time.perf_counter()
+            response = client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise SystemExit(f"{backend} {operation} failed with status {response.status_code}")
+            if operation == "read" and response.data == b"None":
+                results["lost"] += 1 / requests
+        results[operation] = percentiles(latencies)
+
+    results["stored"], results["bytes"] = storage_size(backend, workdir)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the session backends")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[500, 5000], help="Existing sessions per run")
+    parser.add_argument("--requests", type=int, default=1000, help="Timed requests per operation")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the session choice")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="taskflow-sessions-")
+    database = os.path.join(workdir, "taskflow.db")
+    # Read by core.helpers when it is imported, in build_app
+    os.environ["DATABASE_URL"] = f"sqlite:///file:{database}?mode=rw&uri=true"
+    os.environ["TASKFLOW_LOG_FILE"] = os.path.join(workdir, "app.log")
+    os.environ["TASKFLOW_SESSION_PRUNE_INTERVAL"] = "0"
+
+    try:
+        print(f"{'backend':<11}{'sessions':>9}{'read p50/p99 ms':>18}{'write p50/p99 ms':>19}"
+              f"{'login p50/p99 ms':>19}{'lost':>7}{'stored':>8}{'KiB':>9}")
+        for count in args.sessions:
+            for backend in ("filesystem", "sqlite"):
+                if "core.helpers" in sys.modules:
+                    # Close the pooled connections to the database about to be replaced
+                    sys.modules["core.helpers"].get_engine().dispose()
+                for name in os.listdir(workdir):
+                    path = os.path.join(workdir, name)
+                    shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+                with sqlite3.connect(database) as conn:
+                    conn.execute("PRAGMA journal_mode = WAL")
+
+                if backend == "sqlite":
+                    from core.helpers import get_engine
+                    from core.sessions import create_session_store
+
+                    with get_engine().begin() as conn:
+                        create_session_store(conn)
+
+                results = run_backend(backend, workdir, count, args.requests, args.seed)
+                cells = [f"{results[operation][0]:.3f}/{results[operation][1]:.3f}" for operation in ("read", "write", "login")]
+                print(
+                    f"{backend:<11}{count:>9}{cells[0]:>18}{cells[1]:>19}{cells[2]:>19}"
+                    f"{results['lost']:>7.0%}{results['stored']:>8}{results['bytes'] / 1024:>9.0f}"
+                )
+    finally:
+        if "core.logs" in sys.modules:
+            sys.modules["core.logs"].stop_logging()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
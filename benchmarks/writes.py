@@ -0,0 +1,188 @@
+"""
+writes.py
+
+Benchmark of concurrent task writes from several processes, as gunicorn workers send them during the month-end
+drag-and-drop rush: each process writing to the database itself, against all of them going through the writer
+process (core/writes.py), which commits the writes arriving together in one transaction.
+
+Each process runs a number of threads, each sending status updates of random tasks one after the other, through the
+same write operation the `/api/update_task_status` route uses, without the HTTP and Flask layers around it (the
+route benchmark, `python -m benchmarks.routes --writes`, measures those as well). Writes that fail, e.g. with
+"database is locked" after waiting for the lock for 5 seconds, are counted as errors.
+
+The gain of the writer grows with the cost of a commit: on disks where an fsync takes milliseconds, it is mostly
+the fsyncs it saves; on fast storage, mostly the time processes spent waiting for the write lock.
+
+Everything runs on a copy of the dataset in a temporary directory, upgraded to the current schema.
+
+Usage (from the repository root):
+    python -m benchmarks.datagen --tasks 100000 --output /tmp/taskflow-100k.db
+    python -m benchmarks.writes --dataset /tmp/taskflow-100k.db [--processes 4] [--threads 8] [--writes 4000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import secrets
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Statuses the updates move tasks between
+TASK_STATUSES = ("Backlog", "To Do", "In Progress", "Done")
+
+# Seconds to wait for the writer's socket
+WRITER_START_TIMEOUT = 10
+
+def run_process(index, mode, threads, writes, tasks, results):
+    """
+    Send `writes` status updates from `threads` threads of this process and report their latencies.
+
+    Runs in a forked process; core.writes is imported here, after the writer settings are in the environment.
+    """
+    from core.helpers import get_engine
+    from core.writes import submit_write, update_task_status
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def send(thread_index, count):
+        rng = random.Random(f"{index}-{thread_index}")
+        local_latencies = []
+        local_errors = 0
+        for _ in range(count):
+            task_id, status = rng.randint(1, tasks), rng.choice(TASK_STATUSES)
+            started = time.perf_counter()
+            try:
+                if mode == "writer":
+                    submit_write("update_task_status", task_id=task_id, status=status)
+                else:
+                    # What the route does without a writer: its own transaction on a pooled connection
+                    with get_engine().begin() as conn:
+                        update_task_status(conn, task_id, status)
+            except Exception:
+                local_errors += 1
+            local_latencies.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    share = [writes // threads + (thread_index < writes % threads) for thread_index in range(threads)]
+    pool = [threading.Thread(target=send, args=(thread_index, share[thread_index])) for thread_index in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put((latencies, sum(errors)))
+
+def start_writer(workdir):
+    """
+    Start the writer process as gunicorn.conf.py does, and set its socket and key for the processes forked next.
+    """
+    address = os.path.join(workdir, "writer.sock")
+    os.environ["TASKFLOW_WRITER_SOCKET"] = address
+    os.environ["TASKFLOW_WRITER_AUTHKEY"] = secrets.token_hex(32)
+    writer = subprocess.Popen(
+        [sys.executable, "-c", "from core.writes import serve_writer; serve_writer()"], cwd=REPOSITORY_ROOT
+    )
+
+    deadline = time.monotonic() + WRITER_START_TIMEOUT
+    while not os.path.exists(address):
+        if writer.poll() is not None or time.monotonic() > deadline:
+            writer.kill()
+            raise SystemExit("The writer did not start")
+        time.sleep(0.05)
+    return writer
+
+def run_mode(mode, workdir, processes, threads, writes, tasks):
+    """
+    Run the benchmark with every process writing directly ('direct') or through the writer ('writer').
+
+    Returns:
+    - results (dict): writes/s, p50/p95/p99 latency in milliseconds and the number of failed writes.
+    """
+    writer = start_writer(workdir) if mode == "writer" else None
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    share = [writes // processes + (index < writes % processes) for index in range(processes)]
+
+    try:
+        started = time.perf_counter()
+        pool = [
+            context.Process(target=run_process, args=(index, mode, threads, share[index], tasks, queue))
+            for index in range(processes)
+        ]
+        for process in pool:
+            process.start()
+        reports = [queue.get() for _ in pool]
+        for process in pool:
+            process.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        if writer is not None:
+            writer.terminate()
+            writer.wait()
+            del os.environ["TASKFLOW_WRITER_SOCKET"], os.environ["TASKFLOW_WRITER_AUTHKEY"]
+
+    latencies = [latency for report in reports for latency in report[0]]
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": cuts[49] * 1000,
+        "p95": cuts[94] * 1000,
+        "p99": cuts[98] * 1000,
+        "errors": sum(report[1] for report in reports)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent task writes with and without the writer")
+    parser.add_argument("--dataset", required=True, help="Database generated by benchmarks.datagen")
+    parser.add_argument("--processes", type=int, default=4, help="Writing processes, as gunicorn workers")
+    parser.add_argument("--threads", type=int, default=8, help="Writing threads per process")
+    parser.add_argument("--writes", type=int, default=4000, help="Status updates per mode, in total")
+    parser.add_argument("--modes", nargs="+", choices=("direct", "writer"), default=["direct", "writer"])
+    args = parser.parse_args()
+
+    with sqlite3.connect(args.dataset) as conn:
+        tasks = conn.execute("SELECT MAX(task_id) FROM tasks").fetchone()[0]
+
+    workdir = tempfile.mkdtemp(prefix="taskflow-writes-")
+    database = os.path.join(workdir, "taskflow.db")
+    shutil.copyfile(args.dataset, database)
+    # Read by core.helpers when it is imported, here and in the writer
+    os.environ["DATABASE_URL"] = f"sqlite:///file:{database}?mode=rw&uri=true"
+    os.environ["TASKFLOW_LOG_FILE"] = os.path.join(workdir, "app.log")
+
+    try:
+        from core.helpers import get_engine
+        from core.migrations import upgrade
+
+        with get_engine().connect() as conn:
+            upgrade(conn)
+        # The forked processes open their own connections
+        get_engine().dispose()
+
+        print(f"{args.processes} processes x {args.threads} threads, {args.writes} status updates, {tasks} tasks")
+        print(f"{'mode':<8}{'writes/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for mode in args.modes:
+            results = run_mode(mode, workdir, args.processes, args.threads, args.writes, tasks)
+            print(
+                f"{mode:<8}{results['throughput']:>10.0f}{results['p50']:>10.2f}{results['p95']:>10.2f}"
+                f"{results['p99']:>10.2f}{results['errors']:>8}"
+            )
+    finally:
+        from core.logs import stop_logging
+        stop_logging()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -25,25 +25,39 @@ Correlations:
 """
 
 import os
-from flask import Flask, flash, redirect, render_template, request, session, jsonify
-from flask_session import Session
-from sqlalchemy import select, and_, or_, desc, func
-from werkzeug.security import check_password_hash, generate_password_hash
+import click
+from flask import Flask, Response, flash, redirect, render_template, request, session, jsonify
+from sqlalchemy import select
 from werkzeug.exceptions import default_exceptions
 from core.helpers import (
     apology, 
     login_required, 
-    get_paginated_tasks, 
-    fetch_pos_data, 
     format_task, 
-    engine, 
-    tasks_table, 
-    pos_table, 
-    rec_table, 
-    blockers_table, 
-    users_table
+    get_db, 
+    db_transaction, 
+    get_pool_stats, 
+    init_db, 
+    users_table,
+    TASK_STATUSES
 )
+from core.queries import TaskFilter, build_filtered_tasks_query, build_kanban_tasks_query, build_task_query, get_paginated_tasks
+from core.search import rebuild_search_index
+from core.pos_cache import fetch_pos_data, get_pos_snapshot, pos_json_response
+from core.sync import current_task_version, fetch_task_changes
+from core.events import broadcaster, event_stream, format_event, format_resync, prune_events, read_events_since, task_events_available, EVENTS_BUFFER_SIZE
+from core.migrations import upgrade, get_schema_version, check_query_plans
+from core.importer import import_tasks, detect_format, IMPORT_FORMATS, IMPORT_CHUNK_SIZE
+from core.exporter import export_csv, export_ndjson, EXPORT_FORMATS
+from core.serializers import serialize_rows, json_response
+from core.metrics import init_metrics, render_metrics, METRICS_TOKEN
+from core.sessions import init_sessions, prune_sessions
+from core.passwords import hasher, PasswordHashBusy
+from core.task_view import check_task_view, rebuild_task_view
+from core.task_summary import check_task_summary, fetch_task_summary, rebuild_task_summary
+from core.at_risk import init_at_risk, at_risk_list
+from core.writes import submit_write
 from datetime import date, datetime
+import io
 import logging
 import traceback
 
@@ -54,10 +68,18 @@ app.config['SECRET_KEY'] = os.environ.get('6e2f996247e3efcee66f23ffd99b7322383a1
 # Ensure templates are auto-reloaded
 app.config["TEMPLATES_AUTO_RELOAD"] = True
 
-# Configure session to use filesystem (instead of signed cookies)
-app.config["SESSION_PERMANENT"] = False
-app.config["SESSION_TYPE"] = "filesystem"
-Session(app)
+# Keep sessions in the database (instead of signed cookies), expired and pruned after
+# TASKFLOW_SESSION_TTL seconds without use; the cookie only lasts until the browser closes
+init_sessions(app)
+
+# Release each request's pooled database connection when the request ends
+init_db(app)
+
+# Time every request and its SQL for Server-Timing and /metrics
+init_metrics(app)
+
+# Refresh the at-risk task list of each worker every day
+init_at_risk(app)
 
 # Create a logger object
 logger = logging.getLogger(__name__)
@@ -66,9 +88,23 @@ logger = logging.getLogger(__name__)
 log = logging.getLogger('werkzeug')
 log.setLevel(logging.ERROR)
 
+# Maximum number of tasks in one bulk status update
+MAX_BULK_STATUS_UPDATES = 500
+
 # Set a constant for the number of records per page
 RECORDS_PER_PAGE = 15
 
+# Largest page a client may request from `/filter_tasks`
+MAX_TASKS_PER_PAGE = 100
+
+# Fields of the tasks returned to the task tables and the Kanban board
+TASK_TABLE_FIELDS = (
+    "task_id", "task_desc", "task_status", "task_priority", "task_start_date", "task_due_date", "task_notes",
+    "pos_id", "pos_name", "rec_date", "rec_certified", "blocker_desc", "blocker_responsible"
+)
+KANBAN_FIELDS = ("task_id", "task_desc", "task_status", "task_priority", "task_due_date", "pos_id", "pos_name")
+KANBAN_NULL_FIELDS = ("task_id", "task_desc", "task_status", "task_priority", "pos_id", "pos_name")
+
 @app.route("/")
 @login_required
 def index():
@@ -107,14 +143,17 @@ def register():
         elif request.form.get("password") != request.form.get("confirmation"):
             return apology("passwords do not match", 400)
 
-        # Hash the user's password
-        hash_pw = generate_password_hash(request.form.get("password"))
+        # Hash the user's password with the configured method, on the bounded hashing pool
+        try:
+            hash_pw = hasher.hash(request.form.get("password"))
+        except PasswordHashBusy as e:
+            logger.warning("Registration refused, password hashing saturated: %s", e)
+            return apology("server busy, please try again in a moment", 503)
 
         # Insert new user into the database
         try:
-            with engine.connect() as conn:
+            with db_transaction() as conn:
                 conn.execute(users_table.insert().values(username=request.form.get("username"), password_hash=hash_pw))
-                conn.commit()
             flash("Registration successful! Please log in.")
         except Exception as e:
             logger.error(f"Error during registration: {e}")
@@ -132,12 +171,15 @@ def login():
 
     Methods:
         GET: Renders the login form.
-        POST: Authenticates the user against the database and starts a new session.
+        POST: Authenticates the user against the database and starts a new session. A password 
+              hash made with another method or cost than the configured one (passwords.py) 
+              is replaced by a new hash once the password is verified.
 
     Returns:
         - On GET: Render the login page.
         - On POST success: Redirect to the kanban page.
-        - On POST failure: Show an error message and prompt the user to try again.
+        - On POST failure: Show an error message and prompt the user to try again, also when 
+          the server is busy hashing other passwords.
     """
     # Clear any existing user session
     session.clear()
@@ -152,19 +194,39 @@ def login():
             return redirect("/login")
 
         # Query database for username
-        with engine.connect() as conn:
-            query = select(users_table.c.user_id, users_table.c.username, users_table.c.password_hash).where(users_table.c.username == request.form.get("username"))
-            rows = conn.execute(query).fetchall()
+        query = select(users_table.c.user_id, users_table.c.username, users_table.c.password_hash).where(users_table.c.username == request.form.get("username"))
+        rows = get_db().execute(query).fetchall()
 
         # Validate username and password
         if len(rows) != 1:
             flash("Username does not exist. Please register.")
             return redirect("/register")
-        elif not check_password_hash(rows[0][2], request.form.get("password")):
+
+        try:
+            valid, new_hash = hasher.verify(rows[0][2], request.form.get("password"))
+        except PasswordHashBusy as e:
+            logger.warning("Login refused, password hashing saturated: %s", e)
+            flash("The server is busy. Please try again in a moment.")
+            return redirect("/login")
+
+        if not valid:
             flash("Incorrect password. Please try again.")
             return redirect("/login")
 
-        # Remember which user has logged in
+        # The hash was made with another method or cost than the configured one: store the new one
+        if new_hash:
+            try:
+                with db_transaction() as conn:
+                    conn.execute(
+                        users_table.update().where(users_table.c.user_id == rows[0][0]).values(password_hash=new_hash)
+                    )
+                logger.info("Rehashed the password of user %s", rows[0][0])
+            except Exception as e:
+                # The old hash still works; the next login tries again
+                logger.error(f"Error rehashing password: {traceback.format_exc()}")
+
+        # Remember which user has logged in, under a session ID the browser did not have before
+        session.regenerate()
         session["user_id"] = rows[0][0]
         flash("Logged in successfully!")
         return redirect("/kanban")
@@ -174,12 +236,13 @@ def login():
 @app.route("/logout")
 def logout():
     """
-    Log the user out by clearing the session data.
+    Log the user out by clearing the session data and moving it to a new session ID.
 
     Returns:
         - Redirect to the login page after clearing the session.
     """
     session.clear()
+    session.regenerate()
     flash("You have been logged out.")
     return redirect("/login")
 
@@ -187,43 +250,20 @@ def logout():
 @login_required
 def tasks():
     """
-    Display all tasks with pagination.
-
-    This route fetches tasks from the database and renders them on the 'tasks.html' page.
-    Utilizes helper functions to format tasks and fetch POS data.
+    Display the tasks page.
 
-    Query Parameters:
-        page (int): Page number for pagination. Defaults to 1.
+    This route renders the first page of tasks on the 'tasks.html' page, so the table
+    shows data before tasksLookup.js reloads it through `/filter_tasks`, which handles
+    filtering and pagination. Utilizes helper functions to format tasks and fetch POS data.
 
     Returns:
-        - Render the 'tasks.html' template with task data, POS data, and pagination info.
-    """
-    page = request.args.get('page', 1, type=int)
-
-    base_query = select(
-        tasks_table.c.task_id,
-        tasks_table.c.task_desc,
-        tasks_table.c.task_status,
-        tasks_table.c.task_priority,
-        tasks_table.c.task_start_date,
-        tasks_table.c.task_due_date,
-        tasks_table.c.task_notes,
-        pos_table.c.pos_id,
-        pos_table.c.pos_name,
-        rec_table.c.rec_date,
-        rec_table.c.rec_certified,
-        blockers_table.c.blocker_desc,
-        blockers_table.c.blocker_responsible
-    ).select_from(
-        tasks_table
-        .join(pos_table, tasks_table.c.pos_id == pos_table.c.pos_id)
-        .outerjoin(rec_table, tasks_table.c.rec_id == rec_table.c.rec_id)
-        .outerjoin(blockers_table, tasks_table.c.blocker_id == blockers_table.c.blocker_id)
-    ).order_by(desc(tasks_table.c.task_id))
+        - Render the 'tasks.html' template with task data and POS data.
+    """
+    base_query = build_filtered_tasks_query(TaskFilter())
 
     try:
-        # Fetch paginated tasks
-        tasks, total_records, total_pages = get_paginated_tasks(base_query, page, RECORDS_PER_PAGE)
+        # Fetch the first page; the page has no pagination controls, so the tasks are not counted
+        tasks, _, _, _ = get_paginated_tasks(base_query, 1, RECORDS_PER_PAGE, with_total=False)
 
         if not tasks:
             logger.warning("No tasks returned from the database.")
@@ -234,8 +274,13 @@ def tasks():
         # Fetch POS data for the dropdowns
         pos_data = fetch_pos_data()
 
-        logger.debug(f"Formatted tasks for rendering: {formatted_tasks}")
-        return render_template("tasks.html", tasks=formatted_tasks, pos_data=pos_data, page=page, total_pages=total_pages, date=date)
+        logger.debug("Formatted %d tasks for rendering", len(formatted_tasks))
+        return render_template(
+            "tasks.html",
+            tasks=formatted_tasks,
+            pos_data=pos_data,
+            date=date
+        )
 
     except Exception as e:
         logger.error(f"Error displaying tasks: {traceback.format_exc()}")
@@ -252,122 +297,107 @@ def filter_tasks():
     query with dynamic filters and returns a paginated list of tasks matching the criteria.
 
     Request JSON:
-        - search_query (str): Text to search in task descriptions, notes, or POS names.
+        - search_query (str): Text to search in task descriptions, notes, or POS names. Each word is 
+          matched as a prefix through the full-text index and results are ranked by relevance.
         - pos_id (int): POS ID to filter by.
         - pos_name (str): POS Name to filter by.
         - start_date (str): Start date to filter tasks from.
         - end_date (str): End date to filter tasks until.
         - statuses (list): List of task statuses to filter by.
         - priorities (list): List of task priorities to filter by.
+        - due (str): Due date bucket: 'overdue', 'today', 'this_week' or 'later' (see /api/kanban_tasks).
         - page (int): Page number for pagination.
+        - cursor (str): Opaque cursor returned as 'next_cursor' or 'prev_cursor' by a 
+          previous call with the same filters. When given, the page is fetched by 
+          seeking from the cursor instead of using an offset.
+        - per_page (int): Tasks per page, at most MAX_TASKS_PER_PAGE (default RECORDS_PER_PAGE).
+        - with_total (bool): Whether to count the matching tasks (default true). Clients 
+          loading the following pages of a list they already counted pass false.
 
     Returns:
-        - JSON response with tasks, current page, and total pages.
+        - JSON response with tasks, current page, total records and pages (null without 
+          with_total) and the cursors of the neighbouring pages (null when there is no 
+          such page).
     """
     data = request.get_json()
-    page = data.get('page', 1)
 
     if data is None:
         logger.error("No data received in request")
         return jsonify({"error": "No data received"}), 400
 
-    search_query = data.get("search_query", "").strip()
-    pos_id = data.get("pos_id")
-    pos_name = data.get("pos_name", "").strip()
-    start_date = data.get("start_date")
-    end_date = data.get("end_date")
-    statuses = data.get("statuses", [])
-    priorities = data.get("priorities", [])
-
-    logger.debug(f"Received data from client: {data}")
-
-    base_query = select(
-        tasks_table.c.task_id,
-        tasks_table.c.task_desc,
-        tasks_table.c.task_status,
-        tasks_table.c.task_priority,
-        tasks_table.c.task_start_date,
-        tasks_table.c.task_due_date,
-        tasks_table.c.task_notes,
-        pos_table.c.pos_id,
-        pos_table.c.pos_name,
-        rec_table.c.rec_date,
-        rec_table.c.rec_certified,
-        blockers_table.c.blocker_desc,
-        blockers_table.c.blocker_responsible
-    ).select_from(
-        tasks_table.join(pos_table, tasks_table.c.pos_id == pos_table.c.pos_id)
-        .outerjoin(rec_table, tasks_table.c.rec_id == rec_table.c.rec_id)
-        .outerjoin(blockers_table, tasks_table.c.blocker_id == blockers_table.c.blocker_id)
-    )
+    logger.debug("Received data from client: %s", data)
 
-    conditions = []
+    try:
+        payload = filter_tasks_payload(get_db(), data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error fetching filtered tasks: {traceback.format_exc()}")
+        return jsonify({"error": "An error occurred while fetching tasks."}), 500
 
-    # Apply search query filter
-    if search_query:
-        conditions.append(or_(
-            func.lower(tasks_table.c.task_desc).like(f"%{search_query.lower()}%"),
-            func.lower(tasks_table.c.task_notes).like(f"%{search_query.lower()}%"),
-            func.lower(pos_table.c.pos_name).like(f"%{search_query.lower()}%")
-        ))
+    return json_response(payload)
 
-    # Apply filters if provided
-    if pos_id:
-        conditions.append(pos_table.c.pos_id == pos_id)
-    if pos_name:
-        conditions.append(pos_table.c.pos_name.ilike(f"%{pos_name}%"))
-    if statuses:
-        conditions.append(tasks_table.c.task_status.in_(statuses))
-    if priorities:
-        conditions.append(tasks_table.c.task_priority.in_(priorities))
-    if start_date:
-        try:
-            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-            conditions.append(tasks_table.c.task_start_date >= start_date)
-        except ValueError:
-            logger.error(f"Invalid start date format: {start_date}")
-    if end_date:
-        try:
-            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-            conditions.append(tasks_table.c.task_due_date <= end_date)
-        except ValueError:
-            logger.error(f"Invalid end date format: {end_date}")
+def filter_tasks_payload(conn, data):
+    """
+    Fetch the page of tasks requested from `/filter_tasks`.
 
-    # Combine conditions if any
-    if conditions:
-        base_query = base_query.where(and_(*conditions))
+    Shared by the route and its async version (asgi.py), which runs it on its own connection.
 
-    base_query = base_query.order_by(desc(tasks_table.c.task_id))
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to run the queries on.
+    - data (dict): The request JSON.
 
-    logger.debug(f"Executing query with conditions: {str(base_query)}")
+    Returns:
+    - payload (dict): The response body.
 
+    Raises:
+    - ValueError: If per_page is not a number.
+    """
+    page = data.get('page', 1)
+    cursor = data.get('cursor')
+    with_total = data.get('with_total', True) is not False
     try:
-        # Fetch paginated tasks
-        tasks, total_records, total_pages = get_paginated_tasks(base_query, page, RECORDS_PER_PAGE)
-        logger.debug(f"Fetched tasks: {tasks}")
-    except Exception as e:
-        logger.error(f"Error fetching filtered tasks: {traceback.format_exc()}")
-        return jsonify({"error": "An error occurred while fetching tasks."}), 500
+        per_page = min(max(int(data.get('per_page', RECORDS_PER_PAGE)), 1), MAX_TASKS_PER_PAGE)
+    except (TypeError, ValueError):
+        raise ValueError("per_page must be a number")
 
-    # Format the tasks to send back to the client
-    tasks_list = [format_task(task) for task in tasks]
+    base_query = build_filtered_tasks_query(TaskFilter.from_json(data), conn=conn)
 
-    logger.debug(f"Returning tasks list to client: {tasks_list}")
-    return jsonify(tasks=tasks_list, page=page, total_pages=total_pages)
+    logger.debug("Executing query with parameters: %s", base_query.params)
+
+    # Fetch paginated tasks
+    tasks, total_records, total_pages, cursors = get_paginated_tasks(
+        base_query, page, per_page, cursor=cursor, with_total=with_total, conn=conn
+    )
+    logger.debug("Fetched %d tasks", len(tasks))
+
+    # Format the tasks to send back to the client
+    tasks_list = serialize_rows(tasks, tasks[0]._fields, TASK_TABLE_FIELDS) if tasks else []
+
+    logger.debug("Returning %d tasks to client", len(tasks_list))
+    return {
+        "tasks": tasks_list,
+        "page": page,
+        "total_records": total_records,
+        "total_pages": total_pages,
+        "next_cursor": cursors["next"],
+        "prev_cursor": cursors["prev"]
+    }
 
 @app.route("/create", methods=["GET", "POST"])
 @login_required
 def create_task():
     """
-    Handle the creation of a new task or display the create task page with existing tasks.
+    Handle the creation of a new task or display the create task page.
 
     Methods:
-        GET: Fetches existing tasks and POS data to display on the task creation page.
+        GET: Fetches POS data to display the task creation page. The task table below the 
+             form is loaded by the browser in pages through `/filter_tasks`.
         POST: Validates and inserts a new task into the database. Optionally inserts related 
               blocker and reconciliation data.
 
     Returns:
-        - On GET: Render the 'create.html' template with tasks and POS data.
+        - On GET: Render the 'create.html' template with POS data.
         - On POST success: Redirect to the tasks page.
         - On POST failure: Show an error message and prompt the user to try again.
     """
@@ -405,53 +435,21 @@ def create_task():
             return redirect("/create")
 
         try:
-            with engine.connect() as conn:
-                # Insert the new task into the tasks table
-                task_insert = tasks_table.insert().values(
-                    pos_id=pos_id,
-                    task_desc=description,
-                    task_status=status,
-                    task_priority=priority,
-                    task_start_date=start_date,
-                    task_due_date=due_date,
-                    task_notes=notes
-                )
-                result = conn.execute(task_insert)
-                task_id = result.inserted_primary_key[0]  # Get the inserted task ID
-
-                # Insert the related blocker information if provided
-                blocker_id = None
-                if blocker_desc or blocker_responsible:
-                    blocker_insert = blockers_table.insert().values(
-                        blocker_desc=blocker_desc,
-                        blocker_responsible=blocker_responsible,
-                        task_id=task_id,  # Link with the new task
-                        pos_id=pos_id
-                    )
-                    blocker_result = conn.execute(blocker_insert)
-                    blocker_id = blocker_result.inserted_primary_key[0]  # Get the inserted blocker ID
-
-                # Insert reconciliation information into rec_table if needed
-                rec_id = None
-                if reconciliation_date or certified is not None:
-                    rec_insert = rec_table.insert().values(
-                        rec_date=reconciliation_date,
-                        rec_certified=(certified == 'true') if certified else None,
-                        task_id=task_id,  # Link with the new task
-                        pos_id=pos_id,
-                        blocker_id=blocker_id  # Link with the new blocker if created
-                    )
-                    rec_result = conn.execute(rec_insert)
-                    rec_id = rec_result.inserted_primary_key[0]  # Get the inserted rec ID
-
-                # Update the task record with blocker_id and rec_id if they were created
-                conn.execute(
-                    tasks_table.update()
-                    .where(tasks_table.c.task_id == task_id)
-                    .values(blocker_id=blocker_id, rec_id=rec_id)
-                )
-
-                conn.commit()
+            # Applied by the writer process when gunicorn runs one (see writes.py)
+            submit_write(
+                "create_task",
+                pos_id=pos_id,
+                description=description,
+                status=status,
+                priority=priority,
+                start_date=start_date,
+                due_date=due_date,
+                notes=notes,
+                reconciliation_date=reconciliation_date,
+                certified=certified,
+                blocker_desc=blocker_desc,
+                blocker_responsible=blocker_responsible
+            )
             flash("Task created successfully!")
         except Exception as e:
             logger.error(f"Error creating task: {traceback.format_exc()}")
@@ -463,35 +461,11 @@ def create_task():
         # Fetch POS data for the form dropdown
         pos_data = fetch_pos_data()
 
-        # Fetch tasks similarly to the `/tasks` route to display them on the create page
-        query = select(
-            tasks_table.c.task_id,
-            tasks_table.c.task_desc,
-            tasks_table.c.task_status,
-            tasks_table.c.task_priority,
-            tasks_table.c.task_start_date,
-            tasks_table.c.task_due_date,
-            tasks_table.c.task_notes,
-            pos_table.c.pos_id,
-            pos_table.c.pos_name,
-            rec_table.c.rec_date,
-            rec_table.c.rec_certified,
-            blockers_table.c.blocker_desc,
-            blockers_table.c.blocker_responsible
-        ).select_from(
-            tasks_table
-            .join(pos_table, tasks_table.c.pos_id == pos_table.c.pos_id)
-            .outerjoin(rec_table, tasks_table.c.rec_id == rec_table.c.rec_id)
-            .outerjoin(blockers_table, tasks_table.c.blocker_id == blockers_table.c.blocker_id)
-        ).order_by(desc(tasks_table.c.task_id))
-
-        tasks = engine.connect().execute(query).fetchall()
-
-        # Format tasks for rendering in template
-        formatted_tasks = [format_task(task) for task in tasks]
+        # The task table is loaded page by page by the browser through `/filter_tasks`
+        # (tasksLookup.js), so the form renders without reading any task
 
-        # Render the create.html with tasks and POS data
-        return render_template("create.html", pos_data=pos_data, tasks=formatted_tasks, date=date)
+        # Render the create.html with POS data
+        return render_template("create.html", pos_data=pos_data, date=date)
 
 @app.route("/api/get_task/<int:task_id>", methods=["GET"])
 @login_required
@@ -507,54 +481,46 @@ def get_task(task_id):
         - JSON error response if task not found or an error occurs.
     """
     try:
-        with engine.connect() as conn:
-            query = select(
-                tasks_table.c.task_id,
-                tasks_table.c.task_desc,
-                tasks_table.c.task_status,
-                tasks_table.c.task_priority,
-                tasks_table.c.task_start_date,
-                tasks_table.c.task_due_date,
-                tasks_table.c.task_notes,
-                pos_table.c.pos_id,
-                pos_table.c.pos_name,
-                rec_table.c.rec_date,
-                rec_table.c.rec_certified,
-                blockers_table.c.blocker_desc,
-                blockers_table.c.blocker_responsible
-            ).select_from(
-                tasks_table
-                .join(pos_table, tasks_table.c.pos_id == pos_table.c.pos_id)
-                .outerjoin(rec_table, tasks_table.c.rec_id == rec_table.c.rec_id)
-                .outerjoin(blockers_table, tasks_table.c.blocker_id == blockers_table.c.blocker_id)
-            ).where(tasks_table.c.task_id == task_id)
-
-            task = conn.execute(query).fetchone()
-
-            if task:
-                # Format the task details for JSON response
-                task_data = format_task(task)
-                return jsonify({"success": True, "task": task_data})
-            else:
-                return jsonify({"success": False, "message": "Task not found."})
-
+        return jsonify(task_payload(get_db(), task_id))
     except Exception as e:
         logger.error(f"Error fetching task: {traceback.format_exc()}")
         return jsonify({"success": False, "message": "An error occurred while fetching the task."}), 500
 
+def task_payload(conn, task_id):
+    """
+    Fetch the task requested from `/api/get_task`.
+
+    Shared by the route and its async version (asgi.py), which runs it on its own connection.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to run the query on.
+    - task_id (int): The ID of the task to fetch.
+
+    Returns:
+    - payload (dict): The response body.
+    """
+    query = build_task_query(task_id, conn=conn)
+    task = conn.execute(query.statement, query.params).fetchone()
+
+    if task:
+        # Format the task details for JSON response
+        return {"success": True, "task": format_task(task)}
+    return {"success": False, "message": "Task not found."}
+
 @app.route("/modify", methods=["GET", "POST"])
 @login_required
 def modify_task():
     """
-    Handle the modification of an existing task or display the modify task page with existing tasks.
+    Handle the modification of an existing task or display the modify task page.
 
     Methods:
-        GET: Fetches existing tasks and POS data to display on the modification page.
+        GET: Fetches POS data to display the modification page. The task table below the 
+             form is loaded by the browser in pages through `/filter_tasks`.
         POST: Updates the task information in the database. Optionally updates related 
               blocker and reconciliation data.
 
     Returns:
-        - On GET: Render the 'modify.html' template with tasks and POS data.
+        - On GET: Render the 'modify.html' template with POS data.
         - On POST success: Redirect to the modify page.
         - On POST failure: Show an error message and prompt the user to try again.
     """
@@ -593,72 +559,22 @@ def modify_task():
             return redirect("/modify")
 
         try:
-            with engine.connect() as conn:
-                # Update the task in the tasks table
-                task_update = tasks_table.update().where(tasks_table.c.task_id == task_id).values(
-                    pos_id=pos_id,
-                    task_desc=description,
-                    task_status=status,
-                    task_priority=priority,
-                    task_start_date=start_date,
-                    task_due_date=due_date,
-                    task_notes=notes
-                )
-                conn.execute(task_update)
-
-                # Update the related blocker information if provided
-                if blocker_desc or blocker_responsible:
-                    # Check if blocker already exists for this task
-                    blocker_exists = conn.execute(
-                        select(blockers_table.c.blocker_id).where(blockers_table.c.task_id == task_id)
-                    ).fetchone()
-
-                    if blocker_exists:
-                        # Update existing blocker
-                        conn.execute(
-                            blockers_table.update().where(blockers_table.c.task_id == task_id).values(
-                                blocker_desc=blocker_desc,
-                                blocker_responsible=blocker_responsible
-                            )
-                        )
-                    else:
-                        # Insert new blocker if it doesn't exist
-                        conn.execute(
-                            blockers_table.insert().values(
-                                blocker_desc=blocker_desc,
-                                blocker_responsible=blocker_responsible,
-                                task_id=task_id,
-                                pos_id=pos_id
-                            )
-                        )
-
-                # Update reconciliation information if needed
-                if reconciliation_date or certified is not None:
-                    # Check if reconciliation already exists for this task
-                    rec_exists = conn.execute(
-                        select(rec_table.c.rec_id).where(rec_table.c.task_id == task_id)
-                    ).fetchone()
-
-                    if rec_exists:
-                        # Update existing reconciliation
-                        conn.execute(
-                            rec_table.update().where(rec_table.c.task_id == task_id).values(
-                                rec_date=reconciliation_date,
-                                rec_certified=(certified == 'true') if certified else None
-                            )
-                        )
-                    else:
-                        # Insert new reconciliation if it doesn't exist
-                        conn.execute(
-                            rec_table.insert().values(
-                                rec_date=reconciliation_date,
-                                rec_certified=(certified == 'true') if certified else None,
-                                task_id=task_id,
-                                pos_id=pos_id
-                            )
-                        )
-
-                conn.commit()
+            # Applied by the writer process when gunicorn runs one (see writes.py)
+            submit_write(
+                "modify_task",
+                task_id=task_id,
+                pos_id=pos_id,
+                description=description,
+                status=status,
+                priority=priority,
+                start_date=start_date,
+                due_date=due_date,
+                notes=notes,
+                reconciliation_date=reconciliation_date,
+                certified=certified,
+                blocker_desc=blocker_desc,
+                blocker_responsible=blocker_responsible
+            )
             flash("Task modified successfully!")  # Only display success if everything works
             return redirect("/modify")
 
@@ -671,35 +587,11 @@ def modify_task():
         # Fetch POS data for the form dropdown
         pos_data = fetch_pos_data()
 
-        # Fetch tasks similarly to the `/tasks` route to display them on the modify page
-        query = select(
-            tasks_table.c.task_id,
-            tasks_table.c.task_desc,
-            tasks_table.c.task_status,
-            tasks_table.c.task_priority,
-            tasks_table.c.task_start_date,
-            tasks_table.c.task_due_date,
-            tasks_table.c.task_notes,
-            pos_table.c.pos_id,
-            pos_table.c.pos_name,
-            rec_table.c.rec_date,
-            rec_table.c.rec_certified,
-            blockers_table.c.blocker_desc,
-            blockers_table.c.blocker_responsible
-        ).select_from(
-            tasks_table
-            .join(pos_table, tasks_table.c.pos_id == pos_table.c.pos_id)
-            .outerjoin(rec_table, tasks_table.c.rec_id == rec_table.c.rec_id)
-            .outerjoin(blockers_table, tasks_table.c.blocker_id == blockers_table.c.blocker_id)
-        ).order_by(desc(tasks_table.c.task_id))
-
-        tasks = engine.connect().execute(query).fetchall()
-
-        # Format tasks for rendering in template
-        formatted_tasks = [format_task(task) for task in tasks]
+        # The task table is loaded page by page by the browser through `/filter_tasks`
+        # (tasksLookup.js), so the form renders without reading any task
 
-        # Render the modify.html with tasks and POS data
-        return render_template("modify.html", pos_data=pos_data, tasks=formatted_tasks, date=date)
+        # Render the modify.html with POS data
+        return render_template("modify.html", pos_data=pos_data, date=date)
 
 @app.route("/kanban")
 @login_required
@@ -714,8 +606,7 @@ def kanban():
         - Render the 'kanban.html' template with POS data.
     """
     try:
-        with engine.connect() as conn:
-            pos_data = conn.execute(select(pos_table.c.pos_id, pos_table.c.pos_name)).fetchall()
+        pos_data = fetch_pos_data()
 
         return render_template("kanban.html", pos_data=pos_data, date=datetime.today())
     except Exception as e:
@@ -728,82 +619,88 @@ def get_kanban_tasks():
     Fetch all tasks for the Kanban board, with filters.
 
     This route processes filtering options submitted via a JSON request and returns a list 
-    of tasks for rendering on the Kanban board.
+    of tasks for rendering on the Kanban board. With `since`, only the changes made after 
+    that version are returned, so a client refreshing a board it already shows receives 
+    a payload proportional to the number of changes rather than the size of the board.
 
     Request JSON:
-        - search_query (str): Text to search in task descriptions.
+        - search_query (str): Text to search in task descriptions. Each word is matched as a 
+          prefix through the full-text index and the best matches come first.
         - pos_id (int): POS ID to filter by.
         - pos_name (str): POS Name to filter by.
         - start_date (str): Start date to filter tasks from.
         - end_date (str): End date to filter tasks until.
         - statuses (list): List of task statuses to filter by.
         - priorities (list): List of task priorities to filter by.
+        - due (str): Due date bucket computed by the server: 'overdue' (not done), 'today', 
+          'this_week' (tomorrow to Sunday) or 'later'.
+        - since (int): Optional version returned by a previous call with the same filters.
 
     Returns:
-        - JSON response with filtered tasks.
+        - JSON response with the filtered tasks and the current version, or a 400 error
+          if a filter value or `since` is invalid. In `since` mode, 
+          `tasks` holds only the new or changed tasks matching the filters and `removed` the 
+          ids of tasks to drop from the board. Without change tracking, or when `since` is 
+          ahead of the database, the full list is returned without `removed`.
     """
-    try:
-        data = request.get_json()
-        search_query = data.get("search_query", "").strip()
-        pos_id = data.get("pos_id")
-        pos_name = data.get("pos_name", "").strip()
-        start_date = data.get("start_date")
-        end_date = data.get("end_date")
-        statuses = data.get("statuses", [])
-        priorities = data.get("priorities", [])
-
-        with engine.connect() as conn:
-            query = select(
-                tasks_table.c.task_id,
-                tasks_table.c.task_desc,
-                tasks_table.c.task_status,
-                tasks_table.c.task_priority,
-                tasks_table.c.task_due_date,
-                pos_table.c.pos_id,
-                pos_table.c.pos_name
-            ).select_from(
-                tasks_table.join(pos_table, tasks_table.c.pos_id == pos_table.c.pos_id)
-            )
+    data = request.get_json()
 
-            conditions = []
-            if search_query:
-                conditions.append(tasks_table.c.task_desc.ilike(f"%{search_query}%"))
-            if pos_id:
-                conditions.append(pos_table.c.pos_id == pos_id)
-            if pos_name:
-                conditions.append(pos_table.c.pos_name.ilike(f"%{pos_name}%"))
-            if start_date:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                conditions.append(tasks_table.c.task_due_date >= start_date)
-            if end_date:
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                conditions.append(tasks_table.c.task_due_date <= end_date)
-            if statuses:
-                conditions.append(tasks_table.c.task_status.in_(statuses))
-            if priorities:
-                conditions.append(tasks_table.c.task_priority.in_(priorities))
-
-            if conditions:
-                query = query.where(and_(*conditions))
-
-            tasks = conn.execute(query).fetchall()
-
-        tasks_list = [
-            {
-                "task_id": task.task_id,
-                "task_desc": task.task_desc,
-                "task_status": task.task_status,
-                "task_priority": task.task_priority,
-                "task_due_date": task.task_due_date.strftime('%Y-%m-%d') if task.task_due_date else "n/a",
-                "pos_id": task.pos_id,
-                "pos_name": task.pos_name
-            } for task in tasks
-        ]
-        return jsonify({"tasks": tasks_list})
+    if data is None:
+        logger.error("No data received in request")
+        return jsonify({"error": "No data received"}), 400
 
+    try:
+        return json_response(kanban_tasks_payload(get_db(), data))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
+        logger.error(f"Error fetching Kanban tasks: {traceback.format_exc()}")
         return jsonify({"error": "Failed to fetch tasks."}), 500
 
+def kanban_tasks_payload(conn, data):
+    """
+    Fetch the Kanban board tasks requested from `/api/kanban_tasks`.
+
+    Shared by the route and its async version (asgi.py), which runs it on its own connection.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to run the queries on.
+    - data (dict): The request JSON.
+
+    Returns:
+    - payload (dict): The response body.
+
+    Raises:
+    - ValueError: If a filter value or `since` is invalid.
+    """
+    task_filter = TaskFilter.from_json(data, strict=True)
+    since = data.get("since")
+    if since is not None:
+        try:
+            since = int(since)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid since version: {since!r}")
+
+    # Read the version before the tasks: a change committed in between is sent
+    # again on the next sync rather than being skipped.
+    version = current_task_version(conn)
+
+    removed = None
+    if since is not None and version is not None and 0 <= since <= version:
+        query = build_kanban_tasks_query(task_filter, changed_since=True, conn=conn)
+        tasks, removed = fetch_task_changes(conn, query, since)
+    else:
+        query = build_kanban_tasks_query(task_filter, conn=conn)
+        tasks = conn.execute(query.statement, query.params).fetchall()
+
+    # Only the due date is shown as 'n/a' on the cards; other missing values stay null
+    tasks_list = serialize_rows(tasks, query.statement.selected_columns.keys(), KANBAN_FIELDS, keep_null=KANBAN_NULL_FIELDS)
+
+    payload = {"tasks": tasks_list, "version": version}
+    if removed is not None:
+        payload["removed"] = removed
+    return payload
+
 @app.route("/api/update_task_status/<int:task_id>", methods=["POST"])
 @login_required
 def update_task_status(task_id):
@@ -817,44 +714,37 @@ def update_task_status(task_id):
         - status (str): The new status of the task.
 
     Returns:
-        - JSON response indicating success or failure.
+        - JSON response indicating success or failure; on success, `status` is the status saved, which is a
+          later one when the writer coalesced this update with the next moves of the card (see writes.py).
     """
-    logger.debug(f"Received request to update task with ID: {task_id}")
+    logger.debug("Received request to update task with ID: %s", task_id)
 
     # Retrieve the new status from the request
     new_status = request.json.get('status')
-    logger.debug(f"New status from request for task {task_id}: {new_status}")
+    logger.debug("New status from request for task %s: %s", task_id, new_status)
 
     # Check if new_status is valid
     if not new_status:
         logger.error(f"No status provided for task {task_id}")
         return jsonify(success=False, message="No status provided"), 400
+    # Checked here rather than by the database, so an invalid status cannot fail the updates coalesced with it
+    if new_status not in TASK_STATUSES:
+        logger.error(f"Invalid status {new_status!r} for task {task_id}")
+        return jsonify(success=False, message="Invalid status"), 400
 
     try:
-        with engine.connect() as conn:
-            logger.debug(f"Executing update query for task {task_id} to set status to {new_status}")
-
-            # Execute the update query
-            result = conn.execute(
-                tasks_table.update()
-                .where(tasks_table.c.task_id == task_id)
-                .values(task_status=new_status)
-            )
+        # Applied by the writer process when gunicorn runs one (see writes.py)
+        saved_status = submit_write("update_task_status", task_id=task_id, status=new_status)
 
-            # Check how many rows were affected
-            rows_affected = result.rowcount
-            logger.debug(f"Rows affected by the update for task {task_id}: {rows_affected}")
+        if saved_status is None:
+            logger.error(f"Task {task_id} not found in the database. No rows affected.")
+            return jsonify(success=False, message="Task not found"), 404
 
-            if rows_affected == 0:
-                logger.error(f"Task {task_id} not found in the database. No rows affected.")
-                return jsonify(success=False, message="Task not found"), 404
-
-            conn.commit()  # Commit the transaction
-            logger.debug(f"Successfully committed the status update for task {task_id} to {new_status}")
+        logger.debug("Successfully committed the status update for task %s to %s", task_id, saved_status)
 
         # Log the success response
-        response = jsonify(success=True)
-        logger.debug(f"Returning success response for task {task_id}: {response.json}")
+        response = jsonify(success=True, status=saved_status)
+        logger.debug("Returning success response for task %s", task_id)
         return response
 
     except Exception as e:
@@ -863,6 +753,262 @@ def update_task_status(task_id):
         logger.error(traceback.format_exc())
         return jsonify(success=False, message="Failed to update task status"), 500
 
+@app.route("/api/kanban_summary", methods=["GET"])
+@login_required
+def get_kanban_summary():
+    """
+    Fetch the number of tasks by POS, status and priority, and the number of overdue tasks.
+
+    Served from summary tables the database keeps current on every write, so the Kanban 
+    column headers and the store dashboards load in the same time whatever the number of tasks.
+
+    Query Parameters:
+        pos_id (int): Optional POS ID to restrict the counts to.
+
+    Returns:
+        - JSON response with `counts` (pos_id, task_status, task_priority, count), `overdue` 
+          (pos_id, task_status, count) for the tasks not done whose due date is before `date`, 
+          and the `totals` of both by status. Tasks without a status or priority are counted under ''.
+        - JSON error response if the POS ID is invalid or an error occurs.
+    """
+    pos_id = request.args.get("pos_id")
+    try:
+        pos_id = int(pos_id) if pos_id else None
+    except ValueError:
+        return jsonify(success=False, message="Invalid POS ID"), 400
+
+    try:
+        today = date.today()
+        counts, overdue = fetch_task_summary(get_db(), today, pos_id)
+
+        counts_list = [
+            {"pos_id": row.pos_id, "task_status": row.task_status, "task_priority": row.task_priority, "count": row.task_count}
+            for row in counts
+        ]
+        overdue_list = [{"pos_id": row.pos_id, "task_status": row.task_status, "count": row.task_count} for row in overdue]
+
+        totals = {"tasks": 0, "overdue": 0, "by_status": {}, "overdue_by_status": {}}
+        for item in counts_list:
+            totals["tasks"] += item["count"]
+            totals["by_status"][item["task_status"]] = totals["by_status"].get(item["task_status"], 0) + item["count"]
+        for item in overdue_list:
+            totals["overdue"] += item["count"]
+            totals["overdue_by_status"][item["task_status"]] = totals["overdue_by_status"].get(item["task_status"], 0) + item["count"]
+
+        return jsonify(success=True, date=today.isoformat(), counts=counts_list, overdue=overdue_list, totals=totals)
+
+    except Exception as e:
+        logger.error(f"Error fetching the task summary: {traceback.format_exc()}")
+        return jsonify(success=False, message="Failed to fetch the task summary."), 500
+
+@app.route("/api/at_risk_tasks", methods=["GET"])
+@login_required
+def get_at_risk_tasks():
+    """
+    Fetch the tasks not done that are overdue or due within TASKFLOW_AT_RISK_DAYS days.
+
+    The list is computed once a day by each worker (see at_risk.py), earliest due date first.
+
+    Returns:
+        - JSON response with the day of the list, when it was computed, the number of 
+          at-risk tasks and the first TASKFLOW_AT_RISK_LIMIT of them.
+        - JSON error response if an error occurs.
+    """
+    try:
+        return json_response(dict(at_risk_list.get(), success=True))
+    except Exception as e:
+        logger.error(f"Error fetching the at-risk tasks: {traceback.format_exc()}")
+        return jsonify(success=False, message="Failed to fetch the at-risk tasks."), 500
+
+@app.route("/api/events", methods=["GET"])
+@login_required
+def task_events_stream():
+    """
+    Stream task changes to a Kanban board as server-sent events.
+
+    Each change made through the create, modify and status update routes, by any 
+    worker, is sent as a `task` event with a JSON body (type, task_id, status). 
+    A reconnecting browser sends the ID of the last event it received in the 
+    Last-Event-ID header and first gets the events it missed, or a `resync` event 
+    if it missed too many, then the live events that follow them. Idle streams 
+    send a heartbeat comment.
+
+    Returns:
+        - A text/event-stream response.
+        - JSON error response if the event log is missing or the worker serves 
+          its maximum number of streams.
+    """
+    conn = get_db()
+    if not task_events_available(conn):
+        return jsonify(success=False, message="Task events are not available."), 503
+
+    # Subscribe before reading the missed events, so none is committed between the replay and the live events
+    subscriber = broadcaster.subscribe(conn)
+    if subscriber is None:
+        return jsonify(success=False, message="Too many event streams."), 503
+
+    # Read the missed events now: the request's connection is released before the stream runs
+    replay = []
+    replayed_id = None
+    last_event_id = request.headers.get("Last-Event-ID", type=int)
+    if last_event_id is not None:
+        try:
+            missed = read_events_since(conn, last_event_id, limit=EVENTS_BUFFER_SIZE + 1)
+        except Exception:
+            broadcaster.unsubscribe(subscriber)
+            raise
+        if len(missed) > EVENTS_BUFFER_SIZE:
+            replay = [format_resync()]
+        else:
+            replay = [format_event(event) for event in missed]
+            # The live events already replayed are skipped
+            replayed_id = missed[-1].event_id if missed else last_event_id
+
+    response = Response(event_stream(subscriber, replay, replayed_id), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@app.route("/api/update_task_statuses", methods=["POST"])
+@login_required
+def update_task_statuses():
+    """
+    Update the status of several tasks at once, e.g. after a multi-select drag on the Kanban board.
+
+    All valid updates are applied in a single transaction with one executemany, so moving 
+    hundreds of tasks costs one request and one commit. Invalid entries are reported and 
+    skipped; if the transaction fails, nothing is applied.
+
+    Request JSON:
+        - updates (list): Objects with `task_id` (int) and `status` (str, one of the task 
+          statuses). Up to MAX_BULK_STATUS_UPDATES entries; for a task listed twice, the 
+          last entry wins.
+
+    Returns:
+        - JSON response with `updated` (number of tasks changed) and `results`, one per 
+          entry, with the task_id, status and outcome: 'updated', 'unchanged' (already in 
+          that status), 'not_found' or 'invalid'.
+        - JSON error response if the request is malformed or the update fails.
+    """
+    data = request.get_json(silent=True) or {}
+    updates = data.get("updates")
+    if not isinstance(updates, list) or not updates:
+        return jsonify(success=False, message="No updates provided"), 400
+    if len(updates) > MAX_BULK_STATUS_UPDATES:
+        return jsonify(success=False, message=f"At most {MAX_BULK_STATUS_UPDATES} updates per request"), 400
+
+    # Validate every entry before touching the database
+    malformed = []
+    results = {}
+    requested = {}
+    for update in updates:
+        task_id = update.get("task_id") if isinstance(update, dict) else None
+        status = update.get("status") if isinstance(update, dict) else None
+        if not isinstance(task_id, int) or isinstance(task_id, bool):
+            malformed.append({"task_id": task_id, "status": status, "outcome": "invalid"})
+            continue
+        if status not in TASK_STATUSES:
+            results[task_id] = {"task_id": task_id, "status": status, "outcome": "invalid"}
+            requested.pop(task_id, None)
+        else:
+            results.pop(task_id, None)
+            requested[task_id] = status
+
+    try:
+        # Applied by the writer process when gunicorn runs one (see writes.py)
+        outcomes = submit_write("update_task_statuses", requested=requested) if requested else {}
+        for task_id, status in requested.items():
+            results[task_id] = {"task_id": task_id, "status": status, "outcome": outcomes[task_id]}
+        changes = [task_id for task_id, outcome in outcomes.items() if outcome == "updated"]
+
+        logger.debug("Bulk status update: %d of %d tasks updated", len(changes), len(updates))
+        return jsonify(success=True, updated=len(changes), results=malformed + list(results.values()))
+
+    except Exception as e:
+        logger.error(f"Error in bulk status update: {traceback.format_exc()}")
+        return jsonify(success=False, message="Failed to update task statuses"), 500
+
+@app.route("/export_tasks", methods=["POST"])
+@login_required
+def export_tasks():
+    """
+    Export every task matching a filter as a CSV or NDJSON download.
+
+    Takes the same filters as `/filter_tasks`, without pagination. The rows are 
+    streamed from the database to the client in batches (see exporter.py), so 
+    memory use stays flat whatever the size of the export.
+
+    Request JSON:
+        - The filters of `/filter_tasks` (search_query, pos_id, pos_name, start_date, 
+          end_date, statuses, priorities).
+        - format (str): 'csv' (default) or 'ndjson'.
+
+    Returns:
+        - The streamed file, as an attachment named after the export date.
+        - JSON error response if the format is unknown or the export cannot start.
+    """
+    data = request.get_json(silent=True) or {}
+    format = data.get("format") or "csv"
+    if format not in EXPORT_FORMATS:
+        return jsonify(success=False, message=f"Unsupported format '{format}'"), 400
+
+    try:
+        query = build_filtered_tasks_query(TaskFilter.from_json(data))
+        export_query = query.statements.export
+
+        if format == "csv":
+            body = export_csv(export_query, list(export_query.selected_columns.keys()), query.params)
+        else:
+            body = export_ndjson(export_query, query.params)
+
+        response = Response(body, mimetype=EXPORT_FORMATS[format])
+        response.headers["Content-Disposition"] = f"attachment; filename=tasks_{date.today():%Y%m%d}.{format}"
+        # Stop nginx from buffering the download
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    except Exception as e:
+        logger.error(f"Error starting task export: {traceback.format_exc()}")
+        return jsonify(success=False, message="Failed to export tasks."), 500
+
+@app.route("/import_tasks", methods=["POST"])
+@login_required
+def import_tasks_upload():
+    """
+    Import tasks from an uploaded CSV or JSON Lines file.
+
+    The upload is read as a stream and written in chunks (see importer.py), so 
+    large files do not need to fit in memory; Werkzeug spools big uploads to disk.
+
+    Form Data:
+        - file: The CSV (with a header row) or JSONL file to import.
+        - format (str): Optional 'csv' or 'jsonl'; guessed from the file name if omitted.
+        - delimiter (str): Optional CSV field delimiter, ',' by default.
+
+    Returns:
+        - JSON response with the import report (rows read, imported and rejected, 
+          the first errors with their line numbers, and rows per second).
+        - JSON error response if no file is uploaded or the import fails.
+    """
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        return jsonify(success=False, message="No file uploaded"), 400
+
+    format = request.form.get("format") or detect_format(upload.filename)
+    if format not in IMPORT_FORMATS:
+        return jsonify(success=False, message=f"Unsupported format '{format}'"), 400
+    delimiter = request.form.get("delimiter") or ","
+
+    try:
+        # utf-8-sig drops the byte order mark spreadsheet programs put at the start of CSV exports
+        stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+        report = import_tasks(stream, format, delimiter)
+        return jsonify(success=True, **report)
+    except Exception as e:
+        logger.error(f"Error importing tasks: {traceback.format_exc()}")
+        return jsonify(success=False, message="Failed to import tasks."), 500
+
 @app.route("/api/pos_names", methods=["GET"])
 @login_required
 def get_pos_names():
@@ -875,13 +1021,18 @@ def get_pos_names():
     Returns:
         - JSON response with POS names if found.
         - JSON error response if POS ID is not provided or an error occurs.
+
+        Responses come from the POS cache and carry an ETag, so browsers revalidate with a 304.
     """
     pos_id = request.args.get("pos_id")
     if pos_id:
-        with engine.connect() as conn:
-            pos_names = conn.execute(select(pos_table.c.pos_name).where(pos_table.c.pos_id == pos_id)).fetchall()
-        pos_names_list = [pos_name[0] for pos_name in pos_names]
-        return jsonify(success=True, pos_names=pos_names_list)
+        snapshot = get_pos_snapshot()
+        try:
+            pos_name = snapshot.names_by_id.get(int(pos_id))
+        except ValueError:
+            pos_name = None
+        pos_names_list = [pos_name] if pos_name is not None else []
+        return pos_json_response(snapshot, success=True, pos_names=pos_names_list)
     return jsonify(success=False)
 
 @app.route("/api/pos_ids", methods=["GET"])
@@ -896,13 +1047,15 @@ def get_pos_ids():
     Returns:
         - JSON response with POS IDs if found.
         - JSON error response if POS name is not provided or an error occurs.
+
+        Responses come from the POS cache and carry an ETag, so browsers revalidate with a 304.
     """
     pos_name = request.args.get("pos_name")
     if pos_name:
-        with engine.connect() as conn:
-            pos_ids = conn.execute(select(pos_table.c.pos_id).where(pos_table.c.pos_name == pos_name)).fetchall()
-        pos_ids_list = [pos_id[0] for pos_id in pos_ids]
-        return jsonify(success=True, pos_ids=pos_ids_list)
+        snapshot = get_pos_snapshot()
+        pos_id = snapshot.ids_by_name.get(pos_name)
+        pos_ids_list = [pos_id] if pos_id is not None else []
+        return pos_json_response(snapshot, success=True, pos_ids=pos_ids_list)
     return jsonify(success=False)
 
 @app.route("/api/pos_names_and_ids", methods=["GET"])
@@ -914,20 +1067,202 @@ def get_all_pos_names_and_ids():
     Returns:
         - JSON response with all distinct POS names and IDs.
         - JSON error response if an error occurs.
+
+        Responses come from the POS cache and carry an ETag, so browsers revalidate with a 304.
     """
     try:
-        with engine.connect() as conn:
-            pos_names = conn.execute(select(pos_table.c.pos_name).distinct()).fetchall()
-            pos_ids = conn.execute(select(pos_table.c.pos_id).distinct()).fetchall()
-
-        pos_names_list = [pos_name[0] for pos_name in pos_names]
-        pos_ids_list = [pos_id[0] for pos_id in pos_ids]
+        snapshot = get_pos_snapshot()
+        pos_names_list = list(snapshot.ids_by_name)
+        pos_ids_list = list(snapshot.names_by_id)
 
-        return jsonify(success=True, pos_names=pos_names_list, pos_ids=pos_ids_list)
+        return pos_json_response(snapshot, success=True, pos_names=pos_names_list, pos_ids=pos_ids_list)
 
     except Exception as e:
         return jsonify(success=False, message="Failed to fetch POS Names and IDs."), 500
 
+@app.route("/api/pool_stats", methods=["GET"])
+@login_required
+def pool_stats():
+    """
+    Report database connection pool usage for the worker serving the request.
+
+    Used to size the pool: a growing average or maximum checkout wait, or a
+    non-zero number of slow checkouts, means requests are queueing for a connection.
+
+    Returns:
+        - JSON response with checkout counts, wait times in milliseconds and pool status.
+    """
+    return jsonify(success=True, pool=get_pool_stats())
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Expose the request and SQL metrics of all workers in the Prometheus text format.
+
+    Not behind the login, so that Prometheus can scrape it: when TASKFLOW_METRICS_TOKEN 
+    is set, requests must send it as a bearer token.
+
+    Returns:
+        - The metrics as text/plain, or 401 without the expected token.
+    """
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+@app.cli.command("rebuild-search-index")
+def rebuild_search_index_command():
+    """
+    Create the full-text search index if needed and repopulate it from the tasks table.
+
+    Run once on databases created before the index existed, or at any time to
+    resynchronise it: flask --app core.app rebuild-search-index
+    """
+    with db_transaction() as conn:
+        indexed = rebuild_search_index(conn)
+    click.echo(f"Indexed {indexed} tasks.")
+
+@app.cli.command("rebuild-task-view")
+def rebuild_task_view_command():
+    """
+    Recompute the task_view table from the tasks, pos, rec and blockers tables.
+
+    The triggers keep it current; run this if check-task-view reports differences:
+    flask --app core.app rebuild-task-view
+    """
+    with db_transaction() as conn:
+        rows = rebuild_task_view(conn)
+    click.echo(f"Rebuilt the task view with {rows} tasks.")
+
+@app.cli.command("check-task-view")
+@click.option("--repair", is_flag=True, help="Rebuild the view if it differs from the tables.")
+def check_task_view_command(repair):
+    """
+    Fail if the task_view table differs from the tables it copies.
+
+    Lists the tasks whose row is missing, stale or left over and exits with
+    status 1, unless --repair rebuilds the view.
+    """
+    task_ids = check_task_view(get_db())
+    if not task_ids:
+        click.echo("The task view matches the tasks.")
+        return
+
+    shown = ", ".join(str(task_id) for task_id in task_ids[:20])
+    click.echo(f"{len(task_ids)} tasks differ: {shown}{', ...' if len(task_ids) > 20 else ''}")
+    if not repair:
+        raise click.ClickException("The task view is out of date; rerun with --repair to rebuild it.")
+
+    with db_transaction() as conn:
+        rows = rebuild_task_view(conn)
+    click.echo(f"Rebuilt the task view with {rows} tasks.")
+
+@app.cli.command("rebuild-task-summary")
+def rebuild_task_summary_command():
+    """
+    Recompute the task_summary and task_due_summary tables from the tasks table.
+
+    The triggers keep them current; run this if check-task-summary reports differences:
+    flask --app core.app rebuild-task-summary
+    """
+    with db_transaction() as conn:
+        tasks = rebuild_task_summary(conn)
+    click.echo(f"Rebuilt the task summary with {tasks} tasks.")
+
+@app.cli.command("check-task-summary")
+@click.option("--repair", is_flag=True, help="Rebuild the summary if it differs from the tasks.")
+def check_task_summary_command(repair):
+    """
+    Fail if the task counts of the summary tables differ from a full recount of the tasks.
+
+    Lists the counts that are missing, wrong or left over and exits with
+    status 1, unless --repair rebuilds the summary.
+    """
+    differences = check_task_summary(get_db())
+    if not differences:
+        click.echo("The task summary matches the tasks.")
+        return
+
+    shown = ", ".join(f"{table} {key}" for table, key in differences[:20])
+    click.echo(f"{len(differences)} counts differ: {shown}{', ...' if len(differences) > 20 else ''}")
+    if not repair:
+        raise click.ClickException("The task summary is out of date; rerun with --repair to rebuild it.")
+
+    with db_transaction() as conn:
+        tasks = rebuild_task_summary(conn)
+    click.echo(f"Rebuilt the task summary with {tasks} tasks.")
+
+@app.cli.command("db-upgrade")
+def db_upgrade_command():
+    """
+    Apply pending schema migrations. Run at every deploy, before starting the workers.
+    """
+    conn = get_db()
+    applied = upgrade(conn)
+    for version, description in applied:
+        click.echo(f"Applied migration {version}: {description}")
+    click.echo(f"Database is at schema version {get_schema_version(conn)}.")
+
+@app.cli.command("prune-sessions")
+def prune_sessions_command():
+    """
+    Delete the expired sessions. Each worker also does this in the background.
+    """
+    deleted = prune_sessions(get_db())
+    click.echo(f"Deleted {deleted} expired sessions.")
+
+@app.cli.command("prune-events")
+def prune_events_command():
+    """
+    Delete all but the most recent task events. The writer process also does this in the background.
+    """
+    with db_transaction() as conn:
+        deleted = prune_events(conn)
+    click.echo(f"Deleted {deleted} task events.")
+
+@app.cli.command("check-query-plans")
+@click.option("--verbose", is_flag=True, help="Print the full plan of every query.")
+def check_query_plans_command(verbose):
+    """
+    Fail if any route query is planned as a full table scan.
+
+    Runs EXPLAIN QUERY PLAN on a representative query for each route and filter
+    pattern and exits with status 1 if any of them scans a whole table.
+    """
+    failures = 0
+    for name, plan, full_scans in check_query_plans(get_db()):
+        status = "FULL SCAN" if full_scans else "ok"
+        click.echo(f"{status:>9}  {name}")
+        if verbose or full_scans:
+            for detail in plan:
+                click.echo(f"           {detail}")
+        failures += bool(full_scans)
+
+    if failures:
+        raise click.ClickException(f"{failures} route queries fall back to a full table scan.")
+    click.echo("All route queries use an index.")
+
+@app.cli.command("import-tasks")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "format", type=click.Choice(IMPORT_FORMATS), help="File format; guessed from the extension by default.")
+@click.option("--delimiter", default=",", show_default=True, help="CSV field delimiter.")
+@click.option("--chunk-size", default=IMPORT_CHUNK_SIZE, show_default=True, help="Records written per transaction.")
+def import_tasks_command(path, format, delimiter, chunk_size):
+    """
+    Import tasks from a CSV or JSON Lines file.
+
+    Example: flask --app core.app import-tasks q3_reconciliations.csv
+    """
+    with open(path, encoding="utf-8-sig", newline="") as stream:
+        report = import_tasks(stream, format or detect_format(path), delimiter, chunk_size)
+
+    for error in report["errors"]:
+        click.echo(f"line {error['line']}: {error['message']}", err=True)
+    click.echo(
+        f"Imported {report['rows_imported']} of {report['rows_read']} rows "
+        f"({report['rows_rejected']} rejected) in {report['seconds']} s, "
+        f"{report['rows_per_second']} rows/s."
+    )
+
 def errorhandler(e):
     """
     Handle errors by returning a custom error message.
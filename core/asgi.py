@@ -0,0 +1,255 @@
+"""
+asgi.py
+
+This file provides the optional async serving mode. The read routes the task tables, the Kanban board and the POS
+filters call most often run as coroutines on an event loop, reading the database through an async SQLite driver
+(aiosqlite), so a slow filter query waits on its connection without holding a worker thread. Every other route is
+served by the Flask application, mounted unchanged.
+
+Key Components:
+- Async Routes: `/filter_tasks`, `/api/kanban_tasks`, `/api/get_task/<id>` and the three POS lookups. They return
+  the same responses as the Flask routes: the task routes run the very same payload functions (app.py) and query
+  builders (queries.py), through SQLAlchemy's `run_sync`, which lets synchronous Core code await the async driver.
+- Async Engine: Created on first use from DATABASE_URL with the aiosqlite driver, with the pool settings of the
+  sync engine, and disposed when the server shuts down.
+- Sessions: Requests are authenticated from the session table (sessions.py), as `login_required` does. The async
+  routes only read sessions; logins, logouts and the pages refreshing a session's expiry go through Flask.
+- Mounted Flask App: All other paths are handed to the Flask application, which runs in a thread pool of
+  ASGI_WSGI_THREADS threads, so the forms, pages, writes and event streams behave exactly as in the sync mode.
+
+Correlations:
+- Requires starlette, aiosqlite, a2wsgi and uvicorn (requirements.txt); the sync mode does not import this module.
+- Served with `gunicorn -k uvicorn.workers.UvicornWorker core.asgi:app` (see run_taskflow.sh and the Deployment
+  Guide); `python -m benchmarks.routes --client asgi` compares it with the sync mode.
+- The async routes are not timed by /metrics, which instruments the Flask request cycle (metrics.py).
+"""
+
+from a2wsgi import WSGIMiddleware
+from contextlib import asynccontextmanager
+from functools import wraps
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, RedirectResponse, Response
+from starlette.routing import Mount, Route
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from core.app import app as flask_app, filter_tasks_payload, kanban_tasks_payload, task_payload
+from core.helpers import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_QUERY_CACHE_SIZE
+from core.pos_cache import cached_pos_snapshot, refresh_pos_snapshot, POS_CACHE_MAX_AGE
+from core.serializers import encode_json
+from core.sessions import load_session
+import asyncio
+import logging
+import os
+import traceback
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+# The database of the sync engine, opened with the async driver
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+# Threads serving the routes of the mounted Flask app; each Kanban event stream holds one
+ASGI_WSGI_THREADS = int(os.environ.get("TASKFLOW_ASGI_WSGI_THREADS", 16))
+
+_engine = None
+
+# Only one coroutine reloads the POS cache at a time. A thread lock cannot be used here: a coroutine
+# holding it while awaiting the database would block the event loop the others run on.
+_pos_reload_lock = asyncio.Lock()
+
+def get_async_engine():
+    """
+    Get the async engine of the worker, creating it on first use.
+
+    Returns:
+    - engine (SQLAlchemy AsyncEngine): The engine shared by the coroutines of the worker.
+    """
+    global _engine
+
+    if _engine is None:
+        _engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            query_cache_size=DB_QUERY_CACHE_SIZE
+        )
+    return _engine
+
+def _logged_in(conn, sid):
+    stored = load_session(conn, sid)
+    return stored is not None and stored[0].get("user_id") is not None
+
+def login_required(handler):
+    """
+    Decorate async routes to require login, and pass them a database connection.
+
+    Like `login_required` (helpers.py), requests without a logged-in session are
+    redirected to the login page. The connection is returned to the pool when the
+    route returns.
+
+    Parameters:
+    - handler (coroutine function): The route, called with the request and an AsyncConnection.
+
+    Returns:
+    - decorated_handler (coroutine function): The route as registered with Starlette.
+    """
+    @wraps(handler)
+    async def decorated_handler(request):
+        sid = request.cookies.get(flask_app.config["SESSION_COOKIE_NAME"])
+        async with get_async_engine().connect() as conn:
+            if not sid or not await conn.run_sync(_logged_in, sid):
+                return RedirectResponse("/login", status_code=302)
+            return await handler(request, conn)
+    return decorated_handler
+
+def json_response(payload, status=200):
+    """
+    Encode a payload with msgspec, as the Flask routes do, and return it as a JSON response.
+    """
+    return Response(encode_json(payload), status_code=status, media_type="application/json")
+
+async def _read_json(request):
+    # Flask's get_json answers 400 to a body that is not JSON; None stands for that here
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+@login_required
+async def filter_tasks(request, conn):
+    """
+    Async version of `/filter_tasks` (app.py).
+    """
+    data = await _read_json(request)
+    if data is None:
+        logger.error("No data received in request")
+        return JSONResponse({"error": "No data received"}, status_code=400)
+
+    try:
+        return json_response(await conn.run_sync(filter_tasks_payload, data))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error(f"Error fetching filtered tasks: {traceback.format_exc()}")
+        return JSONResponse({"error": "An error occurred while fetching tasks."}, status_code=500)
+
+@login_required
+async def get_kanban_tasks(request, conn):
+    """
+    Async version of `/api/kanban_tasks` (app.py).
+    """
+    data = await _read_json(request)
+    if data is None:
+        logger.error("No data received in request")
+        return JSONResponse({"error": "No data received"}, status_code=400)
+
+    try:
+        return json_response(await conn.run_sync(kanban_tasks_payload, data))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error(f"Error fetching Kanban tasks: {traceback.format_exc()}")
+        return JSONResponse({"error": "Failed to fetch tasks."}, status_code=500)
+
+@login_required
+async def get_task(request, conn):
+    """
+    Async version of `/api/get_task/<task_id>` (app.py).
+    """
+    try:
+        return JSONResponse(await conn.run_sync(task_payload, request.path_params["task_id"]))
+    except Exception as e:
+        logger.error(f"Error fetching task: {traceback.format_exc()}")
+        return JSONResponse({"success": False, "message": "An error occurred while fetching the task."}, status_code=500)
+
+async def get_pos_snapshot(conn):
+    """
+    Async counterpart of `get_pos_snapshot` (pos_cache.py), sharing its cache.
+
+    Parameters:
+    - conn (SQLAlchemy AsyncConnection): Connection used if the cache must be refreshed.
+
+    Returns:
+    - snapshot (PosSnapshot): The current POS data.
+    """
+    snapshot = cached_pos_snapshot()
+    if snapshot is not None:
+        return snapshot
+
+    async with _pos_reload_lock:
+        # Another coroutine may have refreshed the snapshot while this one waited
+        return cached_pos_snapshot() or await conn.run_sync(refresh_pos_snapshot)
+
+def pos_json_response(request, snapshot, **payload):
+    """
+    Async counterpart of `pos_json_response` (pos_cache.py): a JSON response with the
+    snapshot's ETag, or an empty 304 when the browser already has it.
+    """
+    headers = {"ETag": f'"{snapshot.etag}"', "Cache-Control": f"private, max-age={POS_CACHE_MAX_AGE}"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if snapshot.etag in [tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+@login_required
+async def get_pos_names(request, conn):
+    """
+    Async version of `/api/pos_names` (app.py).
+    """
+    pos_id = request.query_params.get("pos_id")
+    if pos_id:
+        snapshot = await get_pos_snapshot(conn)
+        try:
+            pos_name = snapshot.names_by_id.get(int(pos_id))
+        except ValueError:
+            pos_name = None
+        pos_names_list = [pos_name] if pos_name is not None else []
+        return pos_json_response(request, snapshot, success=True, pos_names=pos_names_list)
+    return JSONResponse({"success": False})
+
+@login_required
+async def get_pos_ids(request, conn):
+    """
+    Async version of `/api/pos_ids` (app.py).
+    """
+    pos_name = request.query_params.get("pos_name")
+    if pos_name:
+        snapshot = await get_pos_snapshot(conn)
+        pos_id = snapshot.ids_by_name.get(pos_name)
+        pos_ids_list = [pos_id] if pos_id is not None else []
+        return pos_json_response(request, snapshot, success=True, pos_ids=pos_ids_list)
+    return JSONResponse({"success": False})
+
+@login_required
+async def get_all_pos_names_and_ids(request, conn):
+    """
+    Async version of `/api/pos_names_and_ids` (app.py).
+    """
+    try:
+        snapshot = await get_pos_snapshot(conn)
+        return pos_json_response(
+            request, snapshot, success=True, pos_names=list(snapshot.ids_by_name), pos_ids=list(snapshot.names_by_id)
+        )
+    except Exception as e:
+        return JSONResponse({"success": False, "message": "Failed to fetch POS Names and IDs."}, status_code=500)
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    if _engine is not None:
+        await _engine.dispose()
+
+app = Starlette(
+    routes=[
+        Route("/filter_tasks", filter_tasks, methods=["POST"]),
+        Route("/api/kanban_tasks", get_kanban_tasks, methods=["POST"]),
+        Route("/api/get_task/{task_id:int}", get_task, methods=["GET"]),
+        Route("/api/pos_names", get_pos_names, methods=["GET"]),
+        Route("/api/pos_ids", get_pos_ids, methods=["GET"]),
+        Route("/api/pos_names_and_ids", get_all_pos_names_and_ids, methods=["GET"]),
+        Mount("/", app=WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS))
+    ],
+    lifespan=lifespan
+)
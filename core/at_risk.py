@@ -0,0 +1,174 @@
+"""
+at_risk.py
+
+This file keeps the list of at-risk tasks shown by `/api/at_risk_tasks`: the tasks not done that are overdue or due
+within AT_RISK_DAYS days. The list only changes meaningfully from one day to the next, so each worker computes it
+once a day in a background thread instead of on every request.
+
+Key Components:
+- At-Risk Query: The Kanban board query filtered on the open statuses and a last due date, which SQLite answers
+  with one range of the (task_status, task_due_date) index per status, never a full scan. SQLite orders the
+  matches and keeps the first AT_RISK_LIMIT of them (ORDER BY ... LIMIT); a COUNT(*) over the same filters gives
+  the total, so the tasks beyond the limit are never read.
+- Daily Refresh: A daemon thread per worker process computes the list when the worker starts serving and again
+  shortly after every midnight. A request reading a list computed on a previous day refreshes it itself, so a late
+  or failed refresh never serves yesterday's list.
+
+Correlations:
+- Builds the query with queries.py, like the Kanban board, and serializes it with serializers.py. Its plan is
+  checked by `check-query-plans` (migrations.py).
+- Started with `init_at_risk` in app.py; the due date buckets of the Kanban board are defined in queries.py.
+"""
+
+from core.helpers import get_db
+from core.queries import TaskFilter, build_kanban_tasks_query, OPEN_STATUSES
+from core.serializers import serialize_rows
+from sqlalchemy import select, func, bindparam, Integer
+from datetime import date, datetime, timedelta
+import logging
+import os
+import threading
+import time
+import traceback
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+# Tasks not done are at risk from this many days before their due date
+AT_RISK_DAYS = int(os.environ.get("TASKFLOW_AT_RISK_DAYS", 2))
+
+# Most at-risk tasks kept in the list, earliest due date first; the total is always reported
+AT_RISK_LIMIT = int(os.environ.get("TASKFLOW_AT_RISK_LIMIT", 500))
+
+# Seconds after midnight at which the daily refresh runs, leaving time for the clock to settle
+AT_RISK_REFRESH_DELAY = 60
+
+def build_at_risk_queries(today, days=AT_RISK_DAYS, limit=AT_RISK_LIMIT):
+    """
+    Build the queries of the at-risk tasks and of their number.
+
+    Must run within an application context, where the Kanban board query is built.
+
+    Parameters:
+    - today (date): The day the due dates are compared with.
+    - days (int): Tasks due up to this many days after today are included.
+    - limit (int): Most tasks returned.
+
+    Returns:
+    - statement (SQLAlchemy Select): The tasks, earliest due date first, up to the limit.
+    - count_statement (SQLAlchemy Select): The number of at-risk tasks.
+    - params (dict): The parameters of both.
+    """
+    task_filter = TaskFilter(statuses=OPEN_STATUSES, end_date=today + timedelta(days=days))
+    query = build_kanban_tasks_query(task_filter)
+    columns = query.statement.selected_columns
+    statement = query.statement.order_by(columns.task_due_date, columns.task_id).limit(bindparam("at_risk_limit", type_=Integer))
+    count_statement = select(func.count()).select_from(query.statement.subquery())
+    return statement, count_statement, dict(query.params, at_risk_limit=limit)
+
+def fetch_at_risk_tasks(conn, today, days=AT_RISK_DAYS, limit=AT_RISK_LIMIT):
+    """
+    Read the tasks not done that are overdue or due within a number of days.
+
+    Must run within an application context, where the Kanban board query is built.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to the database.
+    - today (date): The day the due dates are compared with.
+    - days (int): Tasks due up to this many days after today are included.
+    - limit (int): Most tasks returned.
+
+    Returns:
+    - tasks (list): The Kanban fields of the tasks, earliest due date first.
+    - total (int): The number of at-risk tasks, including those beyond the limit.
+    """
+    statement, count_statement, params = build_at_risk_queries(today, days, limit)
+    total = conn.execute(count_statement, params).scalar()
+    rows = conn.execute(statement, params).fetchall()
+    return serialize_rows(rows, statement.selected_columns.keys()), total
+
+class AtRiskList:
+    """
+    The at-risk tasks of the day, refreshed by a background thread in each worker.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.day = None
+        self.tasks = []
+        self.total = 0
+        self.refreshed_at = None
+        self.app = None
+        self._refresher_pid = None
+
+    def refresh(self):
+        """
+        Recompute the list for today.
+
+        Returns:
+        - snapshot (dict): The list, as returned by get.
+        """
+        today = date.today()
+        started = time.perf_counter()
+        with self.app.app_context():
+            tasks, total = fetch_at_risk_tasks(get_db(), today)
+
+        with self.lock:
+            self.day, self.tasks, self.total = today, tasks, total
+            self.refreshed_at = datetime.now().isoformat(timespec="seconds")
+            snapshot = self._snapshot()
+        logger.info("Refreshed %d at-risk tasks in %.1f ms", total, (time.perf_counter() - started) * 1000)
+        return snapshot
+
+    def get(self):
+        """
+        Return the list of today, computing it if it is missing or from a previous day.
+
+        Returns:
+        - snapshot (dict): date, refreshed_at, total and tasks.
+        """
+        with self.lock:
+            if self.day == date.today():
+                return self._snapshot()
+        return self.refresh()
+
+    def _snapshot(self):
+        return {"date": self.day.isoformat(), "refreshed_at": self.refreshed_at, "total": self.total, "tasks": self.tasks}
+
+    def start_refresher(self):
+        """
+        Start the refresh thread of this process, if it is not running yet.
+
+        Called before every request: a forked worker starts its own thread on its first request.
+        """
+        if self._refresher_pid == os.getpid() or self.app is None:
+            return
+        with self.lock:
+            if self._refresher_pid != os.getpid():
+                threading.Thread(target=self._refresh_daily, name="at-risk-refresh", daemon=True).start()
+                self._refresher_pid = os.getpid()
+
+    def _refresh_daily(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing the at-risk tasks: {traceback.format_exc()}")
+            now = datetime.now()
+            next_run = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+            time.sleep((next_run - now).total_seconds() + AT_RISK_REFRESH_DELAY)
+
+# The list of this worker
+at_risk_list = AtRiskList()
+
+def init_at_risk(app):
+    """
+    Attach the at-risk list to the Flask app, whose context its refreshes run in.
+
+    The refresh thread starts with the first request of each worker, after the fork.
+
+    Parameters:
+    - app (Flask): The application serving `/api/at_risk_tasks`.
+    """
+    at_risk_list.app = app
+    app.before_request(at_risk_list.start_refresher)
@@ -0,0 +1,339 @@
+"""
+events.py
+
+This file implements the push channel that tells connected Kanban boards about task changes as they happen, over
+server-sent events (SSE).
+
+Key Components:
+- Event Log: Write routes record a compact event (`task_events` table) in the same transaction as the change, so an
+  event exists exactly when its change was committed, whichever gunicorn worker handled the request.
+- Broadcaster: One background thread per worker, started by the first client, polls the event log and fans new
+  events out to the worker's connected clients. Polling a local table is how the workers share events without
+  any service besides SQLite.
+- Client Buffers: Each client has a bounded queue. A client too slow to keep up has its backlog replaced by a
+  single 'resync' event instead of growing the worker's memory.
+- Streams: Each stream starts by replaying the events missed since the client's Last-Event-ID, sends a heartbeat
+  comment when idle so proxies keep the connection open and dead clients are noticed, and ends after
+  EVENTS_STREAM_LIFETIME seconds so worker threads are handed back; browsers reconnect automatically. A client is
+  subscribed before its replay is read, so an event committed in between reaches it live, and the live events
+  already replayed are skipped.
+- Pruning: The log keeps the EVENTS_RETAINED most recent events. The writer process prunes it every
+  EVENTS_PRUNE_INTERVAL seconds (writes.py); without a writer, `flask --app core.app prune-events` does it.
+
+Correlations:
+- The event table is created by a migration (migrations.py) and pruned by the writer process (writes.py).
+- Events are recorded by the write routes and streamed by the `/api/events` route in app.py.
+- Clients react to an event with a delta sync of their board (sync.py), so a dropped event costs nothing but latency.
+"""
+
+from core.helpers import get_engine
+from sqlalchemy import select, insert, delete, func, table, column, text
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import traceback
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+# Seconds between two reads of the event log by a worker's broadcaster
+EVENTS_POLL_INTERVAL = float(os.environ.get("TASKFLOW_EVENTS_POLL_INTERVAL", 0.5))
+
+# Seconds without events after which a stream sends a heartbeat
+EVENTS_HEARTBEAT_INTERVAL = float(os.environ.get("TASKFLOW_EVENTS_HEARTBEAT_INTERVAL", 15))
+
+# Seconds after which a stream is closed and the browser reconnects with its Last-Event-ID
+EVENTS_STREAM_LIFETIME = float(os.environ.get("TASKFLOW_EVENTS_STREAM_LIFETIME", 300))
+
+# Events buffered per client before its backlog is replaced by a resync
+EVENTS_BUFFER_SIZE = int(os.environ.get("TASKFLOW_EVENTS_BUFFER_SIZE", 100))
+
+# Streams per worker; each one holds a worker thread, so this must stay below gunicorn's --threads
+EVENTS_MAX_CLIENTS = int(os.environ.get("TASKFLOW_EVENTS_MAX_CLIENTS", 8))
+
+# Number of most recent events kept for replay to reconnecting clients
+EVENTS_RETAINED = 10000
+
+# Seconds between two prunings of the event log by the writer process; 0 disables them
+EVENTS_PRUNE_INTERVAL = float(os.environ.get("TASKFLOW_EVENTS_PRUNE_INTERVAL", 60))
+
+task_events = table(
+    "task_events",
+    column("event_id"),
+    column("event_type"),
+    column("task_id"),
+    column("task_status"),
+    column("created_at")
+)
+
+TASK_EVENTS_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS task_events (
+        event_id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        event_type VARCHAR NOT NULL,
+        task_id INTEGER NOT NULL,
+        task_status VARCHAR,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+]
+
+# Set once the event table has been seen in the database, so the check costs nothing afterwards
+_events_available = False
+
+def create_task_events(conn):
+    """
+    Create the event log table if it does not exist yet.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to run the DDL on. The caller commits.
+    """
+    for statement in TASK_EVENTS_DDL:
+        conn.exec_driver_sql(statement)
+
+def task_events_available(conn):
+    """
+    Check whether the database has the event log.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection used for the check.
+
+    Returns:
+    - available (bool): True if the task_events table exists.
+    """
+    global _events_available
+
+    if not _events_available:
+        found = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_events'")
+        ).first()
+        if found:
+            _events_available = True
+        else:
+            logger.warning("Task event log missing; run 'flask --app core.app db-upgrade'")
+    return _events_available
+
+def record_task_event(conn, event_type, task_id, task_status=None):
+    """
+    Record a task change in the event log.
+
+    Must be called on the connection of the transaction making the change, so
+    the event is committed, or rolled back, together with it. Does nothing on
+    databases without the event log.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection of the write transaction.
+    - event_type (str): 'created', 'modified' or 'status'.
+    - task_id (int): The ID of the changed task.
+    - task_status (str): The task's status after the change.
+    """
+    if task_events_available(conn):
+        conn.execute(insert(task_events).values(event_type=event_type, task_id=task_id, task_status=task_status))
+
+def record_task_events(conn, event_type, changes):
+    """
+    Record several task changes of the same type in the event log with one executemany.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection of the write transaction.
+    - event_type (str): 'created', 'modified' or 'status'.
+    - changes (list): (task_id, task_status) of each changed task.
+    """
+    if changes and task_events_available(conn):
+        conn.execute(
+            insert(task_events),
+            [{"event_type": event_type, "task_id": task_id, "task_status": task_status} for task_id, task_status in changes]
+        )
+
+def format_event(event):
+    """
+    Format an event log row as a server-sent event.
+
+    Parameters:
+    - event (SQLAlchemy Row): Row of the task_events table.
+
+    Returns:
+    - message (str): The SSE message, with the event ID used for Last-Event-ID.
+    """
+    data = json.dumps({"type": event.event_type, "task_id": event.task_id, "status": event.task_status})
+    return f"id: {event.event_id}\nevent: task\ndata: {data}\n\n"
+
+def format_resync():
+    """
+    Format the event telling a client that events were dropped and its board must be synced.
+    """
+    return "event: resync\ndata: {}\n\n"
+
+def read_events_since(conn, last_event_id, limit=EVENTS_BUFFER_SIZE):
+    """
+    Read the events recorded after an event ID.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to the database.
+    - last_event_id (int): The ID of the last event already delivered.
+    - limit (int): Maximum number of events returned.
+
+    Returns:
+    - events (list): The events in ID order.
+    """
+    return conn.execute(
+        select(task_events.c.event_id, task_events.c.event_type, task_events.c.task_id, task_events.c.task_status)
+        .where(task_events.c.event_id > last_event_id)
+        .order_by(task_events.c.event_id)
+        .limit(limit)
+    ).fetchall()
+
+class EventSubscriber:
+    """
+    The event buffer of one connected client.
+
+    The broadcaster thread puts (event ID, message) pairs in; the client's stream takes them out.
+    A resync has no event ID.
+    """
+
+    def __init__(self):
+        self.messages = queue.Queue(maxsize=EVENTS_BUFFER_SIZE)
+
+    def deliver(self, event_id, message):
+        """
+        Queue a message for the client without ever blocking the broadcaster.
+
+        When the buffer is full, its content is dropped and replaced by a resync
+        event: the client fetches the changes itself instead of receiving them.
+        """
+        try:
+            self.messages.put_nowait((event_id, message))
+        except queue.Full:
+            while True:
+                try:
+                    self.messages.get_nowait()
+                except queue.Empty:
+                    break
+            self.messages.put_nowait((None, format_resync()))
+
+class EventBroadcaster:
+    """
+    Fans the events of the log out to the clients connected to this worker.
+
+    The polling thread only runs while at least one client is connected.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.last_event_id = None
+
+    def subscribe(self, conn):
+        """
+        Register a new client and start the polling thread if needed.
+
+        A new thread starts from the current end of the log, read before this returns,
+        so the events the client's replay reads afterwards overlap the live ones
+        instead of leaving a gap.
+
+        Parameters:
+        - conn (SQLAlchemy Connection): Connection used to read the end of the log.
+
+        Returns:
+        - subscriber (EventSubscriber): The client's buffer, or None if the
+          worker already serves EVENTS_MAX_CLIENTS streams.
+        """
+        with self.lock:
+            if len(self.subscribers) >= EVENTS_MAX_CLIENTS:
+                return None
+            subscriber = EventSubscriber()
+            self.subscribers.add(subscriber)
+            if self.thread is None or not self.thread.is_alive():
+                self.last_event_id = conn.execute(select(func.coalesce(func.max(task_events.c.event_id), 0))).scalar()
+                self.thread = threading.Thread(target=self.run, name="task-events", daemon=True)
+                self.thread.start()
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        """
+        Remove a disconnected client.
+        """
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def run(self):
+        """
+        Poll the event log and deliver new events until no client is left.
+        """
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    # The next thread starts from the end of the log again
+                    self.thread = None
+                    return
+                subscribers = list(self.subscribers)
+
+            try:
+                with get_engine().connect() as conn:
+                    events = read_events_since(conn, self.last_event_id)
+                for event in events:
+                    message = format_event(event)
+                    for subscriber in subscribers:
+                        subscriber.deliver(event.event_id, message)
+                    self.last_event_id = event.event_id
+            except Exception as e:
+                logger.error(f"Error polling task events: {traceback.format_exc()}")
+
+            time.sleep(EVENTS_POLL_INTERVAL)
+
+def prune_events(conn):
+    """
+    Delete all but the EVENTS_RETAINED most recent events.
+
+    Run by the writer process every EVENTS_PRUNE_INTERVAL seconds, or by the
+    `prune-events` command. Does nothing on databases without the event log.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection of the write transaction. The caller commits.
+
+    Returns:
+    - deleted (int): The number of events deleted.
+    """
+    if not task_events_available(conn):
+        return 0
+    newest = conn.execute(select(func.max(task_events.c.event_id))).scalar()
+    if newest and newest > EVENTS_RETAINED:
+        return conn.execute(delete(task_events).where(task_events.c.event_id <= newest - EVENTS_RETAINED)).rowcount
+    return 0
+
+def event_stream(subscriber, replay, replayed_id=None):
+    """
+    Generate the messages of one client's stream.
+
+    Parameters:
+    - subscriber (EventSubscriber): The client's buffer, released when the stream ends.
+    - replay (list): Messages to send before the live events (missed events or a resync).
+    - replayed_id (int): ID of the last event of the replay; live events up to it are skipped.
+
+    Yields:
+    - message (str): SSE messages and heartbeat comments.
+    """
+    try:
+        # Reconnect quickly after the stream is closed at the end of its lifetime
+        yield "retry: 2000\n\n"
+        for message in replay:
+            yield message
+
+        closes_at = time.monotonic() + EVENTS_STREAM_LIFETIME
+        while time.monotonic() < closes_at:
+            try:
+                event_id, message = subscriber.messages.get(timeout=EVENTS_HEARTBEAT_INTERVAL)
+            except queue.Empty:
+                yield ": heartbeat\n\n"
+                continue
+            if event_id is None or replayed_id is None or event_id > replayed_id:
+                yield message
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+# The broadcaster of this worker
+broadcaster = EventBroadcaster()
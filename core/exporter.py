@@ -0,0 +1,115 @@
+"""
+exporter.py
+
+This file implements the export of every task matching a filter, as CSV or newline-delimited JSON (NDJSON), for
+audits and reporting. Exports can cover the whole tasks table, so nothing is ever held in memory beyond one batch.
+
+Key Components:
+- Streaming Read: The filtered query runs on a dedicated connection with `stream_results` and `yield_per`, so rows
+  are fetched from SQLite EXPORT_BATCH_SIZE at a time instead of being materialised with fetchall().
+- Streaming Formats: Generators that turn each batch into CSV or NDJSON text as soon as it is read. The CSV header
+  is sent before the query runs, so the client receives the first bytes immediately.
+
+Correlations:
+- Uses the same filter query builder as `/filter_tasks` (queries.py), so an export contains exactly the tasks
+  the user sees when paging through the filtered table.
+- Used by the `/export_tasks` route in app.py.
+"""
+
+from core.helpers import get_engine
+from datetime import date
+import csv
+import io
+import json
+import logging
+import traceback
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the database and written to the response at a time
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+def stream_rows(query, params=None):
+    """
+    Run a query on its own connection and yield its rows in batches.
+
+    The connection is checked out when the first batch is requested and
+    returned to the pool when the generator finishes or is closed, which is
+    also what happens when the client disconnects mid-download. The request's
+    connection cannot be used: it is released before a streamed response runs.
+
+    Parameters:
+    - query (SQLAlchemy Select): The query to export.
+    - params (dict): The values of the query's bound parameters.
+
+    Yields:
+    - (columns, rows): The column names and a list of up to EXPORT_BATCH_SIZE rows.
+    """
+    with get_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(query, params)
+        columns = list(result.keys())
+        for rows in result.partitions():
+            yield columns, rows
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def _json_value(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Cannot export {type(value).__name__}")
+
+def export_csv(query, columns, params=None):
+    """
+    Generate a CSV export of a query, batch by batch.
+
+    Parameters:
+    - query (SQLAlchemy Select): The query to export.
+    - columns (list): Names of the query's columns, written as the header row.
+    - params (dict): The values of the query's bound parameters.
+
+    Yields:
+    - chunk (str): The header, then the CSV text of each batch of rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(columns)
+    yield buffer.getvalue()
+
+    try:
+        for _, rows in stream_rows(query, params):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_csv_value(value) for value in row] for row in rows)
+            yield buffer.getvalue()
+    except Exception as e:
+        # The status line is already sent; the truncated file and the log are all that can report it
+        logger.error(f"Error exporting tasks: {traceback.format_exc()}")
+
+def export_ndjson(query, params=None):
+    """
+    Generate an NDJSON export of a query, one JSON object per row, batch by batch.
+
+    Parameters:
+    - query (SQLAlchemy Select): The query to export.
+    - params (dict): The values of the query's bound parameters.
+
+    Yields:
+    - chunk (str): The lines of each batch of rows.
+    """
+    try:
+        for columns, rows in stream_rows(query, params):
+            yield "".join(json.dumps(dict(zip(columns, row)), default=_json_value) + "\n" for row in rows)
+    except Exception as e:
+        logger.error(f"Error exporting tasks: {traceback.format_exc()}")
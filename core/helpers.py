@@ -2,11 +2,12 @@
 helpers.py
 
 This file serves as the utility hub for the task management application. It includes helper functions for interacting with the 
-SQLite database, handling pagination, fetching POS data, formatting tasks for display, and managing user sessions. 
+SQLite database, handling pagination, formatting tasks for display, and managing user sessions. 
 
 Key Components:
-- Database Setup: Establishes a connection to the SQLite database and reflects its schema.
-- Helper Functions: Includes utility functions for pagination, POS data retrieval, and task formatting.
+- Database Setup: Declares the table definitions and creates the SQLite engine lazily on first use.
+- Request-Scoped Connections: Hands out one pooled connection per request and releases it on teardown.
+- Helper Functions: Includes utility functions for pagination cursors and task formatting.
 - Decorators and Error Handling: Contains decorators for route protection and rendering apology messages.
 
 Dependencies:
@@ -15,111 +16,339 @@ Dependencies:
 - Logging: Facilitates error logging for debugging and monitoring purposes.
 """
 
-from flask import redirect, render_template, session
+from flask import g, redirect, render_template, session
+from contextlib import contextmanager
 from functools import wraps
-from sqlalchemy import create_engine, MetaData, Table, select, func
+from sqlalchemy import (
+    create_engine, MetaData, Table, Column, Integer, String, Date, Boolean, ForeignKey, CheckConstraint
+)
 from sqlalchemy.orm import sessionmaker
+from core.logs import configure_logging
 from datetime import date
-from math import ceil
+import base64
+import json
 import logging
 import os
-import traceback
-
-# Configure logging to overwrite the log file at each run
-logging.basicConfig(
-    filename='app.log',
-    level=logging.DEBUG,
-    format='%(asctime)s %(levelname)s:%(message)s',
-    filemode='w'
-)
+import threading
+import time
+
+# Send all logging through the background writer (see logs.py)
+configure_logging()
 
 # Create a logger object
 logger = logging.getLogger(__name__)
 
 # Set up SQLAlchemy to connect to the SQLite database
-# Using SQLAlchemy to establish a connection with the database, 
-# making it possible to query and manipulate data using ORM methods.
+# The engine is created on first use (see get_engine), so importing this module,
+# and therefore booting a worker, never touches the database.
 
-# Create an absolute path for the database
+# Create an absolute path for the database. The file is opened read-write without
+# create, so a missing or misplaced database fails the first request loudly instead
+# of SQLite silently creating an empty file. DATABASE_URL overrides the default.
 base_dir = os.path.abspath(os.path.dirname(__file__))
 database_path = os.path.join(base_dir, 'taskflow.db')
-DATABASE_URL = f"sqlite:///{database_path}"
-
-try:
-    engine = create_engine(DATABASE_URL, echo=False)
-    metadata = MetaData()
-    metadata.reflect(bind=engine)
-except Exception as e:
-    logger.error(f"Error establishing database connection: {traceback.format_exc()}")
-
-# Load tables from the database into SQLAlchemy Table objects
-# Reflects the database schema into Table objects, making it easier 
-# to query and manage the data in those tables.
-
-try:
-    tasks_table = Table('tasks', metadata, autoload_with=engine)
-    pos_table = Table('pos', metadata, autoload_with=engine)
-    rec_table = Table('rec', metadata, autoload_with=engine)
-    blockers_table = Table('blockers', metadata, autoload_with=engine)
-    users_table = Table('users', metadata, autoload_with=engine)
-except Exception as e:
-    logger.error(f"Error reflecting database tables: {traceback.format_exc()}")
+DATABASE_URL = os.environ.get("DATABASE_URL", f"sqlite:///file:{database_path}?mode=rw&uri=true")
+
+# Connection pool sizing, tunable per deployment. Each request holds at most one
+# pooled connection (see get_db), so pool_size + max_overflow bounds the number of
+# requests that can touch the database at the same time.
+DB_POOL_SIZE = int(os.environ.get("TASKFLOW_DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("TASKFLOW_DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("TASKFLOW_DB_POOL_TIMEOUT", 30))
+
+# Compiled SQL kept by the engine, so a statement it has seen before is not compiled
+# again. The task queries use a few hundred entries at most (see queries.py); the
+# rest is headroom for the other routes.
+DB_QUERY_CACHE_SIZE = int(os.environ.get("TASKFLOW_DB_QUERY_CACHE_SIZE", 1500))
+
+# Checkouts waiting longer than this (in seconds) are logged as a sign the pool is too small
+SLOW_CHECKOUT_THRESHOLD = 0.05
+
+# Table definitions
+# Declared to match the schema of taskflow.db instead of being reflected from it at
+# import time. Schema changes go through a migration (migrations.py) and are mirrored here.
+metadata = MetaData()
+
+# Values allowed by the CHECK constraints of the tasks table, for validating input before it reaches them
+TASK_STATUSES = ('Backlog', 'To Do', 'In Progress', 'Done')
+TASK_PRIORITIES = ('None', 'Low', 'Medium', 'High')
+
+users_table = Table(
+    'users', metadata,
+    Column('user_id', Integer, primary_key=True),
+    Column('username', String, nullable=False, unique=True),
+    Column('password_hash', String, nullable=False)
+)
+
+pos_table = Table(
+    'pos', metadata,
+    Column('pos_id', Integer, primary_key=True),
+    Column('pos_name', String, nullable=False, unique=True)
+)
+
+tasks_table = Table(
+    'tasks', metadata,
+    Column('task_id', Integer, primary_key=True),
+    Column('task_desc', String),
+    Column('task_status', String),
+    Column('task_priority', String),
+    Column('task_start_date', Date),
+    Column('task_due_date', Date),
+    Column('task_notes', String),
+    Column('pos_id', Integer, ForeignKey('pos.pos_id'), nullable=False),
+    Column('blocker_id', Integer, ForeignKey('blockers.blocker_id')),
+    Column('rec_id', Integer, ForeignKey('rec.rec_id')),
+    # Stamped by triggers on every change (see sync.py); never written by the application
+    Column('change_version', Integer, nullable=False, server_default='0'),
+    CheckConstraint("task_status IN ('Backlog', 'To Do', 'In Progress', 'Done')"),
+    CheckConstraint("task_priority IN ('None', 'Low', 'Medium', 'High')")
+)
+
+rec_table = Table(
+    'rec', metadata,
+    Column('rec_id', Integer, primary_key=True),
+    Column('rec_date', Date),
+    Column('rec_certified', Boolean),
+    Column('task_id', Integer, ForeignKey('tasks.task_id')),
+    Column('pos_id', Integer, ForeignKey('pos.pos_id')),
+    Column('blocker_id', Integer, ForeignKey('blockers.blocker_id'))
+)
+
+blockers_table = Table(
+    'blockers', metadata,
+    Column('blocker_id', Integer, primary_key=True),
+    Column('blocker_desc', String),
+    Column('blocker_responsible', String),
+    Column('blocker_resolved', Boolean),
+    Column('blocker_res_date', Date),
+    Column('pos_id', Integer, ForeignKey('pos.pos_id')),
+    Column('rec_id', Integer, ForeignKey('rec.rec_id')),
+    Column('task_id', Integer, ForeignKey('tasks.task_id'))
+)
+
+# Flattened copy of tasks joined with pos, rec and blockers, read by the task routes and
+# kept current by triggers (see task_view.py); never written by the application
+task_view_table = Table(
+    'task_view', metadata,
+    Column('task_id', Integer, primary_key=True),
+    Column('task_desc', String),
+    Column('task_status', String),
+    Column('task_priority', String),
+    Column('task_start_date', Date),
+    Column('task_due_date', Date),
+    Column('task_notes', String),
+    Column('pos_id', Integer, nullable=False),
+    Column('pos_name', String),
+    Column('rec_id', Integer),
+    Column('rec_date', Date),
+    Column('rec_certified', Boolean),
+    Column('blocker_id', Integer),
+    Column('blocker_desc', String),
+    Column('blocker_responsible', String),
+    Column('change_version', Integer, nullable=False, server_default='0')
+)
+
+# Task counts by POS, status and priority, and open task counts by due date, read by /api/kanban_summary
+# and kept current by triggers (see task_summary.py). A missing status or priority is stored as ''.
+task_summary_table = Table(
+    'task_summary', metadata,
+    Column('pos_id', Integer, primary_key=True),
+    Column('task_status', String, primary_key=True),
+    Column('task_priority', String, primary_key=True),
+    Column('task_count', Integer, nullable=False)
+)
+
+task_due_summary_table = Table(
+    'task_due_summary', metadata,
+    Column('task_due_date', Date, primary_key=True),
+    Column('pos_id', Integer, primary_key=True),
+    Column('task_status', String, primary_key=True),
+    Column('task_count', Integer, nullable=False)
+)
 
 # Configure session maker
 # Establishes a session factory for interacting with the database, 
-# ensuring queries are executed in the context of a session.
-SessionLocal = sessionmaker(bind=engine)
+# ensuring queries are executed in the context of a session. It is bound
+# to the engine when the engine is created.
+SessionLocal = sessionmaker()
 
-def get_paginated_tasks(base_query, page, per_page):
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
     """
-    Helper function to paginate tasks based on the provided query.
+    Helper function to get the SQLAlchemy engine, creating it on first use.
 
-    This function takes a base SQLAlchemy query, applies pagination, 
-    and returns a subset of results based on the current page and the 
-    number of items per page.
+    Creating the engine does not open a connection; the first connection is
+    made when a request first calls get_db.
 
-    Parameters:
-    - base_query (SQLAlchemy Select): The base query to paginate.
-    - page (int): The current page number.
-    - per_page (int): The number of items to display per page.
+    Returns:
+    - engine (SQLAlchemy Engine): The engine shared by all threads of the worker.
+    """
+    global _engine
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(
+                    DATABASE_URL,
+                    echo=False,
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_MAX_OVERFLOW,
+                    pool_timeout=DB_POOL_TIMEOUT,
+                    query_cache_size=DB_QUERY_CACHE_SIZE
+                )
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+# Running totals of pool checkout wait time, shared by all threads of the worker
+_pool_stats_lock = threading.Lock()
+_pool_stats = {"checkouts": 0, "total_wait": 0.0, "max_wait": 0.0, "slow_checkouts": 0}
+
+def get_db():
+    """
+    Helper function to get the database connection of the current request.
+
+    The first call within a request checks a connection out of the pool and 
+    stores it on Flask's `g`; later calls return the same connection, so a 
+    route can run several queries without holding more than one pooled 
+    connection. The connection is returned to the pool by close_db when the 
+    request ends. The time spent waiting for the pool is recorded for 
+    get_pool_stats.
 
     Returns:
-    - tasks (List): A list of paginated tasks.
-    - total_records (int): The total number of records.
-    - total_pages (int): The total number of pages.
+    - conn (SQLAlchemy Connection): The request's database connection.
+    """
+    if "db_conn" not in g:
+        started = time.perf_counter()
+        g.db_conn = get_engine().connect()
+        wait = time.perf_counter() - started
+        g.db_checkout_wait = wait
+
+        with _pool_stats_lock:
+            _pool_stats["checkouts"] += 1
+            _pool_stats["total_wait"] += wait
+            _pool_stats["max_wait"] = max(_pool_stats["max_wait"], wait)
+            if wait > SLOW_CHECKOUT_THRESHOLD:
+                _pool_stats["slow_checkouts"] += 1
+
+        if wait > SLOW_CHECKOUT_THRESHOLD:
+            logger.warning("Waited %.1f ms for a database connection (%s)", wait * 1000, get_engine().pool.status())
+    return g.db_conn
+
+def close_db(exception=None):
+    """
+    Release the current request's database connection, if one was checked out.
+
+    Registered as an app-context teardown callback by init_db. Closing the 
+    connection rolls back anything left uncommitted and returns it to the pool.
 
-    Note: This function logs an error message if pagination fails and returns empty values.
+    Parameters:
+    - exception (Exception): The exception that ended the request, if any.
+    """
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        conn.close()
+
+@contextmanager
+def db_transaction():
     """
+    Run a block of writes as one transaction on the request's connection.
+
+    Commits when the block finishes and rolls back if it raises, re-raising 
+    the exception for the caller to handle.
+
+    Yields:
+    - conn (SQLAlchemy Connection): The request's database connection.
+    """
+    conn = get_db()
     try:
-        total_records_query = select(func.count()).select_from(base_query.alias())
-        total_records = engine.connect().execute(total_records_query).scalar()
-        total_pages = ceil(total_records / per_page)
-        paginated_query = base_query.limit(per_page).offset((page - 1) * per_page)
-        tasks = engine.connect().execute(paginated_query).fetchall()
-        return tasks, total_records, total_pages
-    except Exception as e:
-        logger.error(f"Error during pagination: {traceback.format_exc()}")
-        return [], 0, 0
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def get_pool_stats():
+    """
+    Helper function to report connection pool usage for this worker.
 
-def fetch_pos_data():
+    Returns:
+    - stats (dict): Number of checkouts, average and maximum checkout wait 
+      in milliseconds, number of slow checkouts, the pool configuration 
+      and current status, and the fill of the compiled statement cache (None
+      if this SQLAlchemy release does not expose it).
     """
-    Helper function to fetch POS data for dropdowns.
+    with _pool_stats_lock:
+        stats = dict(_pool_stats)
+    checkouts = stats["checkouts"]
+    engine = get_engine()
+    pool = engine.pool
+    # Private attribute of SQLAlchemy's engine, so it may be missing from other releases
+    compiled_cache = getattr(engine, "_compiled_cache", None)
+    return {
+        "checkouts": checkouts,
+        "avg_wait_ms": round(stats["total_wait"] / checkouts * 1000, 3) if checkouts else 0.0,
+        "max_wait_ms": round(stats["max_wait"] * 1000, 3),
+        "slow_checkouts": stats["slow_checkouts"],
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "status": pool.status(),
+        "compiled_cache_entries": len(compiled_cache) if compiled_cache is not None else None,
+        "compiled_cache_size": DB_QUERY_CACHE_SIZE
+    }
 
-    Retrieves POS (Point of Sale) data from the database to populate 
-    dropdown menus in the UI, aiding in task filtering and creation.
+def init_db(app):
+    """
+    Register the request-scoped connection handling with the Flask app.
+
+    Parameters:
+    - app (Flask): The application to register the teardown callback on.
+    """
+    app.teardown_appcontext(close_db)
+
+def encode_cursor(values, direction):
+    """
+    Helper function to build an opaque pagination cursor.
+
+    The cursor records the task_id of the boundary row of a page, or the 
+    offset of a search page, and the direction to seek in, encoded as 
+    URL-safe base64 so clients can pass it back without interpreting it.
+
+    Parameters:
+    - values (list): The task_id of the boundary row, or the offset of a search page.
+    - direction (str): 'next' to seek past the row, 'prev' to seek before it.
+
+    Returns:
+    - cursor (str): The encoded cursor.
+    """
+    payload = json.dumps({"k": list(values), "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """
+    Helper function to decode a cursor produced by encode_cursor.
+
+    Parameters:
+    - cursor (str): The opaque cursor received from the client.
 
     Returns:
-    - pos_data (List): A list of tuples containing POS IDs and names.
+    - values (list): The task_id of the boundary row, or the offset of a search page.
+    - direction (str): Either 'next' or 'prev'.
 
-    Note: Logs an error if fetching POS data fails and returns an empty list.
+    Raises:
+    - ValueError: If the cursor is malformed.
     """
     try:
-        with engine.connect() as conn:
-            pos_data = conn.execute(select(pos_table.c.pos_id, pos_table.c.pos_name)).fetchall()
-        return pos_data
-    except Exception as e:
-        logger.error(f"Error fetching POS data: {traceback.format_exc()}")
-        return []
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = payload["k"], payload["d"]
+    except Exception:
+        raise ValueError(f"Invalid pagination cursor: {cursor!r}")
+    if direction not in ("next", "prev") or not isinstance(values, list) or not values:
+        raise ValueError(f"Invalid pagination cursor: {cursor!r}")
+    return values, direction
 
 def format_task(task):
     """
@@ -127,7 +356,8 @@ def format_task(task):
 
     Formats a task object into a dictionary with all relevant fields 
     properly formatted for display purposes, such as converting dates 
-    into readable strings.
+    into readable strings. Meant for single tasks and small pages; JSON 
+    responses with many rows use the compiled serializers of serializers.py.
 
     Parameters:
     - task (SQLAlchemy RowProxy): The task record to format.
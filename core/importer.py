@@ -0,0 +1,292 @@
+"""
+importer.py
+
+This file implements the bulk import of tasks from CSV or JSON Lines files, used to load large batches such as a
+quarter's reconciliation tasks for every store, which would be impractical through the task creation form.
+
+Key Components:
+- Streaming Readers: Read CSV or JSONL records one at a time and hand them over in chunks of IMPORT_CHUNK_SIZE, so
+  memory use depends on the chunk size and not on the size of the file.
+- Validation: Each record is checked like the creation form would (POS resolved by ID or name from the in-memory
+  POS cache, status and priority against the table's CHECK values, dates in YYYY-MM-DD). Rejected records are
+  counted and the first IMPORT_MAX_ERRORS are reported with their line numbers.
+- Batched Inserts: Each chunk is written in one transaction with one executemany per table: tasks, then blockers
+  and reconciliations linked to the new task IDs (returned with RETURNING in input order), then one UPDATE linking
+  the tasks to their blocker and reconciliation.
+
+Record fields (the names of the task creation form):
+- pos_id or pos_name (one is required), description, status, priority, start_date, due_date, notes,
+  blocker_desc, blocker_responsible, reconciliation_date, certified.
+
+Correlations:
+- Used by the `import-tasks` CLI command and the `/import_tasks` upload route in app.py.
+- Imported tasks are announced to Kanban boards through the event log (events.py).
+"""
+
+from core.helpers import db_transaction, tasks_table, blockers_table, rec_table, TASK_STATUSES, TASK_PRIORITIES
+from core.pos_cache import get_pos_snapshot
+from core.events import record_task_events
+from sqlalchemy import insert, update, bindparam
+from datetime import datetime
+from itertools import islice
+import csv
+import json
+import logging
+import time
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+# Records written per transaction
+IMPORT_CHUNK_SIZE = 1000
+
+# Rejected records reported individually; the rest are only counted
+IMPORT_MAX_ERRORS = 100
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+def detect_format(filename):
+    """
+    Guess the import format from a file name.
+
+    Parameters:
+    - filename (str): Name of the file to import.
+
+    Returns:
+    - format (str): 'jsonl' for .jsonl and .ndjson files, 'csv' otherwise.
+    """
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+def read_records(stream, format, delimiter=","):
+    """
+    Read the records of a text stream one at a time.
+
+    Parameters:
+    - stream (text file): The open file to import.
+    - format (str): 'csv' (with a header row) or 'jsonl' (one JSON object per line).
+    - delimiter (str): Field delimiter of CSV files.
+
+    Yields:
+    - (line_number, record): The line of the record and the record as a dict,
+      or an error message instead of the dict for a line that cannot be parsed.
+    """
+    if format == "csv":
+        reader = csv.DictReader(stream, delimiter=delimiter)
+        for record in reader:
+            # line_num is the last line read, the end of records spanning several lines
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, f"Invalid JSON: {e}"
+                continue
+            yield line_number, record if isinstance(record, dict) else "Expected a JSON object"
+
+def _text(record, field):
+    value = record.get(field)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _date(record, field):
+    value = _text(record, field)
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+def parse_record(record, pos):
+    """
+    Validate an import record and convert it to the values to insert.
+
+    Parameters:
+    - record (dict): The record read from the file.
+    - pos (PosSnapshot): The cached POS data used to resolve pos_id and pos_name.
+
+    Returns:
+    - task (dict): The task, blocker and reconciliation values of the record.
+
+    Raises:
+    - ValueError: With a message describing the first problem found.
+    """
+    pos_id = _text(record, "pos_id")
+    pos_name = _text(record, "pos_name")
+    if pos_id:
+        try:
+            pos_id = int(pos_id)
+        except ValueError:
+            raise ValueError(f"Invalid pos_id '{pos_id}'")
+        if pos_id not in pos.names_by_id:
+            raise ValueError(f"Unknown pos_id {pos_id}")
+    elif pos_name:
+        pos_id = pos.ids_by_name.get(pos_name)
+        if pos_id is None:
+            raise ValueError(f"Unknown pos_name '{pos_name}'")
+    else:
+        raise ValueError("pos_id or pos_name is required")
+
+    status = _text(record, "status")
+    if status is not None and status not in TASK_STATUSES:
+        raise ValueError(f"Invalid status '{status}'")
+    priority = _text(record, "priority")
+    if priority is not None and priority not in TASK_PRIORITIES:
+        raise ValueError(f"Invalid priority '{priority}'")
+
+    try:
+        start_date = _date(record, "start_date")
+        due_date = _date(record, "due_date")
+        reconciliation_date = _date(record, "reconciliation_date")
+    except ValueError:
+        raise ValueError("Invalid date format, expected YYYY-MM-DD")
+
+    certified = _text(record, "certified")
+    if certified is not None:
+        certified = certified.lower() in ("true", "1", "yes", "y")
+
+    return {
+        "pos_id": pos_id,
+        "task_desc": _text(record, "description"),
+        "task_status": status,
+        "task_priority": priority,
+        "task_start_date": start_date,
+        "task_due_date": due_date,
+        "task_notes": _text(record, "notes"),
+        "blocker_desc": _text(record, "blocker_desc"),
+        "blocker_responsible": _text(record, "blocker_responsible"),
+        "rec_date": reconciliation_date,
+        "rec_certified": certified
+    }
+
+def insert_chunk(conn, tasks):
+    """
+    Insert a chunk of validated tasks with their blockers and reconciliations.
+
+    Runs one executemany per table. RETURNING with sort_by_parameter_order gives
+    the new IDs in the order of the input rows, which is how blockers and
+    reconciliations are linked to their task without reading anything back.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection of the chunk's transaction.
+    - tasks (list): Values returned by parse_record.
+    """
+    task_ids = conn.execute(
+        insert(tasks_table).returning(tasks_table.c.task_id, sort_by_parameter_order=True),
+        [
+            {
+                "pos_id": task["pos_id"],
+                "task_desc": task["task_desc"],
+                "task_status": task["task_status"],
+                "task_priority": task["task_priority"],
+                "task_start_date": task["task_start_date"],
+                "task_due_date": task["task_due_date"],
+                "task_notes": task["task_notes"]
+            } for task in tasks
+        ]
+    ).scalars().all()
+
+    links = {task_id: {"b_task_id": task_id, "b_blocker_id": None, "b_rec_id": None} for task_id in task_ids}
+
+    # Blockers, as in the creation form: only when a description or a responsible is given
+    with_blocker = [(task_id, task) for task_id, task in zip(task_ids, tasks) if task["blocker_desc"] or task["blocker_responsible"]]
+    if with_blocker:
+        blocker_ids = conn.execute(
+            insert(blockers_table).returning(blockers_table.c.blocker_id, sort_by_parameter_order=True),
+            [
+                {
+                    "blocker_desc": task["blocker_desc"],
+                    "blocker_responsible": task["blocker_responsible"],
+                    "task_id": task_id,
+                    "pos_id": task["pos_id"]
+                } for task_id, task in with_blocker
+            ]
+        ).scalars().all()
+        for (task_id, task), blocker_id in zip(with_blocker, blocker_ids):
+            links[task_id]["b_blocker_id"] = blocker_id
+
+    # Reconciliations: only when a date or a certification is given
+    with_rec = [(task_id, task) for task_id, task in zip(task_ids, tasks) if task["rec_date"] or task["rec_certified"] is not None]
+    if with_rec:
+        rec_ids = conn.execute(
+            insert(rec_table).returning(rec_table.c.rec_id, sort_by_parameter_order=True),
+            [
+                {
+                    "rec_date": task["rec_date"],
+                    "rec_certified": task["rec_certified"],
+                    "task_id": task_id,
+                    "pos_id": task["pos_id"],
+                    "blocker_id": links[task_id]["b_blocker_id"]
+                } for task_id, task in with_rec
+            ]
+        ).scalars().all()
+        for (task_id, task), rec_id in zip(with_rec, rec_ids):
+            links[task_id]["b_rec_id"] = rec_id
+
+    # Link the tasks to their blocker and reconciliation
+    linked = [link for link in links.values() if link["b_blocker_id"] or link["b_rec_id"]]
+    if linked:
+        conn.execute(
+            update(tasks_table)
+            .where(tasks_table.c.task_id == bindparam("b_task_id"))
+            .values(blocker_id=bindparam("b_blocker_id"), rec_id=bindparam("b_rec_id")),
+            linked
+        )
+
+    # Notify connected Kanban boards once the chunk commits
+    record_task_events(conn, "created", [(task_id, task["task_status"]) for task_id, task in zip(task_ids, tasks)])
+
+def import_tasks(stream, format="csv", delimiter=",", chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Import the tasks of a CSV or JSONL stream.
+
+    Each chunk is committed on its own, so an error in the database keeps the
+    chunks already imported; the report says how many rows made it in.
+    Must run in a Flask application context (request or CLI command).
+
+    Parameters:
+    - stream (text file): The open file to import.
+    - format (str): 'csv' or 'jsonl'.
+    - delimiter (str): Field delimiter of CSV files.
+    - chunk_size (int): Records written per transaction.
+
+    Returns:
+    - report (dict): rows_read, rows_imported, rows_rejected, errors (line and
+      message of the first rejected rows), seconds and rows_per_second.
+    """
+    if format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format '{format}'")
+
+    started = time.perf_counter()
+    pos = get_pos_snapshot()
+    records = read_records(stream, format, delimiter)
+    report = {"rows_read": 0, "rows_imported": 0, "rows_rejected": 0, "errors": []}
+
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+
+        tasks = []
+        for line_number, record in chunk:
+            report["rows_read"] += 1
+            try:
+                if isinstance(record, str):
+                    raise ValueError(record)
+                tasks.append(parse_record(record, pos))
+            except ValueError as e:
+                report["rows_rejected"] += 1
+                if len(report["errors"]) < IMPORT_MAX_ERRORS:
+                    report["errors"].append({"line": line_number, "message": str(e)})
+
+        if tasks:
+            with db_transaction() as conn:
+                insert_chunk(conn, tasks)
+            report["rows_imported"] += len(tasks)
+            logger.debug("Imported %d tasks so far", report["rows_imported"])
+
+    seconds = time.perf_counter() - started
+    report["seconds"] = round(seconds, 3)
+    report["rows_per_second"] = round(report["rows_imported"] / seconds, 1) if seconds else 0.0
+    logger.info("Imported %d tasks (%d rejected) in %.2f s", report["rows_imported"], report["rows_rejected"], seconds)
+    return report
@@ -0,0 +1,170 @@
+"""
+logs.py
+
+This file configures the application's logging so that logging can stay enabled in production without slowing
+requests down.
+
+Key Components:
+- Queued Writes: Loggers hand records to a QueueHandler, which puts them on an in-memory queue. A single
+  QueueListener thread per process writes them to the log file, so request threads never wait on file I/O.
+- Lazy Formatting: Messages use %-style arguments, so records below the configured level are never formatted.
+  Kept records are formatted by the QueueHandler on the calling thread: formatting them on the writer thread
+  instead was measured to raise tail latency, as the two threads then compete for the GIL.
+- Levels: A root level (TASKFLOW_LOG_LEVEL) and per-module overrides (TASKFLOW_LOG_LEVELS), e.g.
+  "core.events=DEBUG,werkzeug=WARNING".
+- Sampling: High-volume DEBUG messages can be sampled (TASKFLOW_LOG_DEBUG_SAMPLE): for each message template, the
+  first occurrence is kept and then one in N. Warnings and errors are never sampled.
+- Output: The log file (TASKFLOW_LOG_FILE, core/app.log by default) is opened in append mode, so restarting a worker
+  does not erase the history, and reopened when an external tool such as logrotate moves it. Lines are plain text or
+  one JSON object per line (TASKFLOW_LOG_FORMAT=json) for log collectors.
+
+Correlations:
+- `configure_logging` is called when helpers.py is imported, which every entry point (app, CLI, benchmarks) does.
+- Gunicorn workers are forked processes: each child gets its own queue and listener thread after the fork.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+# Where the log is written, next to the database by default
+LOG_FILE = os.environ.get("TASKFLOW_LOG_FILE", os.path.join(os.path.abspath(os.path.dirname(__file__)), "app.log"))
+
+# Level of every logger without an override
+LOG_LEVEL = os.environ.get("TASKFLOW_LOG_LEVEL", "INFO").upper()
+
+# Per-module overrides, as comma-separated logger=LEVEL pairs
+LOG_LEVELS = os.environ.get("TASKFLOW_LOG_LEVELS", "")
+
+# Keep one in this many occurrences of each DEBUG message; 1 keeps them all
+LOG_DEBUG_SAMPLE = max(int(os.environ.get("TASKFLOW_LOG_DEBUG_SAMPLE", 1)), 1)
+
+# 'text' or 'json'
+LOG_FORMAT = os.environ.get("TASKFLOW_LOG_FORMAT", "text").lower()
+
+TEXT_FORMAT = "%(asctime)s %(process)d %(levelname)s %(name)s: %(message)s"
+
+_listener = None
+_configure_lock = threading.Lock()
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep the first occurrence of each DEBUG message template and then one in `every`.
+
+    Templates are the unformatted messages (`record.msg`), so messages logged
+    with %-style arguments are grouped however their values differ. Records
+    above DEBUG always pass.
+    """
+
+    # Templates tracked before the counts start over, so messages built with f-strings cannot grow it forever
+    MAX_TEMPLATES = 10000
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = every
+        self.counts = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.every <= 1:
+            return True
+        key = (record.name, record.msg)
+        if len(self.counts) >= self.MAX_TEMPLATES and key not in self.counts:
+            self.counts.clear()
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+        return count % self.every == 0
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.process,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def parse_levels(spec):
+    """
+    Parse per-module log levels.
+
+    Parameters:
+    - spec (str): Comma-separated logger=LEVEL pairs, e.g. "core.events=DEBUG,werkzeug=WARNING".
+
+    Returns:
+    - levels (dict): Logger name to level name; malformed pairs are ignored.
+    """
+    levels = {}
+    for pair in spec.split(","):
+        name, _, level = pair.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def _build_file_handler():
+    # Append, and reopen the file if logrotate moved it
+    handler = logging.handlers.WatchedFileHandler(LOG_FILE, mode="a", encoding="utf-8", delay=True)
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+def _start_listener(log_queue):
+    global _listener
+
+    _listener = logging.handlers.QueueListener(log_queue, _build_file_handler(), respect_handler_level=True)
+    _listener.start()
+
+def _restart_in_child(handler):
+    handler.queue = queue.SimpleQueue()
+    _start_listener(handler.queue)
+
+def stop_logging():
+    """
+    Write out the queued records and stop this process's listener thread.
+    """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+def configure_logging():
+    """
+    Route all logging through the queue and start the writer thread.
+
+    Safe to call more than once: only the first call in a process has an effect.
+    """
+    with _configure_lock:
+        root = logging.getLogger()
+        if any(isinstance(handler, logging.handlers.QueueHandler) for handler in root.handlers):
+            return
+
+        log_queue = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(log_queue)
+        if LOG_DEBUG_SAMPLE > 1:
+            handler.addFilter(SamplingFilter(LOG_DEBUG_SAMPLE))
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        for name, level in parse_levels(LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _start_listener(log_queue)
+        atexit.register(stop_logging)
+
+        # Neither the listener thread nor the queue it was waiting on survive fork(): give each
+        # forked worker a fresh queue, which also leaves the parent's unwritten records to the parent
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=lambda: _restart_in_child(handler))
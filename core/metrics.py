@@ -0,0 +1,378 @@
+"""
+metrics.py
+
+This file implements the request and SQL instrumentation: how long each route takes, how many queries it runs and
+where the time goes, exposed to Prometheus and to the browser's developer tools.
+
+Key Components:
+- Request Timings: Each request gets a small timings object (held in a context variable) that the hooks below fill
+  in: SQL time and query count from SQLAlchemy's cursor events, template time from Flask's template signals,
+  serialization time from serializers.py and the pool checkout wait recorded by get_db.
+- Server-Timing: Every response carries a Server-Timing header splitting its time into db, pool, serialize and
+  template, shown per request in the browser's network panel.
+- Registry: Per-worker totals: a latency histogram and status counts per endpoint, and query counts, phase times and
+  compiled cache lookups per endpoint. Updating it takes one lock per request; nothing is done per query beyond two
+  clock reads and a counter.
+- Compiled Cache: Every statement SQLAlchemy executes is looked up in the engine's cache of compiled SQL. Queries are
+  counted as hits, misses (compiled for this request), or uncached (raw SQL, which needs no compiling), so a route
+  whose statements miss on every request stands out.
+- Worker Snapshots: Gunicorn workers are separate processes, so each one writes its registry to its own file in
+  METRICS_DIR at most every METRICS_FLUSH_INTERVAL seconds. `/metrics`, whichever worker serves it, adds up all
+  the snapshot files and renders them in the Prometheus text format.
+
+Correlations:
+- `init_metrics` is called by app.py, which also defines the `/metrics` route.
+- Streamed responses (exports, event streams) are timed until their first byte is ready, not until they finish.
+"""
+
+from flask import g, request, before_render_template, template_rendered
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.interfaces import CacheStats
+from bisect import bisect_left
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import traceback
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+# Directory shared by the workers for their snapshots; clear it when deploying a new release
+METRICS_DIR = os.environ.get("TASKFLOW_METRICS_DIR", os.path.join(tempfile.gettempdir(), "taskflow-metrics"))
+
+# Seconds between two snapshots of a worker's registry; /metrics lags behind by at most this much
+METRICS_FLUSH_INTERVAL = float(os.environ.get("TASKFLOW_METRICS_FLUSH_INTERVAL", 5))
+
+# Snapshots of workers that exited are dropped after this many seconds
+METRICS_RETENTION = float(os.environ.get("TASKFLOW_METRICS_RETENTION", 3600))
+
+# Bearer token required by /metrics when set
+METRICS_TOKEN = os.environ.get("TASKFLOW_METRICS_TOKEN")
+
+# Whether responses carry the Server-Timing header
+SERVER_TIMING = os.environ.get("TASKFLOW_SERVER_TIMING", "1") != "0"
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Phases of a request reported in Server-Timing and /metrics, besides the SQL time
+PHASES = ("pool", "serialize", "template")
+
+# Results of the compiled cache lookup of a query, as counted in /metrics
+CACHE_RESULTS = ("hit", "miss", "uncached")
+_CACHE_RESULT_INDEX = {CacheStats.CACHE_HIT: 0, CacheStats.CACHE_MISS: 1}
+
+class RequestTimings:
+    """
+    The time spent in each phase of one request.
+    """
+
+    __slots__ = ("started", "db_time", "db_count", "db_cache", "phases", "template_started")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.db_count = 0
+        self.db_cache = [0] * len(CACHE_RESULTS)
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.template_started = None
+
+_current_timings = ContextVar("taskflow_request_timings", default=None)
+
+def record_phase(phase, seconds):
+    """
+    Add time spent in a phase to the current request, if any.
+
+    Parameters:
+    - phase (str): One of PHASES.
+    - seconds (float): The time to add.
+    """
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.phases[phase] += seconds
+
+class MetricsRegistry:
+    """
+    The request metrics of this worker.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything recorded, e.g. in a freshly forked worker.
+        """
+        # (endpoint, method) -> [bucket counts..., +Inf count, sum]
+        self.latency = {}
+        # (endpoint, method, status) -> count
+        self.statuses = {}
+        # endpoint -> [queries, seconds, pool, serialize, template]
+        self.phases = {}
+        # endpoint -> [hits, misses, uncached]
+        self.compile_cache = {}
+        self.last_flush = time.monotonic()
+
+    def observe(self, endpoint, method, status, duration, timings):
+        """
+        Record a finished request.
+        """
+        bucket = bisect_left(LATENCY_BUCKETS, duration)
+        with self.lock:
+            latency = self.latency.get((endpoint, method))
+            if latency is None:
+                latency = self.latency[(endpoint, method)] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            latency[bucket] += 1
+            latency[-1] += duration
+
+            key = (endpoint, method, status)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+
+            phases = self.phases.get(endpoint)
+            if phases is None:
+                phases = self.phases[endpoint] = [0, 0.0] + [0.0] * len(PHASES)
+            phases[0] += timings.db_count
+            phases[1] += timings.db_time
+            for index, phase in enumerate(PHASES, start=2):
+                phases[index] += timings.phases[phase]
+
+            if timings.db_count:
+                cache = self.compile_cache.get(endpoint)
+                if cache is None:
+                    cache = self.compile_cache[endpoint] = [0] * len(CACHE_RESULTS)
+                for index, count in enumerate(timings.db_cache):
+                    cache[index] += count
+
+    def snapshot(self):
+        """
+        Return a JSON-serializable copy of the registry.
+        """
+        with self.lock:
+            return {
+                "latency": [[endpoint, method, values] for (endpoint, method), values in self.latency.items()],
+                "statuses": [[endpoint, method, status, count] for (endpoint, method, status), count in self.statuses.items()],
+                "phases": [[endpoint, values] for endpoint, values in self.phases.items()],
+                "compile_cache": [[endpoint, values] for endpoint, values in self.compile_cache.items()]
+            }
+
+registry = MetricsRegistry()
+
+def _snapshot_path(pid):
+    return os.path.join(METRICS_DIR, f"{pid}.json")
+
+def flush_metrics():
+    """
+    Write this worker's registry to its snapshot file.
+
+    The file is replaced atomically, so readers never see a partial snapshot.
+    Processes that have not served any request (e.g. CLI commands) write nothing.
+    """
+    registry.last_flush = time.monotonic()
+    if not registry.statuses:
+        return
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = _snapshot_path(os.getpid())
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as snapshot_file:
+            json.dump(registry.snapshot(), snapshot_file)
+        os.replace(temporary, path)
+    except Exception as e:
+        logger.error(f"Error writing metrics snapshot: {traceback.format_exc()}")
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def read_snapshots():
+    """
+    Read the snapshots of all workers, dropping those of workers gone for longer than METRICS_RETENTION.
+
+    Returns:
+    - snapshots (list): The snapshot dicts.
+    """
+    snapshots = []
+    if not os.path.isdir(METRICS_DIR):
+        return snapshots
+
+    for name in os.listdir(METRICS_DIR):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(METRICS_DIR, name)
+        try:
+            pid = int(name[:-len(".json")])
+            if not _process_alive(pid) and time.time() - os.path.getmtime(path) > METRICS_RETENTION:
+                os.remove(path)
+                continue
+            with open(path) as snapshot_file:
+                snapshots.append(json.load(snapshot_file))
+        except (ValueError, OSError) as e:
+            logger.warning("Skipping metrics snapshot %s: %s", name, e)
+    return snapshots
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_label_value(value)}"' for name, value in labels.items()) + "}"
+
+def render_metrics():
+    """
+    Add up the snapshots of all workers and render them in the Prometheus text format.
+
+    This worker's snapshot is written first, so its latest requests are included.
+
+    Returns:
+    - text (str): The exposition text.
+    """
+    flush_metrics()
+    snapshots = read_snapshots()
+
+    latency, statuses, phases, compile_cache = {}, {}, {}, {}
+    for snapshot in snapshots:
+        for endpoint, method, values in snapshot["latency"]:
+            total = latency.setdefault((endpoint, method), [0] * len(values))
+            for index, value in enumerate(values):
+                total[index] += value
+        for endpoint, method, status, count in snapshot["statuses"]:
+            statuses[(endpoint, method, status)] = statuses.get((endpoint, method, status), 0) + count
+        for endpoint, values in snapshot["phases"]:
+            total = phases.setdefault(endpoint, [0] * len(values))
+            for index, value in enumerate(values):
+                total[index] += value
+        # Absent from the snapshots of workers running an older release
+        for endpoint, values in snapshot.get("compile_cache", []):
+            total = compile_cache.setdefault(endpoint, [0] * len(values))
+            for index, value in enumerate(values):
+                total[index] += value
+
+    lines = [
+        "# HELP taskflow_request_duration_seconds Time taken to build the response.",
+        "# TYPE taskflow_request_duration_seconds histogram"
+    ]
+    for (endpoint, method), values in sorted(latency.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), values):
+            cumulative += count
+            lines.append(f"taskflow_request_duration_seconds_bucket{_labels(endpoint=endpoint, method=method, le=bound)} {cumulative}")
+        lines.append(f"taskflow_request_duration_seconds_sum{_labels(endpoint=endpoint, method=method)} {values[-1]:.6f}")
+        lines.append(f"taskflow_request_duration_seconds_count{_labels(endpoint=endpoint, method=method)} {cumulative}")
+
+    lines += ["# HELP taskflow_requests_total Requests served.", "# TYPE taskflow_requests_total counter"]
+    for (endpoint, method, status), count in sorted(statuses.items()):
+        lines.append(f"taskflow_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}")
+
+    lines += ["# HELP taskflow_db_queries_total SQL statements executed.", "# TYPE taskflow_db_queries_total counter"]
+    for endpoint, values in sorted(phases.items()):
+        lines.append(f"taskflow_db_queries_total{_labels(endpoint=endpoint)} {values[0]}")
+
+    lines += ["# HELP taskflow_db_query_seconds_total Time spent executing SQL.", "# TYPE taskflow_db_query_seconds_total counter"]
+    for endpoint, values in sorted(phases.items()):
+        lines.append(f"taskflow_db_query_seconds_total{_labels(endpoint=endpoint)} {values[1]:.6f}")
+
+    lines += [
+        "# HELP taskflow_db_compile_cache_total SQL statements by result of their compiled cache lookup.",
+        "# TYPE taskflow_db_compile_cache_total counter"
+    ]
+    for endpoint, values in sorted(compile_cache.items()):
+        for result, count in zip(CACHE_RESULTS, values):
+            lines.append(f"taskflow_db_compile_cache_total{_labels(endpoint=endpoint, result=result)} {count}")
+
+    lines += [
+        "# HELP taskflow_request_phase_seconds_total Time spent waiting for a connection (pool), serializing and rendering templates.",
+        "# TYPE taskflow_request_phase_seconds_total counter"
+    ]
+    for endpoint, values in sorted(phases.items()):
+        for index, phase in enumerate(PHASES, start=2):
+            lines.append(f"taskflow_request_phase_seconds_total{_labels(endpoint=endpoint, phase=phase)} {values[index]:.6f}")
+
+    lines += ["# HELP taskflow_metrics_workers Worker snapshots included.", "# TYPE taskflow_metrics_workers gauge"]
+    lines.append(f"taskflow_metrics_workers {len(snapshots)}")
+    return "\n".join(lines) + "\n"
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's execution context, which goes away with it, even when the statement fails
+    if _current_timings.get() is not None and context is not None:
+        context._taskflow_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _current_timings.get()
+    started = getattr(context, "_taskflow_started", None)
+    if timings is not None and started is not None:
+        timings.db_time += time.perf_counter() - started
+        timings.db_count += 1
+        # Raw SQL (exec_driver_sql) and statements with caching disabled count as uncached
+        timings.db_cache[_CACHE_RESULT_INDEX.get(context.cache_hit, 2)] += 1
+
+def _before_render_template(sender, template, context, **extra):
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.template_started = time.perf_counter()
+
+def _template_rendered(sender, template, context, **extra):
+    timings = _current_timings.get()
+    if timings is not None and timings.template_started is not None:
+        timings.phases["template"] += time.perf_counter() - timings.template_started
+        timings.template_started = None
+
+def _start_request():
+    g.metrics_token = _current_timings.set(RequestTimings())
+
+def _finish_request(response):
+    timings = _current_timings.get()
+    if timings is None:
+        return response
+
+    duration = time.perf_counter() - timings.started
+    timings.phases["pool"] = g.get("db_checkout_wait", 0.0)
+    registry.observe(request.endpoint or "unmatched", request.method, response.status_code, duration, timings)
+
+    if SERVER_TIMING:
+        entries = [f'db;dur={timings.db_time * 1000:.2f};desc="{timings.db_count} queries"']
+        entries += [f"{phase};dur={timings.phases[phase] * 1000:.2f}" for phase in PHASES if timings.phases[phase]]
+        entries.append(f"total;dur={duration * 1000:.2f}")
+        response.headers["Server-Timing"] = ", ".join(entries)
+
+    if time.monotonic() - registry.last_flush >= METRICS_FLUSH_INTERVAL:
+        flush_metrics()
+    return response
+
+def _end_request(exception=None):
+    # Streamed bodies run after the request; their queries are not attributed to it
+    token = g.pop("metrics_token", None)
+    if token is not None:
+        _current_timings.reset(token)
+
+def init_metrics(app):
+    """
+    Register the request, template and SQL instrumentation.
+
+    Parameters:
+    - app (Flask): The application to instrument.
+    """
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_end_request)
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+
+    # Listening on the Engine class covers the engine whenever helpers.get_engine creates it
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    atexit.register(flush_metrics)
+    if hasattr(os, "register_at_fork"):
+        # A forked worker starts with empty totals of its own
+        os.register_at_fork(after_in_child=registry.reset)
@@ -0,0 +1,268 @@
+"""
+migrations.py
+
+This file holds the versioned schema migrations for the Taskflow database and the query plan check that
+guards the indexes they create. Migrations are run at deploy time, before the workers start, with
+`flask --app core.app db-upgrade`; `flask --app core.app check-query-plans` then verifies that every route's
+query is served by an index.
+
+Key Components:
+- Migration Registry: Each migration is a function registered with a version number. The version reached
+  is stored in SQLite's `PRAGMA user_version`, so every migration runs exactly once per database.
+- Performance Indexes: Composite indexes matching the filter and sort patterns of `/filter_tasks` and
+  `/api/kanban_tasks`, and the `task_id` lookups on `blockers` and `rec` done by `/modify`.
+- Query Plan Check: Runs `EXPLAIN QUERY PLAN` on a representative query for each route and filter and
+  reports any plan that falls back to a full table scan.
+
+Correlations:
+- Builds the route queries with the same builders the routes use (queries.py), so the check always
+  looks at the SQL actually sent to the database.
+- Creates the full-text search index defined in search.py, the POS version tracking used by pos_cache.py, the
+  session table of sessions.py, the task_view table of task_view.py and the summary tables of task_summary.py.
+"""
+
+from core.helpers import blockers_table, rec_table
+from core.queries import TaskFilter, build_filtered_tasks_query, build_kanban_tasks_query, build_task_query, page_parameters
+from core.search import rebuild_search_index
+from core.pos_cache import create_pos_version_tracking
+from core.sync import create_task_versioning, CHANGED_TASK_IDS
+from core.events import create_task_events
+from core.sessions import create_session_store
+from core.task_view import create_task_view, create_task_view_filter_indexes
+from core.task_summary import create_task_summary, TASK_COUNTS, POS_TASK_COUNTS, OVERDUE_COUNTS, POS_OVERDUE_COUNTS
+from core.at_risk import build_at_risk_queries
+from sqlalchemy import select
+from datetime import date
+import logging
+import re
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+# Registered migrations as (version, description, function), kept in version order
+MIGRATIONS = []
+
+# Tables that must never be read with a full scan by a route query. task_summary is not one of them:
+# it is read whole, and holds a row per POS, status and priority rather than per task.
+INDEXED_TABLES = ("tasks", "task_view", "task_due_summary", "pos", "rec", "blockers", "users")
+
+def migration(version, description):
+    """
+    Register a function as the migration to a schema version.
+
+    Migration functions receive a connection and must be safe to re-run
+    (use IF NOT EXISTS), since SQLite runs DDL outside the implicit transaction.
+
+    Parameters:
+    - version (int): The schema version reached after the migration.
+    - description (str): Short summary shown when the migration runs.
+
+    Returns:
+    - register (function): Decorator that records the migration.
+    """
+    def register(function):
+        MIGRATIONS.append((version, description, function))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return function
+    return register
+
+@migration(1, "Indexes for task filters, sorting and blocker/rec lookups")
+def add_performance_indexes(conn):
+    statements = [
+        # Kanban columns and status filters, optionally narrowed to a due date range
+        "CREATE INDEX IF NOT EXISTS ix_tasks_status_due_date ON tasks (task_status, task_due_date)",
+        # Priority filters, optionally combined with a status filter
+        "CREATE INDEX IF NOT EXISTS ix_tasks_priority_status ON tasks (task_priority, task_status)",
+        # Per-store views, optionally combined with a status filter
+        "CREATE INDEX IF NOT EXISTS ix_tasks_pos_status ON tasks (pos_id, task_status)",
+        # Date range filters: the Kanban due date range and the task table start/due filters
+        "CREATE INDEX IF NOT EXISTS ix_tasks_due_date ON tasks (task_due_date)",
+        "CREATE INDEX IF NOT EXISTS ix_tasks_start_date ON tasks (task_start_date)",
+        # Lookups of a task's blocker and reconciliation rows in /modify
+        "CREATE INDEX IF NOT EXISTS ix_blockers_task_id ON blockers (task_id)",
+        "CREATE INDEX IF NOT EXISTS ix_rec_task_id ON rec (task_id)"
+    ]
+    for statement in statements:
+        conn.exec_driver_sql(statement)
+
+@migration(2, "Full-text search index over tasks, notes and POS names")
+def add_search_index(conn):
+    rebuild_search_index(conn)
+
+@migration(3, "Version counter for the POS cache")
+def add_pos_version_tracking(conn):
+    create_pos_version_tracking(conn)
+
+@migration(4, "Change versions and tombstones for Kanban delta sync")
+def add_task_versioning(conn):
+    create_task_versioning(conn)
+
+@migration(5, "Event log for the task change push channel")
+def add_task_events(conn):
+    create_task_events(conn)
+
+@migration(6, "Write-ahead logging, so long reads do not block writers")
+def enable_write_ahead_log(conn):
+    # Persistent setting of the database file. In the default rollback journal mode a
+    # reader blocks commits for as long as it reads, e.g. during a large task export.
+    conn.exec_driver_sql("PRAGMA journal_mode = WAL")
+
+@migration(7, "Session store, replacing the session files")
+def add_session_store(conn):
+    create_session_store(conn)
+
+@migration(8, "Flattened task_view table read by the task routes")
+def add_task_view(conn):
+    create_task_view(conn)
+
+@migration(9, "Task count summary read by /api/kanban_summary")
+def add_task_summary(conn):
+    create_task_summary(conn)
+
+@migration(10, "Status and priority filter indexes on task_view")
+def add_task_view_filter_indexes(conn):
+    create_task_view_filter_indexes(conn)
+
+def get_schema_version(conn):
+    """
+    Read the schema version of the database.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to the database.
+
+    Returns:
+    - version (int): The version of the last migration applied, 0 for a new database.
+    """
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+def upgrade(conn, target=None):
+    """
+    Apply all pending migrations in version order.
+
+    Each migration is committed and recorded in `PRAGMA user_version` before
+    the next one starts, so an interrupted upgrade resumes where it stopped.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to the database.
+    - target (int): Optional version to stop at; defaults to the latest.
+
+    Returns:
+    - applied (list): (version, description) of each migration applied.
+    """
+    current = get_schema_version(conn)
+    applied = []
+
+    for version, description, function in MIGRATIONS:
+        if version <= current or (target is not None and version > target):
+            continue
+
+        logger.info("Applying migration %s: %s", version, description)
+        function(conn)
+        # PRAGMA does not accept bound parameters; version is an int from the registry
+        conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+        conn.commit()
+        applied.append((version, description))
+
+    return applied
+
+def plan_check_cases():
+    """
+    Build a representative query for each route and filter pattern.
+
+    The queries come from the same builders the routes use. The task table
+    queries are checked as the paginated query actually executed (the first
+    page and a page reached through a cursor).
+
+    Returns:
+    - cases (list): (name, statement, parameters) triples.
+    """
+    def task_page(data, direction=None):
+        query = build_filtered_tasks_query(TaskFilter.from_json(data))
+        position = None
+        if direction:
+            # Seek from an arbitrary boundary row (a search: read from an offset), as a request carrying a cursor would
+            position = ([1000], direction)
+        return page_parameters(query, 1, 15, position)[:2]
+
+    at_risk, at_risk_count, at_risk_params = build_at_risk_queries(date(2024, 8, 13))
+
+    def kanban(data, since=None):
+        query = build_kanban_tasks_query(TaskFilter.from_json(data, strict=True), changed_since=since is not None)
+        if since is None:
+            return query.statement, query.params
+        return query.statement, dict(query.params, since=since)
+
+    return [
+        ("/tasks next page", *task_page({}, "next")),
+        ("/tasks previous page", *task_page({}, "prev")),
+        ("/filter_tasks search", *task_page({"search_query": "cassa"})),
+        ("/filter_tasks search next page", *task_page({"search_query": "cassa"}, "next")),
+        ("/filter_tasks statuses", *task_page({"statuses": ["To Do", "In Progress"]})),
+        ("/filter_tasks priorities", *task_page({"priorities": ["High"]})),
+        ("/filter_tasks pos_id", *task_page({"pos_id": 1})),
+        ("/filter_tasks start_date", *task_page({"start_date": "2024-08-01"})),
+        ("/filter_tasks end_date", *task_page({"end_date": "2024-08-31"})),
+        ("/filter_tasks pos_id + statuses", *task_page({"pos_id": 1, "statuses": ["Done"]})),
+        ("/filter_tasks due overdue", *task_page({"due": "overdue"})),
+        ("/filter_tasks due this week", *task_page({"due": "this_week"})),
+        ("/api/kanban_tasks search", *kanban({"search_query": "cassa"})),
+        ("/api/kanban_tasks statuses", *kanban({"statuses": ["Backlog", "To Do"]})),
+        ("/api/kanban_tasks priorities", *kanban({"priorities": ["High", "Medium"]})),
+        ("/api/kanban_tasks pos_id", *kanban({"pos_id": 3})),
+        ("/api/kanban_tasks due date range", *kanban({"start_date": "2024-08-13", "end_date": "2024-08-13"})),
+        ("/api/kanban_tasks statuses + due range", *kanban({"statuses": ["To Do"], "start_date": "2024-08-01", "end_date": "2024-08-31"})),
+        ("/api/kanban_tasks due overdue", *kanban({"due": "overdue"})),
+        ("/api/kanban_tasks due today", *kanban({"due": "today"})),
+        ("/api/kanban_tasks due later + pos_id", *kanban({"due": "later", "pos_id": 3})),
+        ("/api/kanban_tasks since", *kanban({}, since=100)),
+        ("/api/kanban_tasks since + statuses", *kanban({"statuses": ["To Do"]}, since=100)),
+        ("/api/kanban_tasks changed ids", CHANGED_TASK_IDS, {"since": 100}),
+        ("/api/get_task", *build_task_query(1)),
+        ("/api/kanban_summary", TASK_COUNTS, {}),
+        ("/api/kanban_summary pos_id", POS_TASK_COUNTS, {"pos_id": 1}),
+        ("/api/kanban_summary overdue", OVERDUE_COUNTS, {"today": date(2024, 8, 13)}),
+        ("/api/kanban_summary overdue pos_id", POS_OVERDUE_COUNTS, {"today": date(2024, 8, 13), "pos_id": 1}),
+        ("/api/at_risk_tasks", at_risk, at_risk_params),
+        ("/api/at_risk_tasks total", at_risk_count, at_risk_params),
+        ("/modify blocker lookup", select(blockers_table.c.blocker_id).where(blockers_table.c.task_id == 1), {}),
+        ("/modify rec lookup", select(rec_table.c.rec_id).where(rec_table.c.task_id == 1), {})
+    ]
+
+def find_full_scans(plan_rows):
+    """
+    Find the full table scans in the output of EXPLAIN QUERY PLAN.
+
+    A scan that walks an index ('SCAN tasks USING INDEX ...') is not a full table
+    scan, and neither are scans of the FTS5 table or of subqueries.
+
+    Parameters:
+    - plan_rows (list): Rows of EXPLAIN QUERY PLAN (id, parent, notused, detail).
+
+    Returns:
+    - scans (list): The plan details that scan a whole table.
+    """
+    scans = []
+    for row in plan_rows:
+        detail = row[-1]
+        match = re.match(r"SCAN (\w+)(?: AS \w+)?", detail)
+        if match and match.group(1) in INDEXED_TABLES and "USING" not in detail:
+            scans.append(detail)
+    return scans
+
+def check_query_plans(conn):
+    """
+    Run EXPLAIN QUERY PLAN for every route query and report full scans.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to a migrated database.
+
+    Returns:
+    - results (list): (name, plan details, full scans) for each case; the
+      check passes when every full scans list is empty.
+    """
+    results = []
+    for name, statement, params in plan_check_cases():
+        compiled = statement.params(params).compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+        plan_rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").fetchall()
+        results.append((name, [row[-1] for row in plan_rows], find_full_scans(plan_rows)))
+    return results
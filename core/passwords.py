@@ -0,0 +1,151 @@
+"""
+passwords.py
+
+This file implements password hashing for registration and login. Hashing is deliberately slow, which makes it
+the most CPU-intensive thing the application does: when a shift starts and everyone logs in at once, unbounded
+hashing would take every core of the server and stall the task routes with it.
+
+Key Components:
+- Configurable Cost: The hash method and its cost come from TASKFLOW_PASSWORD_HASH, in werkzeug's notation
+  (e.g. "scrypt:32768:8:1", werkzeug's default, or "pbkdf2:sha256:600000").
+- Rehash on Login: Every stored hash records the method it was made with. After a successful login with a hash
+  made with another method or cost, the password is hashed again with the configured one, so changing the setting
+  upgrades (or downgrades) each account the next time its user logs in, without a migration or a password reset.
+- Bounded Hashing: Hashes are computed by a small thread pool in each worker (TASKFLOW_PASSWORD_HASH_THREADS),
+  which bounds the cores a login storm can take. At most TASKFLOW_PASSWORD_HASH_QUEUE hashes wait for the pool;
+  beyond that, and after TASKFLOW_PASSWORD_HASH_TIMEOUT seconds of waiting, PasswordHashBusy is raised and the
+  login is refused with a message asking to retry, instead of piling up requests. A refused login's hash is
+  cancelled if it has not started, and otherwise keeps its place in the queue until it finishes.
+
+Correlations:
+- Used by the `/register` and `/login` routes in app.py.
+- benchmarks/passwords.py measures the cost and login throughput of each setting.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import check_password_hash, generate_password_hash
+import logging
+import os
+import threading
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+# Hash method and cost for new hashes, in werkzeug's method:parameters notation
+PASSWORD_HASH = os.environ.get("TASKFLOW_PASSWORD_HASH", "scrypt:32768:8:1")
+
+# Hashes computed at the same time by each worker
+PASSWORD_HASH_THREADS = int(os.environ.get("TASKFLOW_PASSWORD_HASH_THREADS", 2))
+
+# Hashes allowed to wait for a thread in each worker before logins are refused
+PASSWORD_HASH_QUEUE = int(os.environ.get("TASKFLOW_PASSWORD_HASH_QUEUE", 32))
+
+# Seconds a login waits for its hash before it is refused
+PASSWORD_HASH_TIMEOUT = float(os.environ.get("TASKFLOW_PASSWORD_HASH_TIMEOUT", 10))
+
+class PasswordHashBusy(Exception):
+    """
+    Raised when the hashing pool is saturated and a password cannot be hashed in time.
+    """
+
+class PasswordHasher:
+    """
+    Hash and verify passwords on a bounded thread pool, with the configured method.
+    """
+
+    def __init__(self, method=PASSWORD_HASH, threads=PASSWORD_HASH_THREADS, queue_size=PASSWORD_HASH_QUEUE,
+                 timeout=PASSWORD_HASH_TIMEOUT):
+        self.method = method
+        self.threads = threads
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(threads + queue_size)
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._prefix = None
+        self._prefix_lock = threading.Lock()
+
+    def _get_executor(self):
+        # A forked worker does not inherit the parent's pool threads, so each process starts its own
+        if self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="password-hash")
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashBusy("Too many passwords waiting to be hashed")
+        try:
+            future = self._get_executor().submit(function, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        # The slot is held until the hash is really done, not just until the request stops waiting for it,
+        # so hashes abandoned after a timeout still count against the queue
+        future.add_done_callback(lambda future: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # A hash still waiting for a thread is dropped; one already running finishes and frees its slot
+            future.cancel()
+            raise PasswordHashBusy(f"Password not hashed within {self.timeout} s") from None
+
+    @property
+    def prefix(self):
+        """
+        The method string stored at the start of hashes made with the configured method, e.g. "scrypt:32768:8:1".
+
+        Werkzeug fills in the defaults of a partial method ("pbkdf2" becomes "pbkdf2:sha256:<iterations>"), so it
+        is read from a hash of an empty password, computed once. Only read on the pool's threads (by `verify`),
+        so the hash counts against the pool like any other; concurrent first readers wait for a single one.
+        """
+        if self._prefix is None:
+            with self._prefix_lock:
+                if self._prefix is None:
+                    self._prefix = generate_password_hash("", method=self.method).split("$", 1)[0]
+        return self._prefix
+
+    def hash(self, password):
+        """
+        Hash a password with the configured method.
+
+        Parameters:
+        - password (str): The password to hash.
+
+        Returns:
+        - password_hash (str): The hash to store, including its method and salt.
+        """
+        return self._run(generate_password_hash, password, self.method)
+
+    def needs_rehash(self, password_hash):
+        """
+        Check whether a stored hash was made with another method or cost than the configured one.
+        """
+        return password_hash.split("$", 1)[0] != self.prefix
+
+    def verify(self, password_hash, password):
+        """
+        Check a password against a stored hash, and rehash it if the hash is outdated.
+
+        Parameters:
+        - password_hash (str): The stored hash.
+        - password (str): The password given by the user.
+
+        Returns:
+        - (valid, new_hash): Whether the password matches, and the hash to store in place of
+          the old one, or None if the old one is up to date or the password does not match.
+        """
+        def check():
+            if not check_password_hash(password_hash, password):
+                return False, None
+            if self.needs_rehash(password_hash):
+                return True, generate_password_hash(password, method=self.method)
+            return True, None
+
+        return self._run(check)
+
+# The hasher of this worker
+hasher = PasswordHasher()
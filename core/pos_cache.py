@@ -0,0 +1,207 @@
+"""
+pos_cache.py
+
+This file holds the per-worker cache of POS (Point of Sale) reference data. The pos table is read by every page
+with a POS dropdown and by the POS lookup endpoints used by the filters, but it almost never changes, so it is
+loaded once per worker and served from memory.
+
+Key Components:
+- Snapshot: An immutable copy of the pos table with dictionaries for O(1) lookups in both directions
+  (pos_id -> pos_name, pos_name -> pos_id) and an ETag identifying its content.
+- Invalidation: Triggers on the pos table bump a version number in `reference_versions`. Each worker compares
+  it with the version of its snapshot at most every POS_CACHE_CHECK_INTERVAL seconds and reloads when it changed,
+  so a write made by any process reaches every worker.
+- HTTP Validators: Helper that adds the snapshot's ETag and a Cache-Control header to the POS endpoints' responses,
+  so browsers reuse their copy and revalidate with a cheap 304.
+
+Correlations:
+- The version table and its triggers are created by a migration (migrations.py).
+- Used by the routes in app.py that render POS dropdowns or answer POS lookups.
+"""
+
+from flask import jsonify, request
+from collections import namedtuple
+from core.helpers import get_db, pos_table
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+import hashlib
+import logging
+import os
+import threading
+import time
+import traceback
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the pos version; a POS change reaches every worker within this delay
+POS_CACHE_CHECK_INTERVAL = float(os.environ.get("TASKFLOW_POS_CACHE_CHECK_INTERVAL", 5))
+
+# Seconds a browser may reuse a POS response before revalidating it with its ETag
+POS_CACHE_MAX_AGE = int(os.environ.get("TASKFLOW_POS_CACHE_MAX_AGE", 300))
+
+# Version counter for reference tables, bumped by triggers on every write to pos
+POS_VERSION_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS reference_versions (
+        table_name VARCHAR NOT NULL PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO reference_versions (table_name, version) VALUES ('pos', 0)",
+    """
+    CREATE TRIGGER IF NOT EXISTS pos_version_after_insert AFTER INSERT ON pos BEGIN
+        UPDATE reference_versions SET version = version + 1 WHERE table_name = 'pos';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS pos_version_after_update AFTER UPDATE ON pos BEGIN
+        UPDATE reference_versions SET version = version + 1 WHERE table_name = 'pos';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS pos_version_after_delete AFTER DELETE ON pos BEGIN
+        UPDATE reference_versions SET version = version + 1 WHERE table_name = 'pos';
+    END
+    """
+]
+
+# rows: (pos_id, pos_name) rows ordered by pos_id, as used by the templates
+PosSnapshot = namedtuple("PosSnapshot", ["rows", "names_by_id", "ids_by_name", "etag", "version", "checked_at"])
+
+_snapshot = None
+_reload_lock = threading.Lock()
+
+def create_pos_version_tracking(conn):
+    """
+    Create the reference version table and the pos triggers if they do not exist yet.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to run the DDL on. The caller commits.
+    """
+    for statement in POS_VERSION_DDL:
+        conn.exec_driver_sql(statement)
+
+def _read_version(conn):
+    """
+    Read the current version of the pos table.
+
+    Returns None on databases without the version table, in which case the
+    cache falls back to reloading every POS_CACHE_CHECK_INTERVAL seconds.
+    """
+    try:
+        return conn.execute(text("SELECT version FROM reference_versions WHERE table_name = 'pos'")).scalar()
+    except OperationalError:
+        conn.rollback()
+        return None
+
+def _load_snapshot(conn):
+    """
+    Read the pos table and build a new snapshot.
+
+    The version is read before the rows, so a write landing in between is
+    picked up by the next check instead of being missed.
+    """
+    version = _read_version(conn)
+    rows = conn.execute(select(pos_table.c.pos_id, pos_table.c.pos_name).order_by(pos_table.c.pos_id)).fetchall()
+
+    names_by_id = {row.pos_id: row.pos_name for row in rows}
+    ids_by_name = {row.pos_name: row.pos_id for row in rows}
+    etag = hashlib.sha1(repr([tuple(row) for row in rows]).encode("utf-8")).hexdigest()[:16]
+
+    logger.info("Loaded %d POS into the cache (version %s)", len(rows), version)
+    return PosSnapshot(rows, names_by_id, ids_by_name, etag, version, time.monotonic())
+
+def cached_pos_snapshot():
+    """
+    Get the cached POS data if it was checked within the last POS_CACHE_CHECK_INTERVAL seconds.
+
+    Returns:
+    - snapshot (PosSnapshot): The current POS data, or None when it must be refreshed.
+    """
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - snapshot.checked_at < POS_CACHE_CHECK_INTERVAL:
+        return snapshot
+    return None
+
+def refresh_pos_snapshot(conn):
+    """
+    Check the pos version and reload the pos table if it changed.
+
+    Callers make sure only one refresh runs at a time: get_pos_snapshot
+    holds a thread lock, the ASGI app (asgi.py) an asyncio lock.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to the database.
+
+    Returns:
+    - snapshot (PosSnapshot): The current POS data.
+    """
+    global _snapshot
+
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version is not None and _read_version(conn) == snapshot.version:
+        snapshot = snapshot._replace(checked_at=time.monotonic())
+    else:
+        snapshot = _load_snapshot(conn)
+    _snapshot = snapshot
+    return snapshot
+
+def get_pos_snapshot():
+    """
+    Get the cached POS data, loading or refreshing it if needed.
+
+    Most calls return the snapshot without touching the database. Once every
+    POS_CACHE_CHECK_INTERVAL seconds a call reads the pos version (a single
+    row lookup) and reloads the table only if it changed. Snapshots are never
+    modified, so callers can use the returned one without locking.
+
+    Returns:
+    - snapshot (PosSnapshot): The current POS data.
+    """
+    snapshot = cached_pos_snapshot()
+    if snapshot is not None:
+        return snapshot
+
+    with _reload_lock:
+        # Another thread may have refreshed the snapshot while this one waited
+        return cached_pos_snapshot() or refresh_pos_snapshot(get_db())
+
+def fetch_pos_data():
+    """
+    Helper function to fetch POS data for dropdowns.
+
+    Retrieves POS (Point of Sale) data from the cache to populate
+    dropdown menus in the UI, aiding in task filtering and creation.
+
+    Returns:
+    - pos_data (List): A list of rows containing POS IDs and names.
+
+    Note: Logs an error if fetching POS data fails and returns an empty list.
+    """
+    try:
+        return get_pos_snapshot().rows
+    except Exception as e:
+        logger.error(f"Error fetching POS data: {traceback.format_exc()}")
+        return []
+
+def pos_json_response(snapshot, **payload):
+    """
+    Build a JSON response for a POS endpoint with HTTP cache validators.
+
+    The response carries the snapshot's ETag and may be reused by the browser
+    for POS_CACHE_MAX_AGE seconds. A request whose If-None-Match matches the
+    ETag gets an empty 304 response.
+
+    Parameters:
+    - snapshot (PosSnapshot): The snapshot the payload was built from.
+    - payload: The fields of the JSON body.
+
+    Returns:
+    - response (Flask Response): The JSON response, or a 304 response.
+    """
+    response = jsonify(**payload)
+    response.set_etag(snapshot.etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = POS_CACHE_MAX_AGE
+    return response.make_conditional(request)
@@ -0,0 +1,583 @@
+"""
+queries.py
+
+This file builds every query that lists tasks: the task tables (`/tasks`, `/filter_tasks`, `/export_tasks`), the
+Kanban board (`/api/kanban_tasks`) and single tasks (`/api/get_task`), from one definition of the task select.
+
+Key Components:
+- Source: The routes read the flattened task_view table (task_view.py), so every query is a single-table index
+  lookup. Databases not upgraded yet are read through the join of tasks, pos, rec and blockers the view copies.
+- Task Filter: A typed, immutable description of the filters sent by the task tables and the Kanban board,
+  parsed once from the request JSON.
+- Due Buckets: Overdue, today, this week and later, resolved to due date bounds on the server from its own date,
+  so clients no longer compute date ranges. Overdue only keeps the tasks not done, and reads the
+  (task_status, task_due_date) index as one range per open status.
+- Statements per Filter Shape: A query depends on which filters are set (its shape), never on their values. The
+  statements of each shape, including the COUNT and the page queries of the task tables, are built once per worker
+  with bound parameters and reused by every request with that shape. Values, including LIKE patterns, IN lists
+  (expanding parameters), page sizes and cursor positions, only travel as parameters, so SQLAlchemy's compiled
+  cache finds the SQL of every request and the statement tree is neither rebuilt nor traversed again.
+- Pagination: Page number (OFFSET) and cursor (keyset on task_id) pagination of the task tables, newest first,
+  with opaque cursors encoded by helpers.py. Searches, ordered best match first, page by OFFSET only, since the
+  relevance of every match changes with each write.
+
+Correlations:
+- Uses the table definitions of helpers.py, the view of task_view.py and the full-text search index of search.py.
+- The query plan check (migrations.py) explains the same statements the routes run.
+- The hit rate of the compiled cache is reported per endpoint by /metrics (metrics.py) and per worker by
+  `/api/pool_stats` (helpers.py).
+"""
+
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from math import ceil
+from core.helpers import get_db, decode_cursor, encode_cursor, tasks_table, pos_table, rec_table, blockers_table, task_view_table, TASK_STATUSES, TASK_PRIORITIES
+from core.task_view import task_view_available
+from core.search import build_match_expression, search_subquery, search_index_available
+from sqlalchemy import select, func, and_, or_, desc, bindparam, literal_column, Date, Integer, String
+import logging
+import traceback
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+# Share of tasks the planner should expect a one-sided date filter to keep. Without this hint
+# SQLite assumes a quarter of the table matches and prefers walking every task in task_id
+# order over using the date index; date filters in the task table are much narrower than that.
+# SQLite requires the probability to be a constant, so it is rendered inline rather than bound.
+DATE_FILTER_LIKELIHOOD = literal_column("0.05")
+
+# Share of tasks the planner should expect a status or priority filter of the task tables to keep.
+# From the statistics, a filter on two of the four statuses keeps half the tasks, and SQLite walks
+# task_view in task_id order until the page is full, which reads every task when the statuses are
+# rare. With this hint it reads the matches through the (status, task_id) or (priority, task_id) index.
+LIST_FILTER_LIKELIHOOD = literal_column("0.1")
+
+# The due date buckets of the Kanban board and the task tables, in due date order
+DUE_BUCKETS = ("overdue", "today", "this_week", "later")
+
+# Statuses of the tasks still to be done; a task is only overdue in one of them
+OPEN_STATUSES = tuple(status for status in TASK_STATUSES if status != "Done")
+
+# The 13 columns shown in the task tables
+TASK_COLUMN_NAMES = (
+    "task_id", "task_desc", "task_status", "task_priority", "task_start_date", "task_due_date", "task_notes",
+    "pos_id", "pos_name", "rec_date", "rec_certified", "blocker_desc", "blocker_responsible"
+)
+
+# The columns shown on the Kanban cards
+KANBAN_COLUMN_NAMES = ("task_id", "task_desc", "task_status", "task_priority", "task_due_date", "pos_id", "pos_name")
+
+# The joined tables task_view is a copy of, read on databases without it, and their columns by view column name
+TASK_JOIN = (
+    tasks_table.join(pos_table, tasks_table.c.pos_id == pos_table.c.pos_id)
+    .outerjoin(rec_table, tasks_table.c.rec_id == rec_table.c.rec_id)
+    .outerjoin(blockers_table, tasks_table.c.blocker_id == blockers_table.c.blocker_id)
+)
+KANBAN_JOIN = tasks_table.join(pos_table, tasks_table.c.pos_id == pos_table.c.pos_id)
+JOINED_COLUMNS = select(
+    *[tasks_table.c[name] for name in TASK_COLUMN_NAMES[:8]],
+    pos_table.c.pos_name,
+    rec_table.c.rec_date,
+    rec_table.c.rec_certified,
+    blockers_table.c.blocker_desc,
+    blockers_table.c.blocker_responsible,
+    tasks_table.c.change_version
+).selected_columns
+
+def _source(view, kanban=False):
+    # The FROM clause and the columns of the task routes: the view, or the join it copies
+    if view:
+        return task_view_table, task_view_table.c
+    return (KANBAN_JOIN if kanban else TASK_JOIN), JOINED_COLUMNS
+
+def _use_view(conn=None):
+    return task_view_available(get_db() if conn is None else conn)
+
+def task_list_query(view=False):
+    """
+    Build the select behind the task tables.
+
+    Selects the 13 columns shown in the task tables, from the task_view table or
+    from tasks joined with pos, with outer joins to rec and blockers.
+
+    Parameters:
+    - view (bool): Read the task_view table (see task_view.py) instead of the join.
+
+    Returns:
+    - query (SQLAlchemy Select): The unfiltered, unordered task query.
+    """
+    source, columns = _source(view)
+    return select(*[columns[name] for name in TASK_COLUMN_NAMES]).select_from(source)
+
+# The statements of a task table query, for one filter shape; keys are the columns its cursors seek on,
+# none for searches, which are paged by offset
+TaskListStatements = namedtuple("TaskListStatements", "count first_page next_page prev_page export keys")
+
+# A task table query: the statements of its shape and the values of its filters
+TaskListQuery = namedtuple("TaskListQuery", "statements params")
+
+# A query run as a single statement, such as the Kanban board
+TaskQuery = namedtuple("TaskQuery", "statement params")
+
+def due_bucket_bounds(bucket, today):
+    """
+    Resolve a due date bucket to the due dates it covers.
+
+    The buckets do not overlap: this week runs from tomorrow to Sunday (empty
+    on Sundays), and later starts on the next Monday.
+
+    Parameters:
+    - bucket (str): One of DUE_BUCKETS.
+    - today (date): The day the buckets are relative to.
+
+    Returns:
+    - due_from (date): The first due date of the bucket, None for overdue.
+    - due_until (date): The last due date of the bucket, None for later.
+    """
+    end_of_week = today + timedelta(days=6 - today.weekday())
+    return {
+        "overdue": (None, today - timedelta(days=1)),
+        "today": (today, today),
+        "this_week": (today + timedelta(days=1), end_of_week),
+        "later": (end_of_week + timedelta(days=1), None)
+    }[bucket]
+
+def _parse_date(value, name, strict):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        if strict:
+            raise ValueError(f"Invalid {name} format: {value}")
+        logger.error(f"Invalid {name} format: {value}")
+        return None
+
+def _parse_choices(value, name, choices, strict):
+    # A list of strings, each one of the choices; anything else is dropped, or rejected in strict mode
+    if not value:
+        return ()
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        if strict:
+            raise ValueError(f"Invalid {name}: {value!r}, expected a list of strings")
+        logger.error(f"Invalid {name}: {value!r}, expected a list of strings")
+        return ()
+    invalid = [item for item in value if item not in choices]
+    if invalid:
+        if strict:
+            raise ValueError(f"Invalid {name}: {invalid}")
+        logger.error(f"Invalid {name}: {invalid}")
+    return tuple(item for item in value if item in choices)
+
+@dataclass(frozen=True)
+class TaskFilter:
+    """
+    The filters of the task tables and the Kanban board.
+
+    Empty values mean no filter.
+    """
+
+    search_query: str = ""
+    pos_id: int | None = None
+    pos_name: str = ""
+    start_date: date | None = None
+    end_date: date | None = None
+    statuses: tuple = ()
+    priorities: tuple = ()
+    due: str | None = None
+
+    @classmethod
+    def from_json(cls, data, strict=False):
+        """
+        Parse the filter JSON sent by the task tables and the Kanban board.
+
+        Parameters:
+        - data (dict): The filter JSON (search_query, pos_id, pos_name, start_date,
+          end_date, statuses, priorities, due).
+        - strict (bool): Raise on invalid values instead of logging and ignoring them.
+
+        Returns:
+        - task_filter (TaskFilter): The parsed filters.
+
+        Raises:
+        - ValueError: In strict mode, if a date is not in YYYY-MM-DD format, the POS ID is not a number,
+          the statuses or priorities are not a list of TASK_STATUSES or TASK_PRIORITIES, or the due
+          bucket is not one of DUE_BUCKETS.
+        """
+        pos_id = data.get("pos_id")
+        if not pos_id:
+            pos_id = None
+        else:
+            try:
+                pos_id = int(pos_id)
+            except (TypeError, ValueError):
+                if strict:
+                    raise ValueError(f"Invalid POS ID: {pos_id}")
+                logger.error(f"Invalid POS ID: {pos_id}")
+                pos_id = None
+
+        due = data.get("due") or None
+        if due is not None and due not in DUE_BUCKETS:
+            if strict:
+                raise ValueError(f"Invalid due bucket: {due}")
+            logger.error(f"Invalid due bucket: {due}")
+            due = None
+
+        return cls(
+            search_query=(data.get("search_query") or "").strip(),
+            pos_id=pos_id,
+            pos_name=(data.get("pos_name") or "").strip(),
+            start_date=_parse_date(data.get("start_date"), "start date", strict),
+            end_date=_parse_date(data.get("end_date"), "end date", strict),
+            statuses=_parse_choices(data.get("statuses"), "statuses", TASK_STATUSES, strict),
+            priorities=_parse_choices(data.get("priorities"), "priorities", TASK_PRIORITIES, strict),
+            due=due
+        )
+
+def _search_mode(task_filter, columns=None, conn=None):
+    # 'match' through the full-text index, 'like' on databases without it, None without a search
+    if not task_filter.search_query:
+        return None, {}
+    match_expression = build_match_expression(task_filter.search_query, columns=columns)
+    if match_expression and search_index_available(get_db() if conn is None else conn):
+        return "match", {"search_match": match_expression}
+    return "like", {"search_pattern": f"%{task_filter.search_query.lower()}%"}
+
+def _filter_params(task_filter):
+    params = {}
+    if task_filter.pos_id is not None:
+        params["pos_id"] = task_filter.pos_id
+    if task_filter.pos_name:
+        params["pos_name_pattern"] = f"%{task_filter.pos_name.lower()}%"
+    if task_filter.statuses:
+        params["statuses"] = list(task_filter.statuses)
+    if task_filter.priorities:
+        params["priorities"] = list(task_filter.priorities)
+    if task_filter.start_date:
+        params["start_date"] = task_filter.start_date
+    if task_filter.end_date:
+        params["end_date"] = task_filter.end_date
+    if task_filter.due:
+        # Resolved on every request, so the buckets move at midnight without rebuilding the statements
+        due_from, due_until = due_bucket_bounds(task_filter.due, date.today())
+        if due_from is not None:
+            params["due_from"] = due_from
+        if due_until is not None:
+            params["due_until"] = due_until
+    return params
+
+def _shape(task_filter):
+    return (
+        task_filter.pos_id is not None,
+        bool(task_filter.pos_name),
+        bool(task_filter.statuses),
+        bool(task_filter.priorities),
+        task_filter.start_date is not None,
+        task_filter.end_date is not None,
+        task_filter.due
+    )
+
+def _due_conditions(c, due, likelihood=False):
+    # The due date bounds of a bucket, and the open statuses for overdue. In the task tables the
+    # bounds carry the date filter likelihood hint, for the same reason as the start and end dates.
+    conditions = []
+    if due == "overdue":
+        conditions.append(c.task_status.in_(OPEN_STATUSES))
+    if due != "overdue":
+        conditions.append(c.task_due_date >= bindparam("due_from", type_=Date))
+    if due != "later":
+        conditions.append(c.task_due_date <= bindparam("due_until", type_=Date))
+    if likelihood:
+        conditions = [func.likelihood(condition, DATE_FILTER_LIKELIHOOD) for condition in conditions]
+    return conditions
+
+# The caches below are bounded by the number of filter shapes (a few hundred), so they need no limit
+
+@lru_cache(maxsize=None)
+def _task_by_id_statement(view):
+    _, c = _source(view)
+    return task_list_query(view).where(c.task_id == bindparam("task_id"))
+
+@lru_cache(maxsize=None)
+def _task_list_statements(view, search, pos_id, pos_name, statuses, priorities, start_date, end_date, due):
+    _, c = _source(view)
+    base = task_list_query(view)
+    conditions = []
+    sort_key = None
+
+    if search == "match":
+        # Join the full-text matches and page through them best match first
+        search_matches = search_subquery(bindparam("search_match", type_=String))
+        base = base.add_columns(search_matches.c.search_rank).join(search_matches, search_matches.c.task_id == c.task_id)
+        sort_key = search_matches.c.search_rank
+    elif search == "like":
+        pattern = bindparam("search_pattern")
+        conditions.append(or_(
+            func.lower(c.task_desc).like(pattern),
+            func.lower(c.task_notes).like(pattern),
+            func.lower(c.pos_name).like(pattern)
+        ))
+
+    if pos_id:
+        conditions.append(c.pos_id == bindparam("pos_id"))
+    if pos_name:
+        conditions.append(func.lower(c.pos_name).like(bindparam("pos_name_pattern")))
+    if statuses:
+        conditions.append(func.likelihood(c.task_status.in_(bindparam("statuses", expanding=True)), LIST_FILTER_LIKELIHOOD))
+    if priorities:
+        conditions.append(func.likelihood(c.task_priority.in_(bindparam("priorities", expanding=True)), LIST_FILTER_LIKELIHOOD))
+    if start_date:
+        conditions.append(func.likelihood(c.task_start_date >= bindparam("start_date"), DATE_FILTER_LIKELIHOOD))
+    if end_date:
+        conditions.append(func.likelihood(c.task_due_date <= bindparam("end_date"), DATE_FILTER_LIKELIHOOD))
+    if due:
+        conditions.extend(_due_conditions(c, due, likelihood=True))
+
+    if conditions:
+        base = base.where(and_(*conditions))
+
+    keys = (c.task_id,) if sort_key is None else (sort_key, c.task_id)
+    newest_first = [key.desc() for key in keys]
+    page_limit = bindparam("page_limit", type_=Integer)
+    count = select(func.count()).select_from(base.subquery())
+    first_page = base.order_by(*newest_first).limit(page_limit).offset(bindparam("page_offset", type_=Integer))
+    # The task columns only, without the search relevance used for sorting
+    export = base.order_by(*newest_first).with_only_columns(*[c[name] for name in TASK_COLUMN_NAMES])
+
+    if sort_key is not None:
+        # The relevance of a match (bm25) depends on statistics of the whole index, so any write between two
+        # page requests shifts every score, and a cursor seeking past a score would skip or repeat rows.
+        # Searches are paged by offset instead: no seek statements and no seek keys.
+        return TaskListStatements(count, first_page, None, None, export, keys=())
+
+    boundary = bindparam("boundary_0", type_=Integer)
+
+    return TaskListStatements(
+        count=count,
+        first_page=first_page,
+        next_page=base.where(c.task_id < boundary).order_by(*newest_first).limit(page_limit),
+        prev_page=base.where(c.task_id > boundary).order_by(*[key.asc() for key in keys]).limit(page_limit),
+        export=export,
+        keys=keys
+    )
+
+@lru_cache(maxsize=None)
+def _kanban_statement(view, search, pos_id, pos_name, statuses, priorities, start_date, end_date, due, changed_since):
+    source, c = _source(view, kanban=True)
+    query = select(*[c[name] for name in KANBAN_COLUMN_NAMES]).select_from(source)
+
+    conditions = []
+    if search == "match":
+        search_matches = search_subquery(bindparam("search_match", type_=String))
+        query = query.join(search_matches, search_matches.c.task_id == c.task_id).order_by(desc(search_matches.c.search_rank))
+    elif search == "like":
+        conditions.append(func.lower(c.task_desc).like(bindparam("search_pattern")))
+    if pos_id:
+        conditions.append(c.pos_id == bindparam("pos_id"))
+    if pos_name:
+        conditions.append(func.lower(c.pos_name).like(bindparam("pos_name_pattern")))
+    if start_date:
+        conditions.append(c.task_due_date >= bindparam("start_date"))
+    if end_date:
+        conditions.append(c.task_due_date <= bindparam("end_date"))
+    if due:
+        conditions.extend(_due_conditions(c, due))
+    if statuses:
+        conditions.append(c.task_status.in_(bindparam("statuses", expanding=True)))
+    if priorities:
+        conditions.append(c.task_priority.in_(bindparam("priorities", expanding=True)))
+    if changed_since:
+        conditions.append(c.change_version > bindparam("since"))
+
+    if conditions:
+        query = query.where(and_(*conditions))
+    return query
+
+def build_filtered_tasks_query(task_filter, conn=None):
+    """
+    Build the task table query for a set of filters.
+
+    Used by `/tasks` (without filters), `/filter_tasks` and `/export_tasks`. A search
+    query is matched through the full-text index when it exists, in which case results
+    are ordered by relevance; otherwise it is matched with LIKE on the task description,
+    notes and POS name.
+
+    Parameters:
+    - task_filter (TaskFilter): The filters.
+    - conn (SQLAlchemy Connection): Connection used to check for the view and the
+      search index; defaults to the request's (get_db).
+
+    Returns:
+    - query (TaskListQuery): The statements of the filters' shape and their parameters.
+    """
+    search, params = _search_mode(task_filter, conn=conn)
+    params.update(_filter_params(task_filter))
+    return TaskListQuery(_task_list_statements(_use_view(conn), search, *_shape(task_filter)), params)
+
+def build_kanban_tasks_query(task_filter, changed_since=False, conn=None):
+    """
+    Build the Kanban board query for a set of filters.
+
+    Used by the `/api/kanban_tasks` route. The search query only looks at task
+    descriptions, and the date range applies to the due date, like the due bucket.
+
+    Parameters:
+    - task_filter (TaskFilter): The filters.
+    - changed_since (bool): Keep only the tasks changed after the version passed
+      as the 'since' parameter (see sync.py).
+    - conn (SQLAlchemy Connection): Connection used to check for the view and the
+      search index; defaults to the request's (get_db).
+
+    Returns:
+    - query (TaskQuery): The statement and its parameters.
+    """
+    search, params = _search_mode(task_filter, columns=("task_desc",), conn=conn)
+    params.update(_filter_params(task_filter))
+    return TaskQuery(_kanban_statement(_use_view(conn), search, *_shape(task_filter), changed_since), params)
+
+def build_task_query(task_id, conn=None):
+    """
+    Build the query of a single task, with the columns of the task tables.
+
+    Used by the `/api/get_task` route.
+
+    Parameters:
+    - task_id (int): The ID of the task.
+    - conn (SQLAlchemy Connection): Connection used to check for the view; defaults
+      to the request's (get_db).
+
+    Returns:
+    - query (TaskQuery): The statement and its parameters.
+    """
+    return TaskQuery(_task_by_id_statement(_use_view(conn)), {"task_id": task_id})
+
+def page_parameters(query, page, per_page, position=None):
+    """
+    Choose the statement and parameters for one page of a task table query.
+
+    Without a position the page number becomes an OFFSET; with a position
+    (decoded from a cursor) the query seeks past the boundary row with a WHERE
+    on its task_id, or, for a search, reads from the offset in the cursor. One
+    extra row is requested so the caller can tell whether there is a further
+    page in the direction of travel.
+
+    Parameters:
+    - query (TaskListQuery): The query to paginate.
+    - page (int): The page number, used when there is no position.
+    - per_page (int): The number of items per page.
+    - position (tuple): (values, direction) from decode_cursor, or None.
+
+    Returns:
+    - statement (SQLAlchemy Select): The page statement.
+    - params (dict): Its parameters.
+    - direction (str): 'next' if rows come back newest first, 'prev' if they
+      come back in ascending order and must be reversed.
+    """
+    statements = query.statements
+    params = dict(query.params, page_limit=per_page + 1)
+
+    if position is None:
+        params["page_offset"] = (page - 1) * per_page
+        return statements.first_page, params, "next"
+    if not statements.keys:
+        # A search: the cursor holds the offset of the page
+        params["page_offset"] = position[0][0]
+        return statements.first_page, params, "next"
+
+    values, direction = position
+    params.update({f"boundary_{index}": value for index, value in enumerate(values)})
+    statement = statements.next_page if direction == "next" else statements.prev_page
+    return statement, params, direction
+
+def get_paginated_tasks(query, page, per_page, cursor=None, with_total=True, conn=None):
+    """
+    Paginate a task table query.
+
+    Two modes are supported. Without a cursor the page number is turned
+    into an OFFSET, which is fine for the first pages. With a cursor the
+    query seeks directly to the rows after (or before) the boundary row of
+    the previous page using a WHERE on task_id, so every page costs the
+    same regardless of how deep it is. Results are ordered newest first by
+    task_id, and every call returns the cursors for the neighbouring pages.
+
+    Searches are ordered best match first and always paged by OFFSET, their
+    cursors holding the offset of the page: the relevance (bm25) of every
+    match changes with any write to the search index, so a cursor seeking
+    past the relevance of a boundary row would skip or repeat rows after a
+    write. A write between two requests can still shift a search's matches
+    by a few positions, as with any offset.
+
+    Parameters:
+    - query (TaskListQuery): The query to paginate, from build_filtered_tasks_query.
+    - page (int): The current page number (used when no cursor is given).
+    - per_page (int): The number of items to display per page.
+    - cursor (str): Optional opaque cursor returned by a previous call.
+    - with_total (bool): Whether to count the matching records. Counting
+      reads every match, so clients that already know the total (e.g. when
+      loading the following pages of a scrolling table) should skip it.
+    - conn (SQLAlchemy Connection): Connection to run the queries on; defaults
+      to the request's (get_db).
+
+    Returns:
+    - tasks (List): A list of paginated tasks.
+    - total_records (int): The total number of records, None without with_total.
+    - total_pages (int): The total number of pages, None without with_total.
+    - cursors (dict): 'next' and 'prev' cursors, None where there is no such page.
+
+    Note: This function logs an error message if pagination fails and returns empty values.
+    """
+    keys = query.statements.keys
+
+    position = None
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+            # A task_id, or the offset of a search page
+            value = position[0][0]
+            if len(position[0]) != 1 or not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                raise ValueError(f"Cursor does not match the sort key: {cursor!r}")
+        except ValueError as e:
+            logger.warning("%s; falling back to page %s", e, page)
+            position = None
+
+    try:
+        if conn is None:
+            conn = get_db()
+        total_records = total_pages = None
+        if with_total:
+            total_records = conn.execute(query.statements.count, query.params).scalar()
+            total_pages = ceil(total_records / per_page)
+
+        statement, params, direction = page_parameters(query, page, per_page, position)
+        tasks = conn.execute(statement, params).fetchall()
+        has_more = len(tasks) > per_page
+        tasks = tasks[:per_page]
+
+        if direction == "next":
+            has_next, has_prev = has_more, position is not None or page > 1
+        else:
+            # Rows were read in ascending order to seek backwards; restore newest first
+            tasks.reverse()
+            has_next, has_prev = True, has_more
+
+        cursors = {"next": None, "prev": None}
+        if not keys:
+            offset = position[0][0] if position is not None else (page - 1) * per_page
+            if tasks and has_more:
+                cursors["next"] = encode_cursor([offset + per_page], "next")
+            if offset > 0:
+                cursors["prev"] = encode_cursor([max(0, offset - per_page)], "prev")
+            return tasks, total_records, total_pages, cursors
+
+        if tasks and has_next:
+            cursors["next"] = encode_cursor([tasks[-1]._mapping[key] for key in keys], "next")
+        if tasks and has_prev:
+            cursors["prev"] = encode_cursor([tasks[0]._mapping[key] for key in keys], "prev")
+
+        return tasks, total_records, total_pages, cursors
+    except Exception as e:
+        logger.error(f"Error during pagination: {traceback.format_exc()}")
+        return [], 0, 0, {"next": None, "prev": None}
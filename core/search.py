@@ -0,0 +1,186 @@
+"""
+search.py
+
+This file manages the full-text search index used by the task search box. Tasks are indexed in an SQLite FTS5
+virtual table (`tasks_fts`) whose rowid is the task_id, so searches become index lookups instead of
+`LIKE '%...%'` scans over the whole tasks table.
+
+Key Components:
+- Index Schema: The FTS5 table and the triggers on `tasks` and `pos` that keep it in sync with every write.
+- Maintenance: Functions to create the index on an existing database and to rebuild its contents.
+- Query Helpers: Turn the text typed by the user into a ranked prefix MATCH and expose it as a subquery
+  that routes can join against.
+
+Dependencies:
+- SQLite built with FTS5 (the default for the sqlite3 module shipped with Python).
+- SQLAlchemy Core for composing the search subquery with the routes' task queries.
+"""
+
+from sqlalchemy import select, literal_column, table, column, text
+import logging
+import re
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = "tasks_fts"
+
+# Columns of the index; pos_name is copied from the pos table so one MATCH covers all three
+SEARCH_COLUMNS = ("task_desc", "task_notes", "pos_name")
+
+# Lightweight description of the FTS5 table for building queries. The hidden column named after
+# the table is the MATCH target, and 'rank' is the bm25 score (lower is a better match).
+tasks_fts = table(SEARCH_TABLE, column("rowid"), column(SEARCH_TABLE), column("rank"), *[column(name) for name in SEARCH_COLUMNS])
+
+# The virtual table plus the triggers that keep it current. Accented Italian text is folded with
+# remove_diacritics, and prefix indexes on 2 and 3 characters keep short search-as-you-type prefixes fast.
+SEARCH_INDEX_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        task_desc, task_notes, pos_name,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_after_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO {SEARCH_TABLE} (rowid, task_desc, task_notes, pos_name)
+        VALUES (new.task_id, new.task_desc, new.task_notes, (SELECT pos_name FROM pos WHERE pos_id = new.pos_id));
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_after_update AFTER UPDATE OF task_desc, task_notes, pos_id ON tasks BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.task_id;
+        INSERT INTO {SEARCH_TABLE} (rowid, task_desc, task_notes, pos_name)
+        VALUES (new.task_id, new.task_desc, new.task_notes, (SELECT pos_name FROM pos WHERE pos_id = new.pos_id));
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_after_delete AFTER DELETE ON tasks BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.task_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS pos_fts_after_update AFTER UPDATE OF pos_name ON pos BEGIN
+        UPDATE {SEARCH_TABLE} SET pos_name = new.pos_name
+        WHERE rowid IN (SELECT task_id FROM tasks WHERE pos_id = new.pos_id);
+    END
+    """
+]
+
+# Set once the index has been seen in the database, so the check costs nothing afterwards
+_index_available = False
+
+def create_search_index(conn):
+    """
+    Create the FTS5 table and its sync triggers if they do not exist yet.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to run the DDL on. The caller commits.
+    """
+    for statement in SEARCH_INDEX_DDL:
+        conn.exec_driver_sql(statement)
+
+def rebuild_search_index(conn):
+    """
+    Repopulate the search index from the tasks and pos tables.
+
+    Creates the index first if needed, so this is also how an existing database
+    gets its index. The index is emptied and refilled in one statement and then
+    merged into a single b-tree for the fastest lookups.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to run the rebuild on. The caller commits.
+
+    Returns:
+    - indexed (int): The number of tasks in the index.
+    """
+    global _index_available
+
+    create_search_index(conn)
+    conn.exec_driver_sql(f"DELETE FROM {SEARCH_TABLE}")
+    conn.exec_driver_sql(f"""
+        INSERT INTO {SEARCH_TABLE} (rowid, task_desc, task_notes, pos_name)
+        SELECT tasks.task_id, tasks.task_desc, tasks.task_notes, pos.pos_name
+        FROM tasks LEFT JOIN pos ON pos.pos_id = tasks.pos_id
+    """)
+    conn.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    indexed = conn.execute(text(f"SELECT count(*) FROM {SEARCH_TABLE}")).scalar()
+
+    _index_available = True
+    logger.info("Rebuilt search index with %d tasks", indexed)
+    return indexed
+
+def search_index_available(conn):
+    """
+    Check whether the database has the search index.
+
+    Routes fall back to LIKE matching on databases where the index has not been
+    created yet, instead of failing every search.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection used for the check.
+
+    Returns:
+    - available (bool): True if the FTS5 table exists.
+    """
+    global _index_available
+
+    if not _index_available:
+        found = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": SEARCH_TABLE}
+        ).first()
+        if found:
+            _index_available = True
+        else:
+            logger.warning("Search index missing; run 'flask --app core.app rebuild-search-index'")
+    return _index_available
+
+def build_match_expression(search_query, columns=None):
+    """
+    Turn the text typed in the search box into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term, so 'cass 10' matches rows containing
+    a word starting with 'cass' and a word starting with '10'. Quoting means
+    characters with a meaning in the FTS5 query syntax are always taken literally.
+
+    Parameters:
+    - search_query (str): The raw user input.
+    - columns (tuple): Optional index columns to restrict the match to.
+
+    Returns:
+    - expression (str): The MATCH expression, or None if the input has no words.
+    """
+    terms = [f'"{word}"*' for word in re.findall(r"\w+", search_query)]
+    if not terms:
+        return None
+
+    expression = " ".join(terms)
+    if columns:
+        expression = "{" + " ".join(columns) + "} : (" + expression + ")"
+    return expression
+
+def search_subquery(match_expression):
+    """
+    Build a subquery of the tasks matching a search, with their relevance.
+
+    The subquery has two columns: task_id and search_rank. search_rank is the
+    negated bm25 score, so a higher value is a better match and it can be used
+    as a descending sort key (and keyset pagination key) like task_id.
+
+    Parameters:
+    - match_expression (str or BindParameter): Expression built by build_match_expression,
+      or a bound parameter to pass it at execution time.
+
+    Returns:
+    - subquery (SQLAlchemy Subquery): Subquery to join on task_id.
+    """
+    return (
+        select(
+            tasks_fts.c.rowid.label("task_id"),
+            (-literal_column("rank")).label("search_rank")
+        )
+        .where(tasks_fts.c[SEARCH_TABLE].match(match_expression))
+        .subquery("search")
+    )
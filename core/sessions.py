@@ -0,0 +1,269 @@
+"""
+sessions.py
+
+This file implements the server-side session store. Sessions used to be kept by Flask-Session as one pickled file
+per session in `flask_session/`: every authenticated request opened and unpickled a file, and since nothing ever
+deleted them the directory grew with every visitor. Sessions now live in a single table of the application's
+database, which SQLite keeps compact and indexed.
+
+Key Components:
+- Session Table: One row per session, keyed by its random ID, holding the session data encoded with msgpack and
+  the time it expires. Loading a session is a single primary key lookup on the request's pooled connection.
+- Lazy Writes: Rows are only written when the session changes (login, logout, flash messages), or at most once per
+  SESSION_REFRESH_INTERVAL to push back the expiry of a session in use. Empty sessions are never stored, and
+  static files never read the table.
+- ID Regeneration: Login and logout move the session to a new random ID (`StoredSession.regenerate`) and delete
+  the row of the old one, so an ID obtained before the login cannot be used after it (session fixation).
+- Expiry: A session expires SESSION_TTL seconds after it was last used. Expired sessions are ignored when read and
+  deleted by a background thread in each worker every SESSION_PRUNE_INTERVAL seconds, in small batches so the
+  pruning never holds the database's write lock for long.
+
+Correlations:
+- The session table is created by a migration (migrations.py), or on first use in a database not upgraded yet, since
+  no page works without sessions.
+- Installed on the app in app.py with `init_sessions`; `flask --app core.app prune-sessions` prunes on demand.
+- `login_required` (helpers.py) and the login/logout routes use the session through Flask's `session` as before;
+  the login and logout routes also call `session.regenerate()`.
+"""
+
+from core.helpers import get_db, get_engine, db_transaction
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+import logging
+import msgspec
+import os
+import secrets
+import threading
+import time
+import traceback
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+# Seconds after its last use at which a session expires (31 days, Flask's default session lifetime)
+SESSION_TTL = int(os.environ.get("TASKFLOW_SESSION_TTL", 31 * 24 * 3600))
+
+# Seconds between two writes extending the expiry of a session that is read but not changed
+SESSION_REFRESH_INTERVAL = int(os.environ.get("TASKFLOW_SESSION_REFRESH_INTERVAL", 3600))
+
+# Seconds between two deletions of expired sessions by each worker
+SESSION_PRUNE_INTERVAL = float(os.environ.get("TASKFLOW_SESSION_PRUNE_INTERVAL", 600))
+
+# Expired sessions deleted per statement
+SESSION_PRUNE_BATCH_SIZE = 1000
+
+SESSIONS_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id VARCHAR NOT NULL PRIMARY KEY,
+        data BLOB NOT NULL,
+        expires_at INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)"
+]
+
+# Longest session ID accepted from a cookie; IDs are 43 characters long
+MAX_SESSION_ID_LENGTH = 64
+
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder()
+
+def create_session_store(conn):
+    """
+    Create the session table if it does not exist yet.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to run the DDL on. The caller commits.
+    """
+    for statement in SESSIONS_DDL:
+        conn.exec_driver_sql(statement)
+
+def load_session(conn, sid, now=None):
+    """
+    Read a stored session.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to the database.
+    - sid (str): The session ID sent in the session cookie.
+    - now (int): Current time as a Unix timestamp; defaults to the clock.
+
+    Returns:
+    - session (tuple): (data, expires_at), or None for a missing, malformed, unknown or expired ID.
+    """
+    if not sid or len(sid) > MAX_SESSION_ID_LENGTH:
+        return None
+    row = conn.exec_driver_sql("SELECT data, expires_at FROM sessions WHERE session_id = ?", (sid,)).first()
+    if row is None or row.expires_at <= (time.time() if now is None else now):
+        return None
+    return _decoder.decode(row.data), row.expires_at
+
+def prune_sessions(conn, now=None):
+    """
+    Delete the expired sessions, SESSION_PRUNE_BATCH_SIZE at a time.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to the database; each batch is committed here.
+    - now (int): Current time as a Unix timestamp; defaults to the clock.
+
+    Returns:
+    - deleted (int): Number of sessions deleted.
+    """
+    now = int(time.time()) if now is None else now
+    deleted = 0
+    while True:
+        result = conn.exec_driver_sql(
+            "DELETE FROM sessions WHERE session_id IN "
+            "(SELECT session_id FROM sessions WHERE expires_at <= ? LIMIT ?)",
+            (now, SESSION_PRUNE_BATCH_SIZE)
+        )
+        conn.commit()
+        deleted += result.rowcount
+        if result.rowcount < SESSION_PRUNE_BATCH_SIZE:
+            return deleted
+
+class StoredSession(CallbackDict, SessionMixin):
+    """
+    A session backed by a row of the session table.
+
+    `new` is true until the session has been stored; `modified` is set by any change to its content.
+    `replaced_sid` is the ID given up by `regenerate`, whose row is deleted when the session is saved.
+    """
+
+    def __init__(self, initial=None, sid=None, expires_at=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.new = new
+        self.modified = False
+        self.replaced_sid = None
+
+    def regenerate(self):
+        """
+        Move the session to a new random ID, e.g. when its user logs in or out.
+
+        An ID known before the login, such as one planted in the browser by an attacker
+        (session fixation), then no longer designates the session. The row of the old ID
+        is deleted when the session is saved, in the same transaction as the new one.
+        """
+        if not self.new and self.replaced_sid is None:
+            self.replaced_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+class SQLiteSessionInterface(SessionInterface):
+    """
+    Keep sessions in the session table, identified by a random ID stored in the session cookie.
+    """
+
+    session_class = StoredSession
+
+    def __init__(self, ttl=SESSION_TTL, refresh_interval=SESSION_REFRESH_INTERVAL, prune_interval=SESSION_PRUNE_INTERVAL):
+        self.ttl = ttl
+        self.refresh_interval = min(refresh_interval, ttl)
+        self.prune_interval = prune_interval
+        self._store_ready = False
+        self._pruner_pid = None
+        self._pruner_lock = threading.Lock()
+
+    def open_session(self, app, request):
+        if app.static_url_path and request.path.startswith(app.static_url_path + "/"):
+            return self.session_class(new=True)
+
+        if not self._store_ready:
+            with db_transaction() as conn:
+                create_session_store(conn)
+            self._store_ready = True
+
+        self._start_pruner()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        try:
+            # Requests without a cookie do not need a connection
+            stored = load_session(get_db(), sid) if sid else None
+            if stored is not None:
+                data, expires_at = stored
+                return self.session_class(data, sid=sid, expires_at=expires_at)
+        except Exception as e:
+            logger.error(f"Error loading session: {traceback.format_exc()}")
+
+        # No cookie, an unknown or expired ID: start a new session under a new ID
+        return self.session_class(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            # Nothing to keep: forget a stored session that was emptied or given up for a new ID, e.g. by logout
+            stale_sid = session.replaced_sid or (session.sid if session.modified and not session.new else None)
+            if stale_sid:
+                with db_transaction() as conn:
+                    conn.exec_driver_sql("DELETE FROM sessions WHERE session_id = ?", (stale_sid,))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = int(time.time())
+        if session.modified or session.new:
+            with db_transaction() as conn:
+                if session.replaced_sid:
+                    conn.exec_driver_sql("DELETE FROM sessions WHERE session_id = ?", (session.replaced_sid,))
+                conn.exec_driver_sql(
+                    "INSERT INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (session_id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at",
+                    (session.sid, _encoder.encode(dict(session)), now + self.ttl)
+                )
+        elif session.expires_at - now < self.ttl - self.refresh_interval:
+            with db_transaction() as conn:
+                conn.exec_driver_sql(
+                    "UPDATE sessions SET expires_at = ? WHERE session_id = ?", (now + self.ttl, session.sid)
+                )
+
+        # The cookie only carries the ID, so it is sent again only when the ID is new or its expiry moves
+        if session.new or session.permanent:
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+
+    def _start_pruner(self):
+        # One pruning thread per process; a forked worker starts its own on its first request
+        if self._pruner_pid == os.getpid() or self.prune_interval <= 0:
+            return
+        with self._pruner_lock:
+            if self._pruner_pid != os.getpid():
+                threading.Thread(target=self._prune_forever, name="session-pruner", daemon=True).start()
+                self._pruner_pid = os.getpid()
+
+    def _prune_forever(self):
+        while True:
+            time.sleep(self.prune_interval)
+            try:
+                with get_engine().connect() as conn:
+                    deleted = prune_sessions(conn)
+                if deleted:
+                    logger.info("Deleted %d expired sessions", deleted)
+            except Exception as e:
+                logger.error(f"Error pruning sessions: {traceback.format_exc()}")
+
+def init_sessions(app):
+    """
+    Install the SQLite session store on the Flask app.
+
+    Parameters:
+    - app (Flask): The application whose sessions are stored.
+    """
+    app.session_interface = SQLiteSessionInterface()
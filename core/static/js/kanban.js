@@ -8,8 +8,11 @@
  * Key functionalities include:
  * - Fetching and displaying tasks in the Kanban board
  * - Filtering tasks based on search queries, POS IDs, POS Names, statuses, and priorities
- * - Updating task status through drag-and-drop interaction
- * - Ensuring synchronization of the front-end display with the backend database
+ * - Updating task status through drag-and-drop interaction, for one card or a Ctrl-click selection of cards;
+ *   the updates of a card are sent one at a time, so the server saves them in the order of the drops
+ * - Receiving task changes made by other users through server-sent events (`/api/events`)
+ * - Ensuring synchronization of the front-end display with the backend database, by patching only the
+ *   cards of tasks changed since the board's last version
  *
  * Inputs:
  * - User interactions such as searching, filtering, and dragging tasks
@@ -32,6 +35,7 @@ document.addEventListener("DOMContentLoaded", function () {
     const startDateInput = document.getElementById("startDate"); // Input field for start date filter
     const endDateInput = document.getElementById("endDate"); // Input field for end date filter
     const dueTodayBtn = document.getElementById("dueTodayBtn"); // Button to filter tasks due today
+    const overdueBtn = document.getElementById("overdueBtn"); // Button to filter overdue tasks
 
     // DOM elements for Kanban columns, representing task statuses
     const backlogColumn = document.getElementById("backlog");
@@ -191,68 +195,187 @@ document.addEventListener("DOMContentLoaded", function () {
         }
     });
 
+    // State of the board for delta sync: the version of the last response, the filters it was
+    // fetched with, and the card element of each displayed task
+    let boardVersion = null;
+    let boardFilterKey = null;
+    let boardFilters = {};
+    const cardsById = new Map();
+
+    // Status updates being saved, by task ID: { next: the status of a later drop, to send once the
+    // request in flight is answered, or null; saved: the last status the server confirmed }
+    const statusUpdates = new Map();
+
+    // Sequence number of the latest request, so a slow response cannot overwrite a newer one
+    let latestRequestId = 0;
+
+    /**
+     * Returns the Kanban column element for a task status
+     * @param {string} status - The task status
+     * @returns {HTMLElement|null} - The column element, or null for an unknown status
+     */
+    function columnForStatus(status) {
+        if (status === "Backlog") {
+            return backlogColumn;
+        } else if (status === "To Do") {
+            return todoColumn;
+        } else if (status === "In Progress") {
+            return inProgressColumn;
+        } else if (status === "Done") {
+            return doneColumn;
+        }
+        return null;
+    }
+
+    /**
+     * Creates or updates the card of a task and places it in the column of its status
+     * Existing cards are only re-rendered when their content changed, and only moved when
+     * their status changed, so unchanged cards keep their DOM nodes and drag positions
+     * @param {Object} task - Task data returned by the backend
+     * @param {boolean} keepOrder - Append the card even if it is already in the right column
+     */
+    function upsertTaskCard(task, keepOrder) {
+        let taskCard = cardsById.get(task.task_id);
+        if (taskCard && statusUpdates.has(task.task_id)) {
+            // A card whose status is still being saved stays in the column it was dropped in
+            task = Object.assign({}, task, { task_status: taskCard.getAttribute("data-task-status") });
+        }
+        if (!taskCard) {
+            taskCard = document.createElement("div");
+            taskCard.className = "card task-card mb-3";
+            taskCard.setAttribute("data-task-id", task.task_id);
+            cardsById.set(task.task_id, taskCard);
+        }
+
+        const fingerprint = JSON.stringify([task.task_desc, task.task_status, task.task_priority, task.task_due_date]);
+        if (taskCard.dataset.fingerprint !== fingerprint) {
+            taskCard.dataset.fingerprint = fingerprint;
+            taskCard.setAttribute("data-task-status", task.task_status); // To track status for drag-and-drop
+            taskCard.innerHTML = `
+                <div class="card-body">
+                    <h5 class="card-title">${task.task_desc || 'No Description'}</h5>
+                    <p class="card-text"><strong>Status:</strong> ${task.task_status}</p>
+                    <p class="card-text"><strong>Priority:</strong> ${task.task_priority}</p>
+                    <p class="card-text"><strong>Due Date:</strong> ${task.task_due_date}</p>
+                </div>
+            `;
+        }
+
+        const column = columnForStatus(task.task_status);
+        if (column && (keepOrder || taskCard.parentElement !== column)) {
+            column.appendChild(taskCard);
+        }
+    }
+
+    /**
+     * Removes the card of a task from the board, if it is displayed
+     * @param {number} taskId - The ID of the task to remove
+     */
+    function removeTaskCard(taskId) {
+        const taskCard = cardsById.get(taskId);
+        if (taskCard) {
+            taskCard.remove();
+            cardsById.delete(taskId);
+        }
+    }
+
+    /**
+     * Shows a "no tasks" message in every column when the board is empty, and hides it otherwise
+     */
+    function updateEmptyMessages() {
+        const columns = [
+            [backlogColumn, "No Backlog tasks found."],
+            [todoColumn, "No To Do tasks found."],
+            [inProgressColumn, "No In Progress tasks found."],
+            [doneColumn, "No Done tasks found."]
+        ];
+        columns.forEach(([column, text]) => {
+            let message = column.querySelector(".no-tasks-message");
+            if (cardsById.size === 0 && !message) {
+                message = document.createElement("p");
+                message.className = "no-tasks-message";
+                message.textContent = text;
+                column.appendChild(message);
+            } else if (cardsById.size > 0 && message) {
+                message.remove();
+            }
+        });
+    }
+
+    /**
+     * Replaces the board with a full list of tasks, reusing the cards of tasks already displayed
+     * @param {Array} tasks - The tasks to display, in display order
+     */
+    function replaceBoard(tasks) {
+        const displayedIds = new Set();
+        tasks.forEach(task => {
+            displayedIds.add(task.task_id);
+            upsertTaskCard(task, true);
+        });
+        Array.from(cardsById.keys())
+            .filter(taskId => !displayedIds.has(taskId))
+            .forEach(removeTaskCard);
+    }
+
+    /**
+     * Applies the changes returned by a delta request to the board
+     * @param {Array} tasks - The new or changed tasks matching the filters
+     * @param {Array} removed - The IDs of the tasks to remove
+     */
+    function applyBoardChanges(tasks, removed) {
+        removed.forEach(removeTaskCard);
+        tasks.forEach(task => upsertTaskCard(task, false));
+    }
+
     /**
      * Fetches tasks based on the provided filter criteria and displays them on the Kanban board
-     * This function clears existing tasks from the board and re-populates it with filtered tasks
+     * When the filters are the same as those of the board on display, only the changes since
+     * the board's version are requested and patched in; otherwise the full list is fetched
      * @param {Object} data - The filter criteria to be sent to the backend
      */
     function fetchAndDisplayKanbanTasks(data) {
+        const filterKey = JSON.stringify(data);
+        const requestBody = Object.assign({}, data);
+        if (filterKey === boardFilterKey && boardVersion !== null) {
+            requestBody.since = boardVersion;
+        }
+        const requestId = ++latestRequestId;
+
         fetch("/api/kanban_tasks", {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify(data),
+            body: JSON.stringify(requestBody),
         })
         .then(response => response.json())
-        .then(data => {
-            // Clear the task cards inside each column while preserving the label
-            backlogColumn.querySelectorAll('.task-card').forEach(e => e.remove());
-            todoColumn.querySelectorAll('.task-card').forEach(e => e.remove());
-            inProgressColumn.querySelectorAll('.task-card').forEach(e => e.remove());
-            doneColumn.querySelectorAll('.task-card').forEach(e => e.remove());
-
-            // Render tasks in the appropriate columns
-            if (data.tasks && data.tasks.length > 0) {
-                data.tasks.forEach(task => {
-                    const taskCard = document.createElement("div");
-                    taskCard.className = "card task-card mb-3";
-                    taskCard.setAttribute("data-task-id", task.task_id);
-                    taskCard.setAttribute("data-task-status", task.task_status); // To track status for drag-and-drop
-                    taskCard.innerHTML = `
-                        <div class="card-body">
-                            <h5 class="card-title">${task.task_desc || 'No Description'}</h5>
-                            <p class="card-text"><strong>Status:</strong> ${task.task_status}</p>
-                            <p class="card-text"><strong>Priority:</strong> ${task.task_priority}</p>
-                            <p class="card-text"><strong>Due Date:</strong> ${task.task_due_date}</p>
-                        </div>
-                    `;
-
-                    // Append the task card directly to the relevant column
-                    if (task.task_status === "Backlog") {
-                        backlogColumn.appendChild(taskCard);
-                    } else if (task.task_status === "To Do") {
-                        todoColumn.appendChild(taskCard);
-                    } else if (task.task_status === "In Progress") {
-                        inProgressColumn.appendChild(taskCard);
-                    } else if (task.task_status === "Done") {
-                        doneColumn.appendChild(taskCard);
-                    }
-                });
+        .then(result => {
+            // Ignore responses overtaken by a newer request (e.g. while typing a search)
+            if (requestId !== latestRequestId || !result.tasks) {
+                return;
+            }
+
+            if (result.removed) {
+                applyBoardChanges(result.tasks, result.removed);
             } else {
-                // Handle case where no tasks are found
-                backlogColumn.innerHTML += "<p>No Backlog tasks found.</p>";
-                todoColumn.innerHTML += "<p>No To Do tasks found.</p>";
-                inProgressColumn.innerHTML += "<p>No In Progress tasks found.</p>";
-                doneColumn.innerHTML += "<p>No Done tasks found.</p>";
+                replaceBoard(result.tasks);
             }
+            updateEmptyMessages();
 
-            // Reinitialize sortable for drag-and-drop functionality after rendering tasks
-            initializeSortable();
+            boardVersion = result.version;
+            boardFilterKey = filterKey;
+            boardFilters = data;
         })
         .catch(error => console.error("Error fetching Kanban tasks:", error));
     }
 
+    /**
+     * Brings the board up to date with the server by fetching the changes since its version
+     */
+    function syncKanbanTasks() {
+        fetchAndDisplayKanbanTasks(boardFilters);
+    }
+
     // Event listener for the filter button
     // Applies filters based on user input and fetches matching tasks
     filterBtn.addEventListener("click", function () {
@@ -278,18 +401,16 @@ document.addEventListener("DOMContentLoaded", function () {
     });
 
     // "Due Today" button event listener
-    // Fetches tasks due today and displays them on the Kanban board
+    // Fetches tasks due today and displays them on the Kanban board; the server
+    // resolves the bucket from its own date, so the browser's clock does not matter
     dueTodayBtn.addEventListener("click", function () {
-        const todayDate = getTodayDate();
-
-        // Create a data object to send to the backend
-        const data = {
-            start_date: todayDate,
-            end_date: todayDate
-        };
+        fetchAndDisplayKanbanTasks({ due: "today" });
+    });
 
-        // Call the function to fetch and display tasks filtered by today's date
-        fetchAndDisplayKanbanTasks(data);
+    // "Overdue" button event listener
+    // Fetches the tasks not done whose due date has passed
+    overdueBtn.addEventListener("click", function () {
+        fetchAndDisplayKanbanTasks({ due: "overdue" });
     });
 
     // Event listener for task search input
@@ -345,62 +466,267 @@ document.addEventListener("DOMContentLoaded", function () {
         });
     });
 
+    // Initialize drag-and-drop once; the columns keep their Sortable instances while cards are patched
+    initializeSortable();
+
+    // Pending delta sync triggered by pushed events, so a burst of events costs a single request
+    let pushSyncTimer = null;
+
+    /**
+     * Schedules a delta sync of the board shortly after a pushed event
+     */
+    function schedulePushSync() {
+        if (pushSyncTimer === null) {
+            pushSyncTimer = setTimeout(() => {
+                pushSyncTimer = null;
+                syncKanbanTasks();
+            }, 250);
+        }
+    }
+
+    /**
+     * Subscribes to the server-sent task events so changes made by other users appear without a refresh
+     * Every event, and every (re)connection, triggers a delta sync; the browser reconnects by itself
+     * and resumes from the last event received
+     */
+    function subscribeToTaskEvents() {
+        if (!window.EventSource) {
+            return;
+        }
+        const taskEvents = new EventSource("/api/events");
+        taskEvents.addEventListener("open", () => {
+            if (boardVersion !== null) {
+                schedulePushSync();
+            }
+        });
+        taskEvents.addEventListener("task", schedulePushSync);
+        taskEvents.addEventListener("resync", schedulePushSync);
+    }
+
+    subscribeToTaskEvents();
+
     // Initial fetch of tasks when the page loads
     // This ensures the Kanban board is populated as soon as the user visits the page
     fetchAndDisplayKanbanTasks({});
 
     /**
      * Handles updating task status in both the frontend and backend
+     * While an update of the card is in flight, a new drop only replaces the status to send next:
+     * requests sent together could reach the server in any order and leave the card in a column
+     * the user already left
      * @param {HTMLElement} taskElement - The task element that has been dragged and dropped
      */
     function handleTaskStatusUpdate(taskElement) {
-        const taskId = taskElement.getAttribute('data-task-id');
+        const taskId = Number(taskElement.getAttribute('data-task-id'));
         const previousStatus = taskElement.getAttribute('data-task-status');
 
         // Identify the new status based on the column where the task is dropped
-        let newStatus = '';
-        const parentColumnId = taskElement.parentElement.id;
-
-        if (parentColumnId === 'backlog') {
-            newStatus = 'Backlog';
-        } else if (parentColumnId === 'todo') {
-            newStatus = 'To Do';
-        } else if (parentColumnId === 'inprogress') {
-            newStatus = 'In Progress';
-        } else if (parentColumnId === 'done') {
-            newStatus = 'Done';
+        const newStatus = statusForColumn(taskElement.parentElement);
+        if (!newStatus || newStatus === previousStatus) {
+            return;
         }
 
-        if (newStatus && newStatus !== previousStatus) {
-            // Update the status in the UI
-            const statusElement = Array.from(taskElement.querySelectorAll('.card-text')).find(p => p.innerText.includes('Status'));
-            statusElement.innerHTML = `<strong>Status:</strong> ${newStatus}`;
-            taskElement.setAttribute('data-task-status', newStatus);
-
-            // Send the updated status to the backend
-            fetch(`/api/update_task_status/${taskId}`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ status: newStatus })
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (!data.success) {
-                    console.error(`Failed to update task ${taskId} in the database.`);
-                    // Revert the UI if the update fails
-                    statusElement.innerHTML = `<strong>Status:</strong> ${previousStatus}`;
-                    taskElement.setAttribute('data-task-status', previousStatus);
+        // Update the status in the UI
+        setCardStatus(taskElement, newStatus);
+
+        const update = statusUpdates.get(taskId);
+        if (update) {
+            update.next = newStatus;
+        } else {
+            sendTaskStatus(taskId, newStatus, previousStatus);
+        }
+    }
+
+    /**
+     * Sends the status of a card to the backend
+     * @param {number} taskId - The ID of the task
+     * @param {string} status - The status to save
+     * @param {string} savedStatus - The last status the server confirmed, restored if the update fails
+     */
+    function sendTaskStatus(taskId, status, savedStatus) {
+        const update = { next: null, saved: savedStatus };
+        statusUpdates.set(taskId, update);
+
+        fetch(`/api/update_task_status/${taskId}`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ status: status })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                // The status saved, a later one if the server coalesced this update with others
+                update.saved = data.status || status;
+            } else {
+                console.error(`Failed to update task ${taskId} in the database.`);
+            }
+            finishTaskStatus(taskId, update);
+        })
+        .catch(error => {
+            console.error(`Error updating task ${taskId} status:`, error);
+            finishTaskStatus(taskId, update);
+        });
+    }
+
+    /**
+     * Sends the status of the card's latest drop once the previous request is answered, or shows
+     * the status saved on the card when none is left to send
+     * @param {number} taskId - The ID of the task
+     * @param {Object} update - The update of the card, from statusUpdates
+     */
+    function finishTaskStatus(taskId, update) {
+        statusUpdates.delete(taskId);
+        if (update.next !== null && update.next !== update.saved) {
+            sendTaskStatus(taskId, update.next, update.saved);
+            return;
+        }
+
+        // Revert the UI if the update failed, or follow the server if it saved another status
+        const taskCard = cardsById.get(taskId);
+        if (taskCard && taskCard.getAttribute('data-task-status') !== update.saved) {
+            setCardStatus(taskCard, update.saved);
+            const column = columnForStatus(update.saved);
+            if (column) {
+                column.appendChild(taskCard);
+            }
+        }
+        // Pick up the saved task, and any other changes, without reloading the board
+        syncKanbanTasks();
+    }
+
+    /**
+     * Returns the task status of a Kanban column
+     * @param {HTMLElement} column - The column element
+     * @returns {string} - The status, or an empty string for an unknown column
+     */
+    function statusForColumn(column) {
+        if (column === backlogColumn) {
+            return 'Backlog';
+        } else if (column === todoColumn) {
+            return 'To Do';
+        } else if (column === inProgressColumn) {
+            return 'In Progress';
+        } else if (column === doneColumn) {
+            return 'Done';
+        }
+        return '';
+    }
+
+    /**
+     * Shows a status on a task card
+     * @param {HTMLElement} taskCard - The task card
+     * @param {string} status - The status to show
+     */
+    function setCardStatus(taskCard, status) {
+        const statusElement = Array.from(taskCard.querySelectorAll('.card-text')).find(p => p.innerText.includes('Status'));
+        if (statusElement) {
+            statusElement.innerHTML = `<strong>Status:</strong> ${status}`;
+        }
+        taskCard.setAttribute('data-task-status', status);
+    }
+
+    // Ctrl-click (Cmd-click on macOS) selects several cards, which are then dragged together
+    [backlogColumn, todoColumn, inProgressColumn, doneColumn].forEach(column => {
+        column.addEventListener("click", function (event) {
+            const taskCard = event.target.closest(".task-card");
+            if (taskCard && (event.ctrlKey || event.metaKey)) {
+                taskCard.classList.toggle("selected");
+            }
+        });
+    });
+
+    /**
+     * Handles a dropped task card: a card dropped as part of a multi-selection moves the whole
+     * selection with one bulk update, any other card is updated on its own
+     * @param {HTMLElement} taskElement - The task element that has been dragged and dropped
+     */
+    function handleTaskDrop(taskElement) {
+        const selectedCards = Array.from(document.querySelectorAll(".task-card.selected"));
+        if (taskElement.classList.contains("selected") && selectedCards.length > 1) {
+            handleBulkStatusUpdate(taskElement, selectedCards);
+        } else {
+            handleTaskStatusUpdate(taskElement);
+        }
+    }
+
+    /**
+     * Moves all selected cards to the column the dragged card was dropped in and saves
+     * their new status with a single request to the bulk update endpoint
+     * Cards whose update is rejected are moved back to their previous column
+     * @param {HTMLElement} taskElement - The card that was dragged
+     * @param {Array} selectedCards - All selected cards, including the dragged one
+     */
+    function handleBulkStatusUpdate(taskElement, selectedCards) {
+        const column = taskElement.parentElement;
+        const newStatus = statusForColumn(column);
+        if (!newStatus) {
+            return;
+        }
+
+        // Place the rest of the selection right after the dropped card and update the UI
+        const previousStatuses = new Map();
+        let anchor = taskElement;
+        selectedCards.forEach(taskCard => {
+            if (taskCard !== taskElement) {
+                anchor.after(taskCard);
+                anchor = taskCard;
+            }
+            const previousStatus = taskCard.getAttribute('data-task-status');
+            if (previousStatus !== newStatus) {
+                previousStatuses.set(Number(taskCard.getAttribute('data-task-id')), previousStatus);
+                setCardStatus(taskCard, newStatus);
+            }
+            taskCard.classList.remove("selected");
+        });
+
+        if (previousStatuses.size === 0) {
+            return;
+        }
+
+        const revert = taskIds => taskIds.forEach(taskId => {
+            const taskCard = cardsById.get(taskId);
+            const previousStatus = previousStatuses.get(taskId);
+            if (taskCard && previousStatus) {
+                setCardStatus(taskCard, previousStatus);
+                const previousColumn = columnForStatus(previousStatus);
+                if (previousColumn) {
+                    previousColumn.appendChild(taskCard);
                 }
+            }
+        });
+
+        fetch('/api/update_task_statuses', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                updates: Array.from(previousStatuses.keys()).map(taskId => ({ task_id: taskId, status: newStatus }))
             })
-            .catch(error => {
-                console.error(`Error updating task ${taskId} status:`, error);
-                // Revert the UI in case of an error
-                statusElement.innerHTML = `<strong>Status:</strong> ${previousStatus}`;
-                taskElement.setAttribute('data-task-status', previousStatus);
-            });
-        }
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                console.error("Failed to update the selected tasks in the database.");
+                revert(Array.from(previousStatuses.keys()));
+                return;
+            }
+            // Revert only the tasks the server did not update
+            const failed = data.results
+                .filter(result => result.outcome !== 'updated' && result.outcome !== 'unchanged')
+                .map(result => result.task_id);
+            if (failed.length > 0) {
+                console.error(`Failed to update tasks ${failed.join(', ')} in the database.`);
+                revert(failed);
+            }
+            syncKanbanTasks();
+        })
+        .catch(error => {
+            console.error("Error updating the selected tasks:", error);
+            revert(Array.from(previousStatuses.keys()));
+        });
     }
 
     /**
@@ -412,7 +738,7 @@ document.addEventListener("DOMContentLoaded", function () {
             group: 'kanban',
             animation: 150,
             onEnd: function (evt) {
-                handleTaskStatusUpdate(evt.item);  // Call status update handler on drop
+                handleTaskDrop(evt.item);  // Call status update handler on drop
             }
         });
 
@@ -420,7 +746,7 @@ document.addEventListener("DOMContentLoaded", function () {
             group: 'kanban',
             animation: 150,
             onEnd: function (evt) {
-                handleTaskStatusUpdate(evt.item);  // Call status update handler on drop
+                handleTaskDrop(evt.item);  // Call status update handler on drop
             }
         });
 
@@ -428,7 +754,7 @@ document.addEventListener("DOMContentLoaded", function () {
             group: 'kanban',
             animation: 150,
             onEnd: function (evt) {
-                handleTaskStatusUpdate(evt.item);  // Call status update handler on drop
+                handleTaskDrop(evt.item);  // Call status update handler on drop
             }
         });
 
@@ -436,7 +762,7 @@ document.addEventListener("DOMContentLoaded", function () {
             group: 'kanban',
             animation: 150,
             onEnd: function (evt) {
-                handleTaskStatusUpdate(evt.item);  // Call status update handler on drop
+                handleTaskDrop(evt.item);  // Call status update handler on drop
             }
         });
     }
@@ -5,12 +5,14 @@
  * - Fetching tasks from the server based on user input and filters.
  * - Filtering tasks by various criteria such as POS ID, POS Name, dates, status, and priority.
  * - Providing real-time search functionality as the user types.
- * - Implementing pagination to navigate through the tasks.
+ * - Rendering the task table as a windowed scrolling list: pages are loaded with cursors as the user
+ *   scrolls, and only the rows in view (plus a small margin) are in the DOM, so the table stays fast
+ *   however many tasks match.
  * 
  * **Main Components:**
- * 1. Event Listeners: Attached to DOM elements like filter inputs, search box, and pagination controls.
+ * 1. Event Listeners: Attached to DOM elements like filter inputs, search box, and the scrolling table.
  * 2. Fetch Operations: Sends requests to the server to retrieve data, populate dropdowns, and update the task table.
- * 3. Dynamic DOM Manipulation: Updates the task table and pagination controls based on server responses.
+ * 3. Dynamic DOM Manipulation: Renders the visible window of the task table and the task count.
  * 
  * **Interactivity with Server and Other Files:**
  * - Communicates with the Flask backend (`/filter_tasks`, `/api/pos_names_and_ids`, etc.) to fetch and filter task data.
@@ -26,15 +28,28 @@ document.addEventListener("DOMContentLoaded", function () {
     const filterBtn = document.getElementById("filterBtn");
     const clearFilterBtn = document.getElementById("clearFilterBtn");
     const taskTableBody = document.getElementById("taskTableBody");
+    const taskTableScroll = document.getElementById("taskTableScroll"); // Scrolling container of the table
     const posIDSelect = document.getElementById("filterPosID");
     const posNameSelect = document.getElementById("filterPosName");
     const startDateInput = document.getElementById("startDate");
     const endDateInput = document.getElementById("endDate");
-    const paginationContainer = document.getElementById("paginationContainer"); // Container for pagination controls
+    const paginationContainer = document.getElementById("paginationContainer"); // Container for the task count
 
     let isPosIDUpdating = false;  // Flags to prevent multiple simultaneous updates
     let isPosNameUpdating = false;
-    let currentPage = 1; // Track the current page
+
+    // Windowed table state
+    const PAGE_SIZE = 50;          // Tasks requested per page (the server allows up to 100)
+    const OVERSCAN_ROWS = 10;      // Rows rendered above and below the visible ones
+    const PREFETCH_ROWS = 25;      // Load the next page when the window gets this close to the end
+    let loadedTasks = [];          // Every task loaded so far for the current filters, in display order
+    let totalTasks = null;         // Number of tasks matching the filters, counted with the first page
+    let nextCursor = null;         // Opaque cursor of the next page, null once everything is loaded
+    let currentFilters = {};       // Filters the loaded tasks were fetched with
+    let isLoadingPage = false;
+    let loadGeneration = 0;        // Bumped on every new filter so responses for older filters are ignored
+    let rowHeight = 0;             // Measured from the first rendered row
+    let renderedRange = null;      // [first, last) rows currently in the DOM
 
     // Get today's date for setting placeholders
     // This function provides a formatted date string for today's date
@@ -171,63 +186,186 @@ document.addEventListener("DOMContentLoaded", function () {
         }
     });
 
-    // Fetch and display tasks based on filter and pagination
-    // This function sends a POST request to the server with the current filters
-    // and renders the tasks in the table based on the response.
-    function fetchAndDisplayTasks(data, page = 1) {
-        console.log("Sending data to server:", data);
+    // Escape task fields before inserting them into the table markup
+    function escapeHtml(value) {
+        return String(value)
+            .replace(/&/g, "&amp;")
+            .replace(/</g, "&lt;")
+            .replace(/>/g, "&gt;")
+            .replace(/"/g, "&quot;");
+    }
+
+    const TASK_COLUMNS = [
+        "task_id", "pos_id", "pos_name", "rec_date", "rec_certified", "task_desc", "task_status",
+        "task_priority", "blocker_desc", "blocker_responsible", "task_start_date", "task_due_date", "task_notes"
+    ];
 
-        data.page = page; // Include the current page number
+    // Build the markup of one task row. Cells are kept on one line (see .task-table-scroll in
+    // style.css) so every row has the same height; the full text is available as a tooltip.
+    function taskRowHtml(task) {
+        const cells = TASK_COLUMNS.map(column => {
+            const value = escapeHtml(task[column] || 'n/a');
+            return `<td title="${value}">${value}</td>`;
+        });
+        return `<tr>${cells.join("")}</tr>`;
+    }
+
+    // Render the rows in view and spacer rows standing in for the ones above and below,
+    // so the scrollbar reflects the whole list while the DOM only holds a few dozen rows.
+    function renderVisibleRows(force = false) {
+        if (loadedTasks.length === 0) {
+            return;
+        }
 
-        fetch("/filter_tasks", {
+        const height = rowHeight || 40; // Estimate until the first row has been measured
+        const viewportRows = Math.ceil(taskTableScroll.clientHeight / height);
+        const firstVisible = Math.floor(taskTableScroll.scrollTop / height);
+        const first = Math.max(0, firstVisible - OVERSCAN_ROWS);
+        const last = Math.min(loadedTasks.length, firstVisible + viewportRows + OVERSCAN_ROWS);
+
+        if (force || !renderedRange || renderedRange[0] !== first || renderedRange[1] !== last) {
+            const rows = [];
+            if (first > 0) {
+                rows.push(`<tr class="spacer-row" style="height: ${first * height}px"><td colspan="13"></td></tr>`);
+            }
+            for (let index = first; index < last; index++) {
+                rows.push(taskRowHtml(loadedTasks[index]));
+            }
+            if (last < loadedTasks.length) {
+                rows.push(`<tr class="spacer-row" style="height: ${(loadedTasks.length - last) * height}px"><td colspan="13"></td></tr>`);
+            }
+            taskTableBody.innerHTML = rows.join("");
+            renderedRange = [first, last];
+
+            if (!rowHeight) {
+                const firstRow = taskTableBody.querySelector("tr:not(.spacer-row)");
+                if (firstRow && firstRow.offsetHeight) {
+                    rowHeight = firstRow.offsetHeight;
+                    renderVisibleRows(true); // Redo the spacers with the real row height
+                    return;
+                }
+            }
+        }
+
+        // Keep loading ahead of the user
+        if (nextCursor && last + PREFETCH_ROWS >= loadedTasks.length) {
+            loadNextPage();
+        }
+    }
+
+    // Show how many of the matching tasks are loaded
+    function updateTaskCount() {
+        paginationContainer.innerHTML = "";
+        const countInfo = document.createElement("span");
+        countInfo.style.fontSize = "0.85em"; // Smaller font size
+        countInfo.textContent = totalTasks === null
+            ? `${loadedTasks.length} tasks`
+            : `Showing ${loadedTasks.length} of ${totalTasks} tasks`;
+        paginationContainer.appendChild(countInfo);
+    }
+
+    // Request one page of tasks for the current filters
+    function requestPage(cursor) {
+        const body = Object.assign({}, currentFilters, {
+            per_page: PAGE_SIZE,
+            cursor: cursor,
+            with_total: cursor === null // Only the first page counts the matching tasks
+        });
+
+        return fetch("/filter_tasks", {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify(data),
-        })
-        .then(response => response.json())
-        .then(data => {
-            console.log("Received data:", data);
-
-            taskTableBody.innerHTML = ""; // Clear the table body
-
-            if (data.tasks && data.tasks.length > 0) {
-                // Iterate through the tasks and append them to the table
-                data.tasks.forEach(task => {
-                    const row = `
-                    <tr>
-                        <td>${task.task_id || 'n/a'}</td>
-                        <td>${task.pos_id || 'n/a'}</td>
-                        <td>${task.pos_name || 'n/a'}</td>
-                        <td>${task.rec_date || 'n/a'}</td>
-                        <td>${task.rec_certified || 'n/a'}</td>
-                        <td>${task.task_desc || 'n/a'}</td>
-                        <td>${task.task_status || 'n/a'}</td>
-                        <td>${task.task_priority || 'n/a'}</td>
-                        <td>${task.blocker_desc || 'n/a'}</td>
-                        <td>${task.blocker_responsible || 'n/a'}</td>
-                        <td>${task.task_start_date || 'n/a'}</td>
-                        <td>${task.task_due_date || 'n/a'}</td>
-                        <td>${task.task_notes || 'n/a'}</td>
-                    </tr>`;
-                    taskTableBody.innerHTML += row;
-                });
-                console.log("Tasks rendered successfully.");
-                updatePaginationControls(data.page, data.total_pages); // Update pagination controls
-            } else {
-                taskTableBody.innerHTML = "<tr><td colspan='13'>No tasks found</td></tr>";
-            }
-        })
-        .catch(error => console.error("Error fetching tasks:", error));
+            body: JSON.stringify(body),
+        }).then(response => response.json());
     }
 
+    // Append the next page of tasks to the list
+    function loadNextPage() {
+        if (isLoadingPage || !nextCursor) {
+            return;
+        }
+        isLoadingPage = true;
+        const generation = loadGeneration;
+
+        requestPage(nextCursor)
+            .then(data => {
+                if (generation !== loadGeneration) {
+                    return; // The filters changed while this page was loading
+                }
+                loadedTasks = loadedTasks.concat(data.tasks || []);
+                nextCursor = data.next_cursor || null;
+                updateTaskCount();
+                renderVisibleRows(true);
+            })
+            .catch(error => console.error("Error fetching tasks:", error))
+            .finally(() => {
+                if (generation === loadGeneration) {
+                    isLoadingPage = false;
+                }
+            });
+    }
+
+    // Fetch and display tasks based on filters
+    // This function starts a new list for the given filters: it loads the first page
+    // (with the number of matching tasks) and scrolls the table back to the top.
+    // Further pages are loaded by cursor as the user scrolls, so every request costs
+    // the same regardless of how many tasks have been loaded already.
+    function fetchAndDisplayTasks(data) {
+        console.log("Sending data to server:", data);
+
+        loadGeneration++;
+        const generation = loadGeneration;
+        currentFilters = data;
+        isLoadingPage = true;
+
+        requestPage(null)
+            .then(data => {
+                if (generation !== loadGeneration) {
+                    return; // A newer filter has been applied in the meantime
+                }
+                console.log("Received data:", data);
+
+                loadedTasks = data.tasks || [];
+                totalTasks = data.total_records ?? null;
+                nextCursor = data.next_cursor || null;
+                renderedRange = null;
+                taskTableScroll.scrollTop = 0;
+
+                if (loadedTasks.length > 0) {
+                    renderVisibleRows(true);
+                    console.log("Tasks rendered successfully.");
+                } else {
+                    taskTableBody.innerHTML = "<tr><td colspan='13'>No tasks found</td></tr>";
+                }
+                updateTaskCount();
+            })
+            .catch(error => console.error("Error fetching tasks:", error))
+            .finally(() => {
+                if (generation === loadGeneration) {
+                    isLoadingPage = false;
+                }
+            });
+    }
+
+    // Re-render the window as the table scrolls, at most once per animation frame
+    let renderScheduled = false;
+    taskTableScroll.addEventListener("scroll", function () {
+        if (!renderScheduled) {
+            renderScheduled = true;
+            requestAnimationFrame(() => {
+                renderScheduled = false;
+                renderVisibleRows();
+            });
+        }
+    });
+
     // Event listener for the Filter button
     // Triggers a fetch request to get tasks based on the current filter criteria.
     filterBtn.addEventListener("click", function () {
-        currentPage = 1; // Reset to the first page on new filter
         const data = collectFilterData();
-        fetchAndDisplayTasks(data, currentPage);
+        fetchAndDisplayTasks(data);
     });
 
     // Collect filter data from inputs
@@ -255,9 +393,8 @@ document.addEventListener("DOMContentLoaded", function () {
     // Event listener for the search input field (dynamic filtering)
     // This provides real-time filtering as the user types in the search field.
     taskSearchInput.addEventListener("input", function () {
-        currentPage = 1; // Reset to the first page on new search
         const data = collectFilterData();
-        fetchAndDisplayTasks(data, currentPage);
+        fetchAndDisplayTasks(data);
     });
 
     // Event listener for the Clear Filter button
@@ -276,52 +413,9 @@ document.addEventListener("DOMContentLoaded", function () {
         fetchAllPosNamesAndIds();
 
         // Fetch tasks without any filters
-        currentPage = 1; // Reset to the first page
-        fetchAndDisplayTasks({}, currentPage);
+        fetchAndDisplayTasks({});
     });
 
     // Initial fetch when the page loads
-    fetchAndDisplayTasks({}, currentPage);
-
-    // Update pagination controls
-    // This function updates the pagination controls based on the current page and total pages.
-    function updatePaginationControls(currentPage, totalPages) {
-        paginationContainer.innerHTML = ""; // Clear existing controls
-
-        // Previous link
-        if (currentPage > 1) {
-            const prevLink = document.createElement("a");
-            prevLink.href = "#";
-            prevLink.textContent = "Previous";
-            prevLink.style.fontSize = "0.85em"; // Smaller font size
-            prevLink.style.marginRight = "10px"; // Add some spacing
-            prevLink.addEventListener("click", function (event) {
-                event.preventDefault(); // Prevent default anchor behavior
-                currentPage--;
-                fetchAndDisplayTasks(collectFilterData(), currentPage);
-            });
-            paginationContainer.appendChild(prevLink);
-        }
-
-        // Page info
-        const pageInfo = document.createElement("span");
-        pageInfo.textContent = ` Page ${currentPage} of ${totalPages} `;
-        pageInfo.style.fontSize = "0.85em"; // Smaller font size
-        paginationContainer.appendChild(pageInfo);
-
-        // Next link
-        if (currentPage < totalPages) {
-            const nextLink = document.createElement("a");
-            nextLink.href = "#";
-            nextLink.textContent = "Next";
-            nextLink.style.fontSize = "0.85em"; // Smaller font size
-            nextLink.style.marginLeft = "10px"; // Add some spacing
-            nextLink.addEventListener("click", function (event) {
-                event.preventDefault(); // Prevent default anchor behavior
-                currentPage++;
-                fetchAndDisplayTasks(collectFilterData(), currentPage);
-            });
-            paginationContainer.appendChild(nextLink);
-        }
-    }
+    fetchAndDisplayTasks({});
 });
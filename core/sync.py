@@ -0,0 +1,160 @@
+"""
+sync.py
+
+This file implements change tracking on the tasks table, which lets the Kanban board fetch only the tasks that changed
+since its last refresh instead of the whole board.
+
+Key Components:
+- Change Versions: Every insert or update of a task stamps it with the next value of a database-wide counter
+  (`task_change_counter`), so `tasks.change_version` grows monotonically with each change.
+- Tombstones: Deleted tasks leave their id and the version of the delete in `task_tombstones`, so clients can
+  drop the matching cards.
+- Delta Queries: Given the version a client last saw, return the changed tasks that match its filters and the
+  ids of the tasks it must remove (deleted, or changed so that they no longer match).
+
+Correlations:
+- The schema is created by a migration (migrations.py); the triggers keep it current for every writer.
+- Used by the `/api/kanban_tasks` route in app.py with the Kanban query built in queries.py.
+"""
+
+from core.helpers import tasks_table
+from sqlalchemy import select, table, column, text, bindparam
+import logging
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+task_tombstones = table("task_tombstones", column("task_id"), column("change_version"))
+
+# Ids of the tasks changed and deleted after a version, executed with {"since": ...}
+CHANGED_TASK_IDS = select(tasks_table.c.task_id).where(tasks_table.c.change_version > bindparam("since"))
+DELETED_TASK_IDS = select(task_tombstones.c.task_id).where(task_tombstones.c.change_version > bindparam("since"))
+
+# The counter, the tombstones and the triggers stamping every change. The update trigger only fires
+# for updates that did not set change_version themselves, so stamping a row does not re-trigger it.
+TASK_VERSIONING_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS task_change_counter (
+        counter_id INTEGER NOT NULL PRIMARY KEY CHECK (counter_id = 1),
+        version INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO task_change_counter (counter_id, version) VALUES (1, 0)",
+    """
+    CREATE TABLE IF NOT EXISTS task_tombstones (
+        task_id INTEGER NOT NULL PRIMARY KEY,
+        change_version INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_tasks_change_version ON tasks (change_version)",
+    "CREATE INDEX IF NOT EXISTS ix_task_tombstones_change_version ON task_tombstones (change_version)",
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_version_after_insert AFTER INSERT ON tasks BEGIN
+        UPDATE task_change_counter SET version = version + 1 WHERE counter_id = 1;
+        UPDATE tasks SET change_version = (SELECT version FROM task_change_counter WHERE counter_id = 1)
+        WHERE task_id = new.task_id;
+        DELETE FROM task_tombstones WHERE task_id = new.task_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_version_after_update AFTER UPDATE ON tasks
+    WHEN new.change_version = old.change_version BEGIN
+        UPDATE task_change_counter SET version = version + 1 WHERE counter_id = 1;
+        UPDATE tasks SET change_version = (SELECT version FROM task_change_counter WHERE counter_id = 1)
+        WHERE task_id = new.task_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_version_after_delete AFTER DELETE ON tasks BEGIN
+        UPDATE task_change_counter SET version = version + 1 WHERE counter_id = 1;
+        INSERT OR REPLACE INTO task_tombstones (task_id, change_version)
+        VALUES (old.task_id, (SELECT version FROM task_change_counter WHERE counter_id = 1));
+    END
+    """,
+    # Kanban cards show the POS name, so renaming a POS changes all of its tasks
+    """
+    CREATE TRIGGER IF NOT EXISTS pos_tasks_version_after_rename AFTER UPDATE OF pos_name ON pos BEGIN
+        UPDATE task_change_counter SET version = version + 1 WHERE counter_id = 1;
+        UPDATE tasks SET change_version = (SELECT version FROM task_change_counter WHERE counter_id = 1)
+        WHERE pos_id = new.pos_id;
+    END
+    """
+]
+
+# Set once change tracking has been seen in the database, so the check costs nothing afterwards
+_versioning_available = False
+
+def create_task_versioning(conn):
+    """
+    Add the change_version column to tasks and create the change tracking tables and triggers.
+
+    Safe to re-run: the column is only added when missing and the rest uses IF NOT EXISTS.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to run the DDL on. The caller commits.
+    """
+    columns = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(tasks)")]
+    if "change_version" not in columns:
+        conn.exec_driver_sql("ALTER TABLE tasks ADD COLUMN change_version INTEGER NOT NULL DEFAULT 0")
+    for statement in TASK_VERSIONING_DDL:
+        conn.exec_driver_sql(statement)
+
+def task_versioning_available(conn):
+    """
+    Check whether the database tracks task changes.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection used for the check.
+
+    Returns:
+    - available (bool): True if the change counter table exists.
+    """
+    global _versioning_available
+
+    if not _versioning_available:
+        found = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_change_counter'")
+        ).first()
+        if found:
+            _versioning_available = True
+        else:
+            logger.warning("Task change tracking missing; run 'flask --app core.app db-upgrade'")
+    return _versioning_available
+
+def current_task_version(conn):
+    """
+    Read the version of the latest change to the tasks table.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to the database.
+
+    Returns:
+    - version (int): The current change version, or None without change tracking.
+    """
+    if not task_versioning_available(conn):
+        return None
+    return conn.execute(text("SELECT version FROM task_change_counter WHERE counter_id = 1")).scalar()
+
+def fetch_task_changes(conn, query, since):
+    """
+    Fetch the changes to a filtered task list since a version.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to the database.
+    - query (TaskQuery): The filtered task query the client displays, built
+      with changed_since=True so it only returns the tasks changed after 'since'.
+    - since (int): The version the client last received.
+
+    Returns:
+    - upserts (list): Rows of the query changed after `since`.
+    - removed (list): Ids of tasks deleted after `since`, or changed so that
+      they no longer match the query.
+    """
+    upserts = conn.execute(query.statement, dict(query.params, since=since)).fetchall()
+
+    changed_ids = conn.execute(CHANGED_TASK_IDS, {"since": since}).scalars().all()
+    deleted_ids = conn.execute(DELETED_TASK_IDS, {"since": since}).scalars().all()
+
+    matching_ids = {task.task_id for task in upserts}
+    removed = [task_id for task_id in changed_ids if task_id not in matching_ids] + deleted_ids
+    return upserts, removed
@@ -0,0 +1,282 @@
+"""
+task_summary.py
+
+This file maintains the task count summary served by `/api/kanban_summary`: the number of tasks by POS, status
+and priority, and the number of open tasks by POS, status and due date, from which the overdue counts are read.
+The Kanban column headers and the store dashboards used to count the tasks they had pulled through
+`/api/kanban_tasks`; they now read a table whose size depends on the number of stores and open due dates, not on
+the number of tasks.
+
+Key Components:
+- Summary Tables: `task_summary` holds one count per (POS, status, priority) and `task_due_summary` one count per
+  (due date, POS, status) for the tasks not done that have a due date. A task is overdue once its due date has
+  passed, which changes with the calendar rather than with a write, so the overdue counts are the sum of the
+  open counts of the dates before today, a range of the due summary's primary key.
+- Triggers: Inserting, deleting or updating the counted columns of a task moves it between counts within the
+  statement doing it, so the counts are committed or rolled back with the write. Every writer, the create,
+  modify and Kanban routes, the importer or a manual SQL session, keeps them current.
+- Checker and Rebuild: Recompute the counts from the tasks table and compare them with the tables, or replace them.
+
+Correlations:
+- The tables are declared in helpers.py and created and filled by a migration (migrations.py).
+- `fetch_task_summary` counts the tasks table directly on databases not upgraded yet.
+- `flask --app core.app check-task-summary` and `flask --app core.app rebuild-task-summary` run the checker and
+  the rebuild.
+"""
+
+from core.helpers import task_summary_table, task_due_summary_table
+from sqlalchemy import bindparam, func, select, text
+import logging
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+# The counts as computed from the tasks table, used to fill, check and stand in for the summary tables.
+# SQLite allows NULL in the key columns of a rowid table but not in a WITHOUT ROWID one, and a NULL key
+# would never match an upsert, so a missing status or priority is counted under ''.
+TASK_SUMMARY_SELECT = """
+    SELECT pos_id, coalesce(task_status, '') AS task_status, coalesce(task_priority, '') AS task_priority,
+           count(*) AS task_count
+    FROM tasks
+    GROUP BY 1, 2, 3
+"""
+
+TASK_DUE_SUMMARY_SELECT = """
+    SELECT task_due_date, pos_id, coalesce(task_status, '') AS task_status, count(*) AS task_count
+    FROM tasks
+    WHERE task_due_date IS NOT NULL AND task_status IS NOT 'Done'
+    GROUP BY 1, 2, 3
+"""
+
+# Statements used by the triggers to add and remove a task (new or old) from the counts
+_ADD_TO_SUMMARY = """
+    INSERT INTO task_summary (pos_id, task_status, task_priority, task_count)
+    VALUES ({row}.pos_id, coalesce({row}.task_status, ''), coalesce({row}.task_priority, ''), 1)
+    ON CONFLICT (pos_id, task_status, task_priority) DO UPDATE SET task_count = task_count + 1;
+"""
+
+_REMOVE_FROM_SUMMARY = """
+    UPDATE task_summary SET task_count = task_count - 1
+    WHERE pos_id = {row}.pos_id AND task_status = coalesce({row}.task_status, '')
+      AND task_priority = coalesce({row}.task_priority, '');
+    DELETE FROM task_summary
+    WHERE pos_id = {row}.pos_id AND task_status = coalesce({row}.task_status, '')
+      AND task_priority = coalesce({row}.task_priority, '') AND task_count <= 0;
+"""
+
+_ADD_TO_DUE_SUMMARY = """
+    INSERT INTO task_due_summary (task_due_date, pos_id, task_status, task_count)
+    SELECT {row}.task_due_date, {row}.pos_id, coalesce({row}.task_status, ''), 1
+    WHERE {row}.task_due_date IS NOT NULL AND {row}.task_status IS NOT 'Done'
+    ON CONFLICT (task_due_date, pos_id, task_status) DO UPDATE SET task_count = task_count + 1;
+"""
+
+_REMOVE_FROM_DUE_SUMMARY = """
+    UPDATE task_due_summary SET task_count = task_count - 1
+    WHERE task_due_date = {row}.task_due_date AND pos_id = {row}.pos_id
+      AND task_status = coalesce({row}.task_status, '');
+    DELETE FROM task_due_summary
+    WHERE task_due_date = {row}.task_due_date AND pos_id = {row}.pos_id
+      AND task_status = coalesce({row}.task_status, '') AND task_count <= 0;
+"""
+
+# The tables and the triggers keeping them current. The update triggers only fire when a counted
+# column changes, so neither the change version stamps nor edits of descriptions and notes touch the counts.
+TASK_SUMMARY_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS task_summary (
+        pos_id INTEGER NOT NULL,
+        task_status VARCHAR NOT NULL,
+        task_priority VARCHAR NOT NULL,
+        task_count INTEGER NOT NULL,
+        PRIMARY KEY (pos_id, task_status, task_priority)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS task_due_summary (
+        task_due_date DATE NOT NULL,
+        pos_id INTEGER NOT NULL,
+        task_status VARCHAR NOT NULL,
+        task_count INTEGER NOT NULL,
+        PRIMARY KEY (task_due_date, pos_id, task_status)
+    ) WITHOUT ROWID
+    """,
+    # Overdue counts of a single store
+    "CREATE INDEX IF NOT EXISTS ix_task_due_summary_pos_due_date ON task_due_summary (pos_id, task_due_date)",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_summary_after_insert AFTER INSERT ON tasks BEGIN
+        {_ADD_TO_SUMMARY.format(row="new")}
+        {_ADD_TO_DUE_SUMMARY.format(row="new")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_summary_after_delete AFTER DELETE ON tasks BEGIN
+        {_REMOVE_FROM_SUMMARY.format(row="old")}
+        {_REMOVE_FROM_DUE_SUMMARY.format(row="old")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_summary_after_update AFTER UPDATE OF pos_id, task_status, task_priority ON tasks
+    WHEN old.pos_id IS NOT new.pos_id OR old.task_status IS NOT new.task_status
+      OR old.task_priority IS NOT new.task_priority BEGIN
+        {_REMOVE_FROM_SUMMARY.format(row="old")}
+        {_ADD_TO_SUMMARY.format(row="new")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_due_summary_after_update AFTER UPDATE OF pos_id, task_status, task_due_date ON tasks
+    WHEN old.pos_id IS NOT new.pos_id OR old.task_status IS NOT new.task_status
+      OR old.task_due_date IS NOT new.task_due_date BEGIN
+        {_REMOVE_FROM_DUE_SUMMARY.format(row="old")}
+        {_ADD_TO_DUE_SUMMARY.format(row="new")}
+    END
+    """
+]
+
+# Statements read by the summary endpoint, for all stores or for one (bound as pos_id)
+TASK_COUNTS = select(
+    task_summary_table.c.pos_id,
+    task_summary_table.c.task_status,
+    task_summary_table.c.task_priority,
+    task_summary_table.c.task_count
+)
+POS_TASK_COUNTS = TASK_COUNTS.where(task_summary_table.c.pos_id == bindparam("pos_id"))
+
+OVERDUE_COUNTS = (
+    select(
+        task_due_summary_table.c.pos_id,
+        task_due_summary_table.c.task_status,
+        func.sum(task_due_summary_table.c.task_count).label("task_count")
+    )
+    .where(task_due_summary_table.c.task_due_date < bindparam("today"))
+    .group_by(task_due_summary_table.c.pos_id, task_due_summary_table.c.task_status)
+)
+POS_OVERDUE_COUNTS = OVERDUE_COUNTS.where(task_due_summary_table.c.pos_id == bindparam("pos_id"))
+
+# Set once the tables have been seen in the database, so the check costs nothing afterwards
+_summary_available = False
+
+# Every summary request checks for the tables, so their absence is only logged once per worker
+_missing_logged = False
+
+def create_task_summary(conn):
+    """
+    Create the summary tables and their triggers if they do not exist yet, and fill them.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to run the DDL on. The caller commits.
+    """
+    for statement in TASK_SUMMARY_DDL:
+        conn.exec_driver_sql(statement)
+    rebuild_task_summary(conn)
+
+def rebuild_task_summary(conn):
+    """
+    Recompute every count of the summary tables from the tasks table.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to run the rebuild on. The caller commits.
+
+    Returns:
+    - tasks (int): The number of tasks counted.
+    """
+    global _summary_available
+
+    conn.exec_driver_sql("DELETE FROM task_summary")
+    conn.exec_driver_sql(f"INSERT INTO task_summary (pos_id, task_status, task_priority, task_count) {TASK_SUMMARY_SELECT}")
+    conn.exec_driver_sql("DELETE FROM task_due_summary")
+    conn.exec_driver_sql(f"INSERT INTO task_due_summary (task_due_date, pos_id, task_status, task_count) {TASK_DUE_SUMMARY_SELECT}")
+    tasks = conn.execute(text("SELECT coalesce(sum(task_count), 0) FROM task_summary")).scalar()
+
+    _summary_available = True
+    logger.info("Rebuilt task summary with %d tasks", tasks)
+    return tasks
+
+def check_task_summary(conn):
+    """
+    Recompute the counts from the tasks table and compare them with the summary tables.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to the database.
+
+    Returns:
+    - differences (list): (table, key) pairs of the counts that are missing, wrong or
+      left over, the key being the primary key of the row; empty when the summary is correct.
+    """
+    differences = []
+    for table, columns, recompute in (
+        ("task_summary", "pos_id, task_status, task_priority", TASK_SUMMARY_SELECT),
+        ("task_due_summary", "task_due_date, pos_id, task_status", TASK_DUE_SUMMARY_SELECT)
+    ):
+        rows = conn.exec_driver_sql(f"""
+            SELECT {columns} FROM (SELECT {columns}, task_count FROM {table} EXCEPT {recompute})
+            UNION
+            SELECT {columns} FROM ({recompute} EXCEPT SELECT {columns}, task_count FROM {table})
+            ORDER BY 1, 2, 3
+        """).fetchall()
+        differences.extend((table, tuple(row)) for row in rows)
+    return differences
+
+def task_summary_available(conn):
+    """
+    Check whether the database has the summary tables.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection used for the check.
+
+    Returns:
+    - available (bool): True if the task_summary table exists.
+    """
+    global _summary_available, _missing_logged
+
+    if not _summary_available:
+        found = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_summary'")
+        ).first()
+        if found:
+            _summary_available = True
+        elif not _missing_logged:
+            logger.warning("Task summary missing; run 'flask --app core.app db-upgrade'")
+            _missing_logged = True
+    return _summary_available
+
+def fetch_task_summary(conn, today, pos_id=None):
+    """
+    Read the task counts and the overdue counts, for all stores or for one.
+
+    Both reads run on the caller's connection, inside one transaction when the
+    caller opened one, so the counts and the overdue counts agree.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to the database.
+    - today (date): Tasks due before this date and not done are overdue.
+    - pos_id (int): Optional POS to restrict the counts to.
+
+    Returns:
+    - counts (list): Rows of (pos_id, task_status, task_priority, task_count).
+    - overdue (list): Rows of (pos_id, task_status, task_count) for the overdue tasks.
+    """
+    if task_summary_available(conn):
+        if pos_id is None:
+            counts = conn.execute(TASK_COUNTS).fetchall()
+            overdue = conn.execute(OVERDUE_COUNTS, {"today": today}).fetchall()
+        else:
+            counts = conn.execute(POS_TASK_COUNTS, {"pos_id": pos_id}).fetchall()
+            overdue = conn.execute(POS_OVERDUE_COUNTS, {"today": today, "pos_id": pos_id}).fetchall()
+        return counts, overdue
+
+    # Not upgraded yet: count the tasks themselves, as the tables would have
+    pos_clause = "" if pos_id is None else "WHERE pos_id = :pos_id"
+    counts = conn.execute(
+        text(f"SELECT pos_id, task_status, task_priority, task_count FROM ({TASK_SUMMARY_SELECT}) {pos_clause}"),
+        {"pos_id": pos_id}
+    ).fetchall()
+    overdue = conn.execute(
+        text(f"""
+            SELECT pos_id, task_status, sum(task_count) AS task_count FROM ({TASK_DUE_SUMMARY_SELECT})
+            WHERE task_due_date < :today {"" if pos_id is None else "AND pos_id = :pos_id"}
+            GROUP BY pos_id, task_status
+        """),
+        {"today": today.isoformat(), "pos_id": pos_id}
+    ).fetchall()
+    return counts, overdue
@@ -0,0 +1,252 @@
+"""
+task_view.py
+
+This file maintains `task_view`, a flattened copy of the tasks table joined with the POS name, the reconciliation
+and the blocker of each task. Every task list and detail used to join four tables, two of them through outer joins,
+on every read; reads outnumber writes by about a hundred to one, so the join is now paid once per write instead.
+
+Key Components:
+- View Table: One row per task with the 13 columns shown by the task tables and the Kanban board, plus the rec and
+  blocker IDs it was joined on and the task's change version. It carries the same indexes as the tasks table, plus
+  (status, task_id) and (priority, task_id) indexes for the task table filters, which list their matches by task_id,
+  so the read routes become single-table index lookups.
+- Triggers: Every insert and update of a task is stamped with a new change version by the versioning triggers
+  (sync.py); the row of the task is recomputed from the join after each stamp, so it happens exactly once per
+  change, POS renames included. Changes to a rec or blocker row are copied to the tasks pointing to it, and a
+  deleted task loses its row. Every writer, the routes, the importer or a manual SQL session, keeps the view current.
+- Checker and Rebuild: Compare the view with the join it copies, and recompute it from scratch.
+
+Correlations:
+- The table is declared in helpers.py and created and filled by a migration (migrations.py), after change tracking.
+- queries.py reads it when it exists, and falls back to the join on databases not upgraded yet.
+- `flask --app core.app check-task-view` and `flask --app core.app rebuild-task-view` run the checker and the rebuild.
+"""
+
+from sqlalchemy import text
+import logging
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+# Columns of the view, in table order, and the expression each one is copied from
+TASK_VIEW_SOURCES = (
+    ("task_id", "tasks.task_id"),
+    ("task_desc", "tasks.task_desc"),
+    ("task_status", "tasks.task_status"),
+    ("task_priority", "tasks.task_priority"),
+    ("task_start_date", "tasks.task_start_date"),
+    ("task_due_date", "tasks.task_due_date"),
+    ("task_notes", "tasks.task_notes"),
+    ("pos_id", "tasks.pos_id"),
+    ("pos_name", "pos.pos_name"),
+    ("rec_id", "tasks.rec_id"),
+    ("rec_date", "rec.rec_date"),
+    ("rec_certified", "rec.rec_certified"),
+    ("blocker_id", "tasks.blocker_id"),
+    ("blocker_desc", "blockers.blocker_desc"),
+    ("blocker_responsible", "blockers.blocker_responsible"),
+    ("change_version", "tasks.change_version")
+)
+
+TASK_VIEW_COLUMNS = ", ".join(name for name, _ in TASK_VIEW_SOURCES)
+
+# The join the view is a copy of, as the task routes used to run it
+TASK_VIEW_SELECT = f"""
+    SELECT {", ".join(source for _, source in TASK_VIEW_SOURCES)}
+    FROM tasks
+    JOIN pos ON pos.pos_id = tasks.pos_id
+    LEFT JOIN rec ON rec.rec_id = tasks.rec_id
+    LEFT JOIN blockers ON blockers.blocker_id = tasks.blocker_id
+"""
+
+# Status and priority filters of the task tables, which list the matches by task_id
+TASK_VIEW_FILTER_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_task_view_status_task_id ON task_view (task_status, task_id)",
+    "CREATE INDEX IF NOT EXISTS ix_task_view_priority_task_id ON task_view (task_priority, task_id)"
+]
+
+# The table, its indexes (those of the tasks table, for the same filters) and the triggers keeping it current.
+# The task triggers only fire on the update stamping a new change version, which follows every insert and update.
+TASK_VIEW_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS task_view (
+        task_id INTEGER NOT NULL PRIMARY KEY,
+        task_desc VARCHAR,
+        task_status VARCHAR,
+        task_priority VARCHAR,
+        task_start_date DATE,
+        task_due_date DATE,
+        task_notes VARCHAR,
+        pos_id INTEGER NOT NULL,
+        pos_name VARCHAR,
+        rec_id INTEGER,
+        rec_date DATE,
+        rec_certified BOOLEAN,
+        blocker_id INTEGER,
+        blocker_desc VARCHAR,
+        blocker_responsible VARCHAR,
+        change_version INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    *TASK_VIEW_FILTER_INDEXES,
+    "CREATE INDEX IF NOT EXISTS ix_task_view_status_due_date ON task_view (task_status, task_due_date)",
+    "CREATE INDEX IF NOT EXISTS ix_task_view_priority_status ON task_view (task_priority, task_status)",
+    "CREATE INDEX IF NOT EXISTS ix_task_view_pos_status ON task_view (pos_id, task_status)",
+    "CREATE INDEX IF NOT EXISTS ix_task_view_due_date ON task_view (task_due_date)",
+    "CREATE INDEX IF NOT EXISTS ix_task_view_start_date ON task_view (task_start_date)",
+    "CREATE INDEX IF NOT EXISTS ix_task_view_change_version ON task_view (change_version)",
+    # Find the tasks to update when a rec or blocker row changes
+    "CREATE INDEX IF NOT EXISTS ix_task_view_rec_id ON task_view (rec_id) WHERE rec_id IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_task_view_blocker_id ON task_view (blocker_id) WHERE blocker_id IS NOT NULL",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_view_after_stamp AFTER UPDATE OF change_version ON tasks
+    WHEN new.change_version <> old.change_version BEGIN
+        INSERT OR REPLACE INTO task_view ({TASK_VIEW_COLUMNS})
+        {TASK_VIEW_SELECT} WHERE tasks.task_id = new.task_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS task_view_after_delete AFTER DELETE ON tasks BEGIN
+        DELETE FROM task_view WHERE task_id = old.task_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS rec_task_view_after_insert AFTER INSERT ON rec BEGIN
+        UPDATE task_view SET rec_date = new.rec_date, rec_certified = new.rec_certified
+        WHERE rec_id = new.rec_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS rec_task_view_after_update AFTER UPDATE ON rec BEGIN
+        UPDATE task_view SET rec_date = NULL, rec_certified = NULL
+        WHERE rec_id = old.rec_id AND old.rec_id <> new.rec_id;
+        UPDATE task_view SET rec_date = new.rec_date, rec_certified = new.rec_certified
+        WHERE rec_id = new.rec_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS rec_task_view_after_delete AFTER DELETE ON rec BEGIN
+        UPDATE task_view SET rec_date = NULL, rec_certified = NULL
+        WHERE rec_id = old.rec_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blockers_task_view_after_insert AFTER INSERT ON blockers BEGIN
+        UPDATE task_view SET blocker_desc = new.blocker_desc, blocker_responsible = new.blocker_responsible
+        WHERE blocker_id = new.blocker_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blockers_task_view_after_update AFTER UPDATE ON blockers BEGIN
+        UPDATE task_view SET blocker_desc = NULL, blocker_responsible = NULL
+        WHERE blocker_id = old.blocker_id AND old.blocker_id <> new.blocker_id;
+        UPDATE task_view SET blocker_desc = new.blocker_desc, blocker_responsible = new.blocker_responsible
+        WHERE blocker_id = new.blocker_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blockers_task_view_after_delete AFTER DELETE ON blockers BEGIN
+        UPDATE task_view SET blocker_desc = NULL, blocker_responsible = NULL
+        WHERE blocker_id = old.blocker_id;
+    END
+    """
+]
+
+# Set once the view has been seen in the database, so the check costs nothing afterwards
+_view_available = False
+
+# Every list request checks for the view, so its absence is only logged once per worker
+_missing_logged = False
+
+def create_task_view(conn):
+    """
+    Create the view table and its triggers if they do not exist yet, and fill it.
+
+    Requires change tracking (sync.py), whose stamps drive the task triggers.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to run the DDL on. The caller commits.
+    """
+    for statement in TASK_VIEW_DDL:
+        conn.exec_driver_sql(statement)
+    rebuild_task_view(conn)
+    # Without statistics the planner can prefer the status index to the search index when joining
+    # search matches, reading every task with the status instead of the few that match
+    conn.exec_driver_sql("ANALYZE task_view")
+
+def create_task_view_filter_indexes(conn):
+    """
+    Add the status and priority filter indexes to a view created without them, and refresh its statistics.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to run the DDL on. The caller commits.
+    """
+    for statement in TASK_VIEW_FILTER_INDEXES:
+        conn.exec_driver_sql(statement)
+    conn.exec_driver_sql("ANALYZE task_view")
+
+def rebuild_task_view(conn):
+    """
+    Recompute every row of the view from the join it copies.
+
+    The view is emptied and refilled in one statement each; the caller's
+    transaction holds the write lock until it commits.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to run the rebuild on. The caller commits.
+
+    Returns:
+    - rows (int): The number of tasks in the view.
+    """
+    global _view_available
+
+    conn.exec_driver_sql("DELETE FROM task_view")
+    conn.exec_driver_sql(f"INSERT INTO task_view ({TASK_VIEW_COLUMNS}) {TASK_VIEW_SELECT}")
+    rows = conn.execute(text("SELECT count(*) FROM task_view")).scalar()
+
+    _view_available = True
+    logger.info("Rebuilt task view with %d tasks", rows)
+    return rows
+
+def check_task_view(conn):
+    """
+    Compare the view with the join it copies.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection to the database.
+
+    Returns:
+    - task_ids (list): The IDs of the tasks whose row is missing, stale or
+      left over, in ascending order; empty when the view is consistent.
+    """
+    return conn.exec_driver_sql(f"""
+        SELECT task_id FROM (SELECT {TASK_VIEW_COLUMNS} FROM task_view EXCEPT {TASK_VIEW_SELECT})
+        UNION
+        SELECT task_id FROM ({TASK_VIEW_SELECT} EXCEPT SELECT {TASK_VIEW_COLUMNS} FROM task_view)
+        ORDER BY task_id
+    """).scalars().all()
+
+def task_view_available(conn):
+    """
+    Check whether the database has the view table.
+
+    Routes read the joined tables on databases where it has not been created yet.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection used for the check.
+
+    Returns:
+    - available (bool): True if the task_view table exists.
+    """
+    global _view_available, _missing_logged
+
+    if not _view_available:
+        found = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_view'")
+        ).first()
+        if found:
+            _view_available = True
+        elif not _missing_logged:
+            logger.warning("Task view missing; run 'flask --app core.app db-upgrade'")
+            _missing_logged = True
+    return _view_available
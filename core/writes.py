@@ -0,0 +1,653 @@
+"""
+writes.py
+
+This file funnels the task writes of all gunicorn workers into a single writer process. SQLite lets one connection
+write at a time: with several workers each committing its own transaction, concurrent drag-and-drop updates queue
+on the database lock, often long enough to fail with "database is locked", and every commit pays its own fsync.
+The writer applies the writes arriving together in one transaction instead (group commit).
+
+Key Components:
+- Write Operations: The task writes of the routes (status update, bulk status update, create, modify) as functions
+  of a connection and their parameters, returning what the route needs to answer. The writer runs them, and a
+  worker runs the very same functions when there is no writer.
+- Writer: A process (`serve_writer`) started by the gunicorn master (gunicorn.conf.py), listening on a unix socket that only
+  clients knowing its key can use. A thread per worker connection queues the requests; one thread takes every
+  request waiting, and those arriving within WRITER_BATCH_WINDOW seconds, up to WRITER_BATCH_SIZE, and applies
+  them in one transaction; when a write fails, the batch is applied again with each write in its own savepoint,
+  so only the failing write is rolled back. A request is only answered once the transaction holding it has
+  committed.
+- Status Coalescing: With TASKFLOW_STATUS_COALESCE_WINDOW set (e.g. 0.3), the writer holds each Kanban status
+  update for that many seconds after the first update of its task; later updates of the task replace it, and only
+  the last status is committed, with a single event. Every request of the group is answered after that commit,
+  with the status saved. Any other write first commits the statuses held before it, so writes apply in order; on
+  SIGTERM, or when the gunicorn master disappears, the writer commits what it holds before exiting. Workers
+  writing without a writer do not coalesce. The Kanban board sends the updates of a card one at a time
+  (kanban.js), so they reach the writer in the order of the drops; the drops made meanwhile are replaced by the
+  latest on the board, and the writer merges the updates of the same card sent by different users.
+- Event Log Pruning: Every EVENTS_PRUNE_INTERVAL seconds the writer queues a pruning of the event log (events.py)
+  with the writes, so one process prunes it for all workers and the deletes never compete for the write lock.
+- Client: `submit_write` sends an operation to the writer over a connection kept by each request thread and waits
+  for its result. Without a writer (`flask run`, the CLI, TASKFLOW_WRITER=0), or while the writer cannot be
+  reached, the operation runs in a transaction of the request's connection, as it did before.
+
+Correlations:
+- Used by the task write routes of app.py; the events of each change (events.py) are recorded in the transaction
+  of the change, in the writer as in the workers.
+- The socket and its key are handed to the workers through the environment by gunicorn.conf.py.
+- The writer's statements are not timed by /metrics, which instruments the workers (metrics.py).
+- The status coalescing is tested by tests/test_writes.py and measured by benchmarks/drags.py.
+"""
+
+from core.helpers import DATABASE_URL, db_transaction, tasks_table, rec_table, blockers_table
+from core.events import record_task_event, record_task_events, prune_events, EVENTS_PRUNE_INTERVAL
+from multiprocessing.connection import Client, Listener
+from sqlalchemy import create_engine, event, select, bindparam
+import logging
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import traceback
+
+# Create a logger object
+logger = logging.getLogger(__name__)
+
+# Socket of the writer process and the key authenticating its clients, both set by gunicorn.conf.py.
+# Workers started without them write to the database themselves.
+WRITER_SOCKET = os.environ.get("TASKFLOW_WRITER_SOCKET")
+WRITER_AUTHKEY = os.environ.get("TASKFLOW_WRITER_AUTHKEY")
+
+# Seconds the writer waits after the first write of a batch for more to join the same transaction
+WRITER_BATCH_WINDOW = float(os.environ.get("TASKFLOW_WRITER_BATCH_WINDOW", 0.002))
+
+# Most writes committed in one transaction
+WRITER_BATCH_SIZE = int(os.environ.get("TASKFLOW_WRITER_BATCH_SIZE", 200))
+
+# Seconds a status update waits in the writer for later updates of the same task, which replace it.
+# 0 commits every update; a few hundred milliseconds covers a card dragged across several columns.
+STATUS_COALESCE_WINDOW = float(os.environ.get("TASKFLOW_STATUS_COALESCE_WINDOW", 0))
+
+# Seconds a request waits for the writer's answer before failing
+WRITER_TIMEOUT = float(os.environ.get("TASKFLOW_WRITER_TIMEOUT", 30))
+
+# Seconds a request thread writes to the database itself after failing to reach the writer, before trying again
+WRITER_RETRY_INTERVAL = 5
+
+class WriteError(Exception):
+    """
+    Raised when the writer could not apply a write, or did not answer in time.
+    """
+
+def update_task_status(conn, task_id, status):
+    """
+    Set the status of a task, e.g. after a drag and drop on the Kanban board.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection of the write transaction.
+    - task_id (int): The ID of the task.
+    - status (str): Its new status.
+
+    Returns:
+    - status (str): The status set, or None if there is no such task. When the writer coalesces the
+      updates of a task (STATUS_COALESCE_WINDOW), every request of the group gets the last status.
+    """
+    logger.debug("Executing update query for task %s to set status to %s", task_id, status)
+    result = conn.execute(
+        tasks_table.update()
+        .where(tasks_table.c.task_id == task_id)
+        .values(task_status=status)
+    )
+
+    rows_affected = result.rowcount
+    logger.debug("Rows affected by the update for task %s: %s", task_id, rows_affected)
+    if rows_affected:
+        # Notify connected Kanban boards once the transaction commits
+        record_task_event(conn, "status", task_id, status)
+        return status
+    return None
+
+def update_task_statuses(conn, requested):
+    """
+    Set the status of several tasks with one executemany.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection of the write transaction.
+    - requested (dict): The new status of each task ID.
+
+    Returns:
+    - outcomes (dict): For each task ID, 'updated', 'unchanged' (already in that status) or 'not_found'.
+    """
+    current = dict(conn.execute(
+        select(tasks_table.c.task_id, tasks_table.c.task_status)
+        .where(tasks_table.c.task_id.in_(list(requested)))
+    ).fetchall()) if requested else {}
+
+    changes = []
+    outcomes = {}
+    for task_id, status in requested.items():
+        if task_id not in current:
+            outcomes[task_id] = "not_found"
+        elif current[task_id] == status:
+            outcomes[task_id] = "unchanged"
+        else:
+            outcomes[task_id] = "updated"
+            changes.append((task_id, status))
+
+    if changes:
+        conn.execute(
+            tasks_table.update()
+            .where(tasks_table.c.task_id == bindparam("b_task_id"))
+            .values(task_status=bindparam("b_status")),
+            [{"b_task_id": task_id, "b_status": status} for task_id, status in changes]
+        )
+        # Notify connected Kanban boards once the transaction commits
+        record_task_events(conn, "status", changes)
+    return outcomes
+
+def create_task(conn, pos_id, description, status, priority, start_date, due_date, notes,
+                reconciliation_date, certified, blocker_desc, blocker_responsible):
+    """
+    Insert a task, with its blocker and reconciliation if given.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection of the write transaction.
+    - The fields of the create form, with dates already parsed; certified is 'true', 'false' or None.
+
+    Returns:
+    - task_id (int): The ID of the new task.
+    """
+    # Insert the new task into the tasks table
+    task_insert = tasks_table.insert().values(
+        pos_id=pos_id,
+        task_desc=description,
+        task_status=status,
+        task_priority=priority,
+        task_start_date=start_date,
+        task_due_date=due_date,
+        task_notes=notes
+    )
+    result = conn.execute(task_insert)
+    task_id = result.inserted_primary_key[0]  # Get the inserted task ID
+
+    # Insert the related blocker information if provided
+    blocker_id = None
+    if blocker_desc or blocker_responsible:
+        blocker_insert = blockers_table.insert().values(
+            blocker_desc=blocker_desc,
+            blocker_responsible=blocker_responsible,
+            task_id=task_id,  # Link with the new task
+            pos_id=pos_id
+        )
+        blocker_result = conn.execute(blocker_insert)
+        blocker_id = blocker_result.inserted_primary_key[0]  # Get the inserted blocker ID
+
+    # Insert reconciliation information into rec_table if needed
+    rec_id = None
+    if reconciliation_date or certified is not None:
+        rec_insert = rec_table.insert().values(
+            rec_date=reconciliation_date,
+            rec_certified=(certified == 'true') if certified else None,
+            task_id=task_id,  # Link with the new task
+            pos_id=pos_id,
+            blocker_id=blocker_id  # Link with the new blocker if created
+        )
+        rec_result = conn.execute(rec_insert)
+        rec_id = rec_result.inserted_primary_key[0]  # Get the inserted rec ID
+
+    # Update the task record with blocker_id and rec_id if they were created
+    conn.execute(
+        tasks_table.update()
+        .where(tasks_table.c.task_id == task_id)
+        .values(blocker_id=blocker_id, rec_id=rec_id)
+    )
+
+    # Notify connected Kanban boards once the transaction commits
+    record_task_event(conn, "created", task_id, status)
+    return task_id
+
+def modify_task(conn, task_id, pos_id, description, status, priority, start_date, due_date, notes,
+                reconciliation_date, certified, blocker_desc, blocker_responsible):
+    """
+    Update a task, and insert or update its blocker and reconciliation if given.
+
+    Parameters:
+    - conn (SQLAlchemy Connection): Connection of the write transaction.
+    - The fields of the modify form, with dates already parsed; certified is 'true', 'false' or None.
+    """
+    # Update the task in the tasks table
+    task_update = tasks_table.update().where(tasks_table.c.task_id == task_id).values(
+        pos_id=pos_id,
+        task_desc=description,
+        task_status=status,
+        task_priority=priority,
+        task_start_date=start_date,
+        task_due_date=due_date,
+        task_notes=notes
+    )
+    conn.execute(task_update)
+
+    # Update the related blocker information if provided
+    if blocker_desc or blocker_responsible:
+        # Check if blocker already exists for this task
+        blocker_exists = conn.execute(
+            select(blockers_table.c.blocker_id).where(blockers_table.c.task_id == task_id)
+        ).fetchone()
+
+        if blocker_exists:
+            # Update existing blocker
+            conn.execute(
+                blockers_table.update().where(blockers_table.c.task_id == task_id).values(
+                    blocker_desc=blocker_desc,
+                    blocker_responsible=blocker_responsible
+                )
+            )
+        else:
+            # Insert new blocker if it doesn't exist
+            conn.execute(
+                blockers_table.insert().values(
+                    blocker_desc=blocker_desc,
+                    blocker_responsible=blocker_responsible,
+                    task_id=task_id,
+                    pos_id=pos_id
+                )
+            )
+
+    # Update reconciliation information if needed
+    if reconciliation_date or certified is not None:
+        # Check if reconciliation already exists for this task
+        rec_exists = conn.execute(
+            select(rec_table.c.rec_id).where(rec_table.c.task_id == task_id)
+        ).fetchone()
+
+        if rec_exists:
+            # Update existing reconciliation
+            conn.execute(
+                rec_table.update().where(rec_table.c.task_id == task_id).values(
+                    rec_date=reconciliation_date,
+                    rec_certified=(certified == 'true') if certified else None
+                )
+            )
+        else:
+            # Insert new reconciliation if it doesn't exist
+            conn.execute(
+                rec_table.insert().values(
+                    rec_date=reconciliation_date,
+                    rec_certified=(certified == 'true') if certified else None,
+                    task_id=task_id,
+                    pos_id=pos_id
+                )
+            )
+
+    # Notify connected Kanban boards once the transaction commits
+    record_task_event(conn, "modified", int(task_id), status)
+
+# The operations the writer accepts, by the name clients send
+WRITE_OPERATIONS = {
+    "update_task_status": update_task_status,
+    "update_task_statuses": update_task_statuses,
+    "create_task": create_task,
+    "modify_task": modify_task,
+    "prune_events": prune_events
+}
+
+# Each request thread keeps its own connection to the writer, since it waits for one answer at a time
+_local = threading.local()
+
+def _writer_connection():
+    """
+    Return the request thread's connection to the writer, connecting if needed.
+
+    Returns:
+    - connection (multiprocessing Connection): The connection, or None if the writer cannot be reached.
+    """
+    connection = getattr(_local, "connection", None)
+    if connection is not None and _local.pid == os.getpid():
+        return connection
+    if time.monotonic() < getattr(_local, "retry_at", 0):
+        return None
+
+    try:
+        connection = Client(WRITER_SOCKET, family="AF_UNIX", authkey=WRITER_AUTHKEY.encode())
+    except (OSError, EOFError) as e:
+        logger.warning("Writer unreachable at %s (%s); writing to the database directly", WRITER_SOCKET, e)
+        _local.retry_at = time.monotonic() + WRITER_RETRY_INTERVAL
+        return None
+    _local.connection, _local.pid = connection, os.getpid()
+    return connection
+
+def _drop_writer_connection():
+    connection = getattr(_local, "connection", None)
+    _local.connection = None
+    if connection is not None:
+        connection.close()
+
+def submit_write(operation, **params):
+    """
+    Apply a write operation, through the writer process if there is one.
+
+    Must run within an application context, where the operation runs itself if
+    the writer is not configured or cannot be reached.
+
+    Parameters:
+    - operation (str): Name of the operation, a key of WRITE_OPERATIONS.
+    - params: Keyword arguments of the operation.
+
+    Returns:
+    - result: What the operation returned, once its transaction has committed.
+
+    Raises:
+    - WriteError: If the writer failed to apply the operation or did not answer in time.
+    """
+    connection = _writer_connection() if WRITER_SOCKET and WRITER_AUTHKEY else None
+    if connection is None:
+        with db_transaction() as conn:
+            return WRITE_OPERATIONS[operation](conn, **params)
+
+    try:
+        connection.send((operation, params))
+        if not connection.poll(WRITER_TIMEOUT):
+            raise WriteError(f"The writer did not answer within {WRITER_TIMEOUT:g} seconds")
+        succeeded, result = connection.recv()
+    except (OSError, EOFError, WriteError) as e:
+        # Whether the write was committed is unknown: report it rather than applying it a second time.
+        # A late answer must not be read as the answer to the thread's next request, so reconnect.
+        _drop_writer_connection()
+        raise WriteError(f"Lost the writer while applying {operation}: {e}") from e
+
+    if not succeeded:
+        raise WriteError(result)
+    return result
+
+class StatusCoalescer:
+    """
+    The latest pending status of each task, held by the writer for STATUS_COALESCE_WINDOW seconds after
+    the first update, so the statuses a card passes through while it is dragged across the board are
+    replaced by the last one instead of each being committed.
+    """
+
+    def __init__(self, window=STATUS_COALESCE_WINDOW):
+        self.window = window
+        # Task ID to [latest status, time it is due, connections waiting for it], by first update
+        self.pending = {}
+        self.coalesced = 0
+
+    def add(self, task_id, status, connection, now=None):
+        """
+        Hold a status update, replacing the one pending for the same task.
+
+        Parameters:
+        - task_id (int): The task updated.
+        - status (str): Its new status.
+        - connection: Where to send the result, once the status is committed.
+        - now (float): The current time.monotonic().
+        """
+        entry = self.pending.get(task_id)
+        if entry is None:
+            now = time.monotonic() if now is None else now
+            self.pending[task_id] = [status, now + self.window, [connection]]
+        else:
+            entry[0] = status
+            entry[2].append(connection)
+            self.coalesced += 1
+
+    def next_due(self):
+        """
+        Return when the oldest pending status is due, or None if none is pending.
+        """
+        # Every status waits the same window, so the first one held is the first one due
+        return next(iter(self.pending.values()))[1] if self.pending else None
+
+    def take(self, now=None):
+        """
+        Remove the pending statuses due by `now`, or all of them, as writes of the next batch.
+
+        Returns:
+        - writes (list): ("update_task_status", params, connections) of each task, oldest first.
+        """
+        writes = []
+        while self.pending:
+            task_id, (status, due, connections) = next(iter(self.pending.items()))
+            if now is not None and due > now:
+                break
+            del self.pending[task_id]
+            writes.append(("update_task_status", {"task_id": task_id, "status": status}, connections))
+        return writes
+
+class GroupCommitWriter:
+    """
+    The writer process: applies the writes of all workers, several per transaction.
+    """
+
+    def __init__(self, engine, batch_window=WRITER_BATCH_WINDOW, batch_size=WRITER_BATCH_SIZE,
+                 coalesce_window=STATUS_COALESCE_WINDOW):
+        self.engine = engine
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.requests = queue.Queue()
+        self.statuses = StatusCoalescer(coalesce_window)
+        self.committer = None
+
+    def serve(self, address, authkey):
+        """
+        Accept worker connections on a unix socket and apply their writes, until the process is terminated.
+
+        Parameters:
+        - address (str): Path of the socket; a file left there by a previous writer is replaced.
+        - authkey (bytes): Key the clients must prove they know.
+        """
+        if os.path.exists(address):
+            os.unlink(address)
+        listener = Listener(address, family="AF_UNIX", authkey=authkey)
+        self.committer = threading.Thread(target=self._commit_batches, name="writer-commit", daemon=True)
+        self.committer.start()
+        logger.info("Writer listening on %s", address)
+
+        while True:
+            try:
+                connection = listener.accept()
+            except Exception as e:
+                logger.warning("Refused a writer connection: %s", e)
+                continue
+            threading.Thread(target=self._read_requests, args=(connection,), name="writer-client", daemon=True).start()
+
+    def stop(self, timeout=WRITER_TIMEOUT):
+        """
+        Commit every write received, the pending statuses included, answer them and stop committing.
+
+        Parameters:
+        - timeout (float): Seconds to wait for the last batch to commit.
+        """
+        self.requests.put(None)
+        if self.committer is not None:
+            self.committer.join(timeout)
+
+    def _read_requests(self, connection):
+        # One thread per worker connection; the connection is closed when its request thread ends
+        while True:
+            try:
+                operation, params = connection.recv()
+            except (OSError, EOFError):
+                connection.close()
+                return
+            self.requests.put((operation, params, connection))
+
+    def _next_batch(self):
+        """
+        Wait for the next writes to commit: those received, except status updates held back
+        for later ones, and the pending statuses now due.
+
+        Returns:
+        - batch (list): (operation, params, connections) of each write, possibly empty.
+        - stopping (bool): True once stop was called; the batch then holds every write left.
+        """
+        due = self.statuses.next_due()
+        received = []
+        try:
+            received.append(self.requests.get(timeout=None if due is None else max(0, due - time.monotonic())))
+        except queue.Empty:
+            pass
+
+        if received:
+            deadline = time.monotonic() + self.batch_window
+            while len(received) < self.batch_size:
+                try:
+                    received.append(self.requests.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+        batch = []
+        stopping = False
+        for request in received:
+            if request is None:
+                stopping = True
+                continue
+            operation, params, connection = request
+            if operation == "update_task_status" and self.statuses.window > 0:
+                self.statuses.add(params["task_id"], params["status"], connection)
+            else:
+                # Writes are applied in the order they arrived, so the statuses held before this one go first
+                batch.extend(self.statuses.take())
+                # The writer's own writes (event log pruning) have no client to answer
+                batch.append((operation, params, [connection] if connection is not None else []))
+        batch.extend(self.statuses.take(None if stopping else time.monotonic()))
+        return batch, stopping
+
+    def _commit_batches(self):
+        stopping = False
+        while not stopping:
+            try:
+                batch, stopping = self._next_batch()
+                if not batch:
+                    continue
+                started = time.perf_counter()
+                replies = self.apply(batch)
+                logger.debug(
+                    "Committed %d writes in %.1f ms (%d status updates coalesced so far)",
+                    len(batch), (time.perf_counter() - started) * 1000, self.statuses.coalesced
+                )
+            except Exception:
+                logger.error(f"Error in the writer's commit loop: {traceback.format_exc()}")
+                continue
+
+            for (operation, params, connections), reply in zip(batch, replies):
+                for connection in connections:
+                    try:
+                        connection.send(reply)
+                    except OSError:
+                        # The worker went away; its connection thread cleans up
+                        pass
+
+    def apply(self, batch):
+        """
+        Apply a batch of writes in one transaction.
+
+        Writes rarely fail, so the batch is first applied as is. If a write fails, the
+        transaction is rolled back and the batch applied again with a savepoint around
+        each write, which isolates the failing one at the cost of a few statements per write.
+
+        Parameters:
+        - batch (list): (operation, params, connections) of each write.
+
+        Returns:
+        - replies (list): (True, result) or (False, error message) for each write, in order.
+        """
+        try:
+            return self._apply(batch, isolated=False)
+        except Exception as e:
+            if len(batch) > 1:
+                logger.debug("A write of a batch of %d failed; applying each in a savepoint", len(batch))
+            else:
+                logger.error(f"Error applying {batch[0][0]}: {traceback.format_exc()}")
+                return [(False, f"{batch[0][0]} failed: {e}")]
+
+        try:
+            return self._apply(batch, isolated=True)
+        except Exception as e:
+            logger.error(f"Error committing a batch of {len(batch)} writes: {traceback.format_exc()}")
+            return [(False, f"The transaction failed: {e}")] * len(batch)
+
+    def _apply(self, batch, isolated):
+        replies = []
+        with self.engine.connect() as conn:
+            with conn.begin():
+                for operation, params, connections in batch:
+                    if not isolated:
+                        replies.append((True, WRITE_OPERATIONS[operation](conn, **params)))
+                        continue
+
+                    savepoint = conn.begin_nested()
+                    try:
+                        result = WRITE_OPERATIONS[operation](conn, **params)
+                        savepoint.commit()
+                    except Exception as e:
+                        savepoint.rollback()
+                        logger.error(f"Error applying {operation}: {traceback.format_exc()}")
+                        replies.append((False, f"{operation} failed: {e}"))
+                    else:
+                        replies.append((True, result))
+        return replies
+
+def create_writer_engine():
+    """
+    Create the engine of the writer process.
+
+    Its transactions start with BEGIN IMMEDIATE, taking the write lock up front so a batch never fails
+    half-way on a lock held by another connection (the CLI, session writes), and its savepoints work as
+    SQLite documents them: pysqlite's own transaction handling is turned off.
+
+    Returns:
+    - engine (SQLAlchemy Engine): An engine with a single connection.
+    """
+    engine = create_engine(DATABASE_URL, pool_size=1, max_overflow=0)
+
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
+
+def _prune_events_periodically(writer, interval):
+    # Queued like any write, so the pruning commits with a batch and in order
+    while True:
+        time.sleep(interval)
+        writer.requests.put(("prune_events", {}, None))
+
+def _exit_with_parent(writer, parent_pid):
+    # A gunicorn master killed without running its exit hook leaves the writer to the init process
+    while os.getppid() == parent_pid:
+        time.sleep(1)
+    logger.info("Gunicorn master %s is gone; stopping the writer", parent_pid)
+    writer.stop()
+    os._exit(0)
+
+def serve_writer(address=WRITER_SOCKET, authkey=WRITER_AUTHKEY):
+    """
+    Run the writer process until it is terminated. Started by gunicorn.conf.py, with the socket
+    and the key in the environment.
+
+    Parameters:
+    - address (str): Path of the unix socket to listen on.
+    - authkey (str): Key the workers authenticate with.
+    """
+    writer = GroupCommitWriter(create_writer_engine())
+
+    def _stop(signum, frame):
+        # gunicorn.conf.py terminates the writer after the workers have exited: commit the
+        # statuses still held for coalescing before going
+        logger.info("Stopping the writer; committing %d pending status updates", len(writer.statuses.pending))
+        writer.stop()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, _stop)
+    threading.Thread(target=_exit_with_parent, args=(writer, os.getppid()), name="writer-parent", daemon=True).start()
+    if EVENTS_PRUNE_INTERVAL > 0:
+        threading.Thread(
+            target=_prune_events_periodically, args=(writer, EVENTS_PRUNE_INTERVAL), name="writer-prune", daemon=True
+        ).start()
+    writer.serve(address, authkey.encode())
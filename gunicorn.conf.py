@@ -0,0 +1,73 @@
+"""
+gunicorn.conf.py
+
+Gunicorn settings for Taskflow, read by gunicorn from its working directory (run_taskflow.sh starts it from the
+project root; elsewhere, pass `--config gunicorn.conf.py`). The bind address, worker class and threads are given
+on the command line.
+
+Key Components:
+- Writer Process: Before forking the workers, the master starts the process that applies the task writes of every
+  worker in group commits (core/writes.py), and passes its socket and authentication key to the workers through
+  the environment. The writer is stopped when gunicorn exits, after the workers, and commits the status updates
+  it still holds for coalescing (TASKFLOW_STATUS_COALESCE_WINDOW) before going. Set TASKFLOW_WRITER=0 to have each worker write to
+  the database itself.
+
+Correlations:
+- The master only starts the writer (`serve_writer` of core/writes.py, run from this directory); it never opens the database.
+"""
+
+import os
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Seconds the master waits for the writer's socket before starting the workers anyway
+WRITER_START_TIMEOUT = 10
+
+# Seconds the master waits at exit for the writer to commit what it holds, before killing it
+WRITER_STOP_TIMEOUT = 30
+
+_writer = None
+_writer_dir = None
+
+def on_starting(server):
+    global _writer, _writer_dir
+
+    if os.environ.get("TASKFLOW_WRITER", "1") == "0":
+        server.log.info("Writer disabled; workers write to the database directly")
+        return
+
+    # A private directory, so only this user can reach the socket; TASKFLOW_WRITER_SOCKET overrides it
+    address = os.environ.get("TASKFLOW_WRITER_SOCKET")
+    if not address:
+        _writer_dir = tempfile.mkdtemp(prefix="taskflow-writer-")
+        address = os.path.join(_writer_dir, "writer.sock")
+    os.environ["TASKFLOW_WRITER_SOCKET"] = address
+    os.environ["TASKFLOW_WRITER_AUTHKEY"] = secrets.token_hex(32)
+
+    # A new interpreter rather than a fork of the master, so it inherits none of gunicorn's state
+    _writer = subprocess.Popen(
+        [sys.executable, "-c", "from core.writes import serve_writer; serve_writer()"],
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+
+    # Workers reaching the writer before it listens write directly, which is safe but forgoes group commit
+    deadline = time.monotonic() + WRITER_START_TIMEOUT
+    while not os.path.exists(address) and _writer.poll() is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    server.log.info("Started writer (pid: %s) on %s", _writer.pid, address)
+
+def on_exit(server):
+    if _writer is not None and _writer.poll() is None:
+        # The workers have exited; the writer commits the status updates it holds for coalescing, then stops
+        _writer.terminate()
+        try:
+            _writer.wait(WRITER_STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            server.log.warning("Writer (pid: %s) did not stop in time; killing it", _writer.pid)
+            _writer.kill()
+    if _writer_dir is not None:
+        shutil.rmtree(_writer_dir, ignore_errors=True)
@@ -1,5 +1,10 @@
 #!/bin/bash
 cd /mnt/c/Users/micro/Downloads/taskflow
 source venv/bin/activate
-gunicorn --bind 127.0.0.1:8000 core.app:app
+flask --app core.app db-upgrade
+# Threaded workers: each Kanban event stream holds a thread, not a whole worker.
+# gunicorn.conf.py, read from this directory, starts the writer process applying the task writes.
+gunicorn --bind 127.0.0.1:8000 --worker-class gthread --threads 16 core.app:app
 
+# Async mode (core/asgi.py): the task, Kanban and POS API routes as coroutines over aiosqlite
+# gunicorn --bind 127.0.0.1:8000 --worker-class uvicorn.workers.UvicornWorker core.asgi:app
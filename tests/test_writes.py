@@ -0,0 +1,127 @@
+"""
+test_writes.py
+
+Tests of the status coalescing of the writer process (core/writes.py): the StatusCoalescer on a simulated clock, and
+the GroupCommitWriter committing the statuses it holds before later writes and when it stops.
+
+Run from the repository root with `python -m pytest tests`. The writer tests apply their writes to a temporary
+database holding only the tasks table; without the event log, no event is recorded.
+"""
+
+import threading
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+
+from core.helpers import tasks_table
+from core.writes import GroupCommitWriter, StatusCoalescer
+
+WINDOW = 0.3
+
+class Board:
+    """
+    A connection of the writer, standing for the board waiting for the answer to its request.
+    """
+
+    def __init__(self):
+        self.replies = []
+        self.answered = threading.Event()
+
+    def send(self, reply):
+        self.replies.append(reply)
+        self.answered.set()
+
+def statuses(writes):
+    return [(params["task_id"], params["status"]) for operation, params, connections in writes]
+
+def test_status_waits_for_the_window():
+    coalescer = StatusCoalescer(WINDOW)
+    coalescer.add(1, "To Do", "a", now=10.0)
+
+    assert coalescer.next_due() == pytest.approx(10.0 + WINDOW)
+    assert coalescer.take(10.0 + WINDOW / 2) == []
+    assert coalescer.take(10.0 + WINDOW) == [("update_task_status", {"task_id": 1, "status": "To Do"}, ["a"])]
+    assert coalescer.next_due() is None
+
+def test_last_status_wins():
+    coalescer = StatusCoalescer(WINDOW)
+    for now, status, connection in [(0.0, "To Do", "a"), (0.05, "In Progress", "b"), (0.1, "Done", "c")]:
+        coalescer.add(7, status, connection, now=now)
+
+    # Later updates replace the status but not the time the first one is due
+    assert coalescer.next_due() == pytest.approx(WINDOW)
+    assert coalescer.take(WINDOW) == [("update_task_status", {"task_id": 7, "status": "Done"}, ["a", "b", "c"])]
+    assert coalescer.coalesced == 2
+
+def test_statuses_are_taken_in_the_order_of_their_first_update():
+    coalescer = StatusCoalescer(WINDOW)
+    coalescer.add(2, "To Do", "a", now=0.0)
+    coalescer.add(1, "Done", "b", now=0.01)
+    coalescer.add(2, "Backlog", "c", now=0.02)
+    coalescer.add(3, "Done", "d", now=WINDOW)
+
+    assert statuses(coalescer.take(0.01 + WINDOW)) == [(2, "Backlog"), (1, "Done")]
+    assert statuses(coalescer.take()) == [(3, "Done")]
+
+def test_update_after_the_window_starts_a_new_group():
+    coalescer = StatusCoalescer(WINDOW)
+    committed = []
+    # Two boards updating the same card: the one arriving after the first group was taken is held on its own
+    for now, status, connection in [(0.0, "To Do", "a"), (0.1, "In Progress", "b"), (0.5, "Done", "c")]:
+        committed.extend(coalescer.take(now))
+        coalescer.add(5, status, connection, now=now)
+    committed.extend(coalescer.take())
+
+    assert committed == [
+        ("update_task_status", {"task_id": 5, "status": "In Progress"}, ["a", "b"]),
+        ("update_task_status", {"task_id": 5, "status": "Done"}, ["c"])
+    ]
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'taskflow.db'}")
+    tasks_table.create(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(tasks_table), [{"task_id": task_id, "task_status": "Backlog", "pos_id": 1} for task_id in (1, 2)])
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def writer(engine):
+    # A window long enough that only a later write or stop can commit the statuses held
+    writer = GroupCommitWriter(engine, coalesce_window=60)
+    writer.committer = threading.Thread(target=writer._commit_batches, daemon=True)
+    writer.committer.start()
+    yield writer
+    writer.stop()
+
+def saved_statuses(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(select(tasks_table.c.task_id, tasks_table.c.task_status)).fetchall())
+
+def test_stop_commits_the_statuses_held(engine, writer):
+    boards = [Board() for _ in range(3)]
+    for board, status in zip(boards, ["To Do", "In Progress", "Done"]):
+        writer.requests.put(("update_task_status", {"task_id": 1, "status": status}, board))
+    other = Board()
+    writer.requests.put(("update_task_status", {"task_id": 2, "status": "To Do"}, other))
+
+    writer.stop()
+
+    assert not writer.committer.is_alive()
+    assert [board.replies for board in boards] == [[(True, "Done")]] * 3
+    assert other.replies == [(True, "To Do")]
+    assert saved_statuses(engine) == {1: "Done", 2: "To Do"}
+    assert writer.statuses.pending == {}
+
+def test_other_writes_commit_the_statuses_held_first(engine, writer):
+    held = Board()
+    writer.requests.put(("update_task_status", {"task_id": 1, "status": "Done"}, held))
+    bulk = Board()
+    writer.requests.put(("update_task_statuses", {"requested": {1: "To Do"}}, bulk))
+
+    assert bulk.answered.wait(10)
+    # The bulk update was received last, so it is applied last
+    assert held.replies == [(True, "Done")]
+    assert bulk.replies == [(True, {1: "updated"})]
+    assert saved_statuses(engine) == {1: "To Do", 2: "Backlog"}